@@ -3,12 +3,14 @@ from django.contrib import admin
 from api.models import (
     CustomUser,
     Medicine,
+    Invoice,
     Bill
 )
 
 # Register your models here.
 admin.site.register(CustomUser)
 admin.site.register(Medicine)
+admin.site.register(Invoice)
 admin.site.register(Bill)
 
 
@@ -0,0 +1,115 @@
+"""
+Low-stock and near-expiry alerts.
+
+``StockAlert`` holds one row per (kind, medicine) that currently needs
+attention, so dashboards read a short precomputed list instead of scanning
+the catalog:
+
+* ``low_stock`` - ``stock`` is below the medicine's ``reorder_level``;
+* ``expiring``  - ``expiry_date`` is within ``EXPIRY_ALERT_DAYS`` of today
+  (already expired medicines included).
+
+Sales can only lower stock, so billing calls ``raise_low_stock`` in its
+transaction: one ``INSERT ... SELECT`` that adds missing low-stock alerts.
+Medicine saves and imports call ``refresh`` for the medicines they wrote.
+The ``refresh_stock_alerts`` command recomputes the whole set with indexed
+range queries; run it daily so the expiry window moves forward.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils.timezone import localdate, now
+
+from api.models import Medicine, StockAlert
+
+
+def expiry_horizon():
+    return localdate() + timedelta(days=settings.EXPIRY_ALERT_DAYS)
+
+
+def low_stock(medicines):
+    """Filter a Medicine queryset to those below their reorder level, via ``medicine_shortfall_idx``."""
+    return medicines.alias(shortfall=F("stock") - F("reorder_level")).filter(shortfall__lt=0)
+
+
+def expiring(medicines, horizon):
+    return medicines.filter(expiry_date__lte=horizon)
+
+
+def raise_low_stock(medicine_ids):
+    """Add low-stock alerts for those of ``medicine_ids`` now below their reorder level."""
+    alerts = connection.ops.quote_name(StockAlert._meta.db_table)
+    medicines = connection.ops.quote_name(Medicine._meta.db_table)
+    ids = list(medicine_ids)
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {alerts} (medicine_id, kind, created_at) "
+            f"SELECT id, %s, %s FROM {medicines} "
+            f"WHERE id IN ({', '.join(['%s'] * len(ids))}) AND stock < reorder_level "
+            "ON CONFLICT (kind, medicine_id) DO NOTHING",
+            [StockAlert.LOW_STOCK, connection.ops.adapt_datetimefield_value(now()), *ids],
+        )
+
+
+def sync(wanted, alerts):
+    """
+    Make the ``alerts`` queryset hold exactly the ``wanted`` ``(medicine_id,
+    kind)`` pairs, in at most one DELETE and one INSERT. Returns ``(raised,
+    cleared)``.
+    """
+    existing = {(medicine_id, kind): pk for pk, medicine_id, kind in alerts.values_list("pk", "medicine_id", "kind")}
+    stale = [pk for key, pk in existing.items() if key not in wanted]
+    new = [StockAlert(medicine_id=medicine_id, kind=kind) for medicine_id, kind in wanted - existing.keys()]
+    if stale:
+        StockAlert.objects.filter(pk__in=stale).delete()
+    if new:
+        StockAlert.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new), len(stale)
+
+
+def refresh(medicines):
+    """Recompute both alert kinds for the ``medicines`` queryset."""
+    horizon = expiry_horizon()
+    ids, wanted = [], set()
+    for medicine_id, stock, reorder_level, expiry_date in medicines.values_list(
+            "id", "stock", "reorder_level", "expiry_date"):
+        ids.append(medicine_id)
+        if stock < reorder_level:
+            wanted.add((medicine_id, StockAlert.LOW_STOCK))
+        if expiry_date <= horizon:
+            wanted.add((medicine_id, StockAlert.EXPIRING))
+    return sync(wanted, StockAlert.objects.filter(medicine_id__in=ids))
+
+
+def refresh_all():
+    """Recompute every alert. Returns ``(raised, cleared)``."""
+    wanted = {(medicine_id, StockAlert.LOW_STOCK) for medicine_id in
+              low_stock(Medicine.objects.all()).values_list("id", flat=True)}
+    wanted |= {(medicine_id, StockAlert.EXPIRING) for medicine_id in
+               expiring(Medicine.objects.all(), expiry_horizon()).values_list("id", flat=True)}
+    return sync(wanted, StockAlert.objects.all())
+
+
+def alert_rows(kind, days=None):
+    """
+    Yield the medicines behind the ``kind`` alerts, most urgent first. A
+    ``days`` window wider than ``EXPIRY_ALERT_DAYS`` is answered from the
+    expiry index instead of the alert set.
+    """
+    fields = ("id", "name", "category", "stock", "reorder_level", "expiry_date")
+    if kind == StockAlert.EXPIRING:
+        if days is not None and days > settings.EXPIRY_ALERT_DAYS:
+            medicines = expiring(Medicine.objects.all(), localdate() + timedelta(days=days))
+        else:
+            medicines = Medicine.objects.filter(alerts__kind=kind)
+            if days is not None:
+                medicines = medicines.filter(expiry_date__lte=localdate() + timedelta(days=days))
+        ordering = ("expiry_date", "id")
+    else:
+        medicines = Medicine.objects.filter(alerts__kind=kind)
+        ordering = ("stock", "id")
+    return medicines.order_by(*ordering).values(*fields)
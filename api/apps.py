@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MedicalApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api import signals  # noqa: F401
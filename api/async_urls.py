@@ -0,0 +1,17 @@
+from django.urls import path
+from .async_views import medicine_list, medicine_detail, medicine_search, stock_availability, sales_reports
+
+# Async versions of the read-heavy routes in api/urls.py, under the same paths and
+# names. Only their reads use the async view pool; writes run as sync views do.
+urlpatterns = [
+    # medicines
+    path('medicines/', medicine_list, name='medicines-create-list'),
+    path('medicines/<int:pk>/', medicine_detail, name='medicines-detail'),
+    path('medicines/search/', medicine_search, name='medicines-search'),
+
+    # stock
+    path("dashboard/stock/", stock_availability, name="stock-availability"),
+
+    # report
+    path("dashboard/reports/", sales_reports, name="sales-reports"),
+]
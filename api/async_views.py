@@ -0,0 +1,125 @@
+"""
+Async entry points for the read-heavy endpoints, served by the ASGI app.
+
+Under ASGI, Django runs every synchronous view on one shared thread, so a slow
+report holds up every other request in the worker. These async views run the
+same DRF views on a bounded pool of ``ASYNC_VIEW_THREADS`` threads instead,
+each with its own database connection, so concurrent dashboard polls overlap
+with slow reports while the event loop only shuffles requests and responses.
+
+Only reads go to the pool. Writes to the same routes (creating, updating or
+deleting a medicine) are run as Django runs any sync view, on its shared
+thread, so they are serialized as they are under the sync routes and never
+hold a read thread.
+
+Streamed exports are not collected in memory: ``pooled_content`` pulls their
+chunks one ``next()`` at a time off a thread of their own, and the ASGI handler
+(medical_billing/asgi.py) sends each chunk as it arrives. The thread is
+pinned to the stream because the rows come from a cursor of that thread's
+database connection; ``ASYNC_VIEW_THREADS`` bounds how many streams run at once.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.http import HttpResponse
+from rest_framework.permissions import SAFE_METHODS
+
+from .views import MedicineDetailView, MedicineListCreateView, MedicineSearchView, SalesReportsAPI, \
+    StockAvailabilityAPI
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_VIEW_THREADS, thread_name_prefix="async-view")
+streams = threading.BoundedSemaphore(settings.ASYNC_VIEW_THREADS)
+
+
+def run_view(view, request, *args, **kwargs):
+    """
+    Run ``view`` to a finished response on a pool thread.
+
+    Pool threads see no request signals, so they close stale connections
+    themselves, as Django does around each request. DRF responses are
+    rendered here: Django 3.2 would otherwise render them on its shared sync
+    thread. Streamed bodies are left to ``pooled_content``.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+            rendered = HttpResponse(response.content, status=response.status_code)
+            for header, value in response.items():
+                rendered[header] = value
+            response = rendered
+        return response
+    finally:
+        close_old_connections()
+
+
+def pull(iterator, done):
+    chunk = next(iterator, done)
+    if chunk is done:
+        # The stream's thread ends with it, so its connection is closed here.
+        connections.close_all()
+    return chunk
+
+
+def finish(iterator):
+    try:
+        if hasattr(iterator, "close"):
+            iterator.close()
+    finally:
+        connections.close_all()
+
+
+async def pooled_content(response, context):
+    """
+    Yield the chunks of a streaming ``response``, each pulled by ``next()`` on
+    the stream's own thread in ``context``, so the event loop never runs a query.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, streams.acquire)
+    thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-stream")
+    iterator, done = iter(response.streaming_content), object()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(thread, context.run, pull, iterator, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # A client that went away leaves the rows unread; close the cursor on the thread that owns it.
+        await loop.run_in_executor(thread, context.run, finish, iterator)
+        thread.shutdown(wait=False)
+        streams.release()
+
+
+def async_view(view_class):
+    """Return an async view function serving ``view_class``'s reads from the thread pool."""
+    view = view_class.as_view()
+    write = sync_to_async(view, thread_sensitive=True)
+
+    async def async_view_function(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await write(request, *args, **kwargs)
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, run_view, view, request, *args, **kwargs)
+        response = await asyncio.get_running_loop().run_in_executor(executor, call)
+        if response.streaming:
+            response.pooled_content = pooled_content(response, context)
+        return response
+
+    async_view_function.csrf_exempt = True
+    async_view_function.view_class = view_class
+    return async_view_function
+
+
+medicine_list = async_view(MedicineListCreateView)
+medicine_detail = async_view(MedicineDetailView)
+medicine_search = async_view(MedicineSearchView)
+stock_availability = async_view(StockAvailabilityAPI)
+sales_reports = async_view(SalesReportsAPI)
@@ -0,0 +1,116 @@
+"""
+Stateless JWT authentication.
+
+Access tokens carry the user's ``role`` and ``token_version`` as claims, so a
+request is authenticated and authorised from the token alone. Tokens are
+revoked by bumping ``CustomUser.token_version``; the current version is read
+from the cache and only falls back to the database on a cache miss. The
+default cache is per process, so other workers see a revocation once their
+copy expires, after ``TOKEN_VERSION_CACHE_TIMEOUT`` seconds.
+
+Refresh tokens are checked against the in-memory blacklist of api/blacklist.py
+rather than the ``token_blacklist`` tables.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+
+from api.blacklist import blacklist as token_blacklist
+
+User = get_user_model()
+
+TOKEN_VERSION_KEY = "auth:token_version:{}"
+DELETED_USER_VERSION = -1
+
+
+def token_version(user_id):
+    """Current token version of ``user_id``; ``DELETED_USER_VERSION`` once the user is gone."""
+    key = TOKEN_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list("token_version", flat=True).first()
+        if version is None:
+            version = DELETED_USER_VERSION
+        cache.set(key, version, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to ``user_id`` so far."""
+    key = TOKEN_VERSION_KEY.format(user_id)
+    User.objects.filter(pk=user_id).update(token_version=F("token_version") + 1)
+    cache.delete(key)
+    # Drop it again once committed, in case a request re-cached the old row meanwhile.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """Refresh token checked against, and blacklisted into, the in-memory blacklist."""
+
+    @classmethod
+    def for_user(cls, user):
+        # Skip the OutstandingToken row simplejwt writes at login: blacklist()
+        # creates it if missing, and tokens issued by rotation never get one.
+        return super(BlacklistMixin, cls).for_user(user)
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in token_blacklist:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        token_blacklist.add(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        return blacklisted
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login serializer that embeds ``role`` and ``ver`` claims in the issued tokens."""
+    token_class = CachedBlacklistRefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["role"] = user.role
+        token["ver"] = user.token_version
+        return token
+
+
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer that rotates ``CachedBlacklistRefreshToken``s."""
+    token_class = CachedBlacklistRefreshToken
+
+
+class ClaimsUser(TokenUser):
+    """Request user built from token claims, enough for the role permissions."""
+
+    @property
+    def role(self):
+        return self.token.get("role")
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates from the token claims without loading ``CustomUser``.
+
+    Tokens issued before the ``role``/``ver`` claims existed fall back to the
+    regular database lookup until they expire.
+    """
+
+    def get_user(self, validated_token):
+        if "role" not in validated_token or "ver" not in validated_token:
+            return JWTAuthentication.get_user(self, validated_token)
+
+        user = super().get_user(validated_token)
+        if validated_token["ver"] != token_version(user.id):
+            raise AuthenticationFailed(_("Token has been revoked."), code="token_revoked")
+        return user
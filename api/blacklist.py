@@ -0,0 +1,167 @@
+"""
+In-memory refresh token blacklist.
+
+simplejwt's ``token_blacklist`` app records every blacklisted refresh token in
+``BlacklistedToken`` and checks each refresh token against it with a join on
+``OutstandingToken``. With rotation on, every refresh and logout adds a row,
+and these tables only shrink when ``purge_expired_tokens`` runs
+``purge_expired``.
+
+``blacklist`` answers the check in process instead. A bloom filter turns away
+the common case, a token that was never blacklisted, and each hit is confirmed
+against a precise map of jti to expiry. An entry lapses when its token
+expires, so it lives no longer than the token lifetime.
+
+Rows blacklisted by any process, or by any code path, are picked up at most
+``SYNC_SECONDS`` after they commit: a check at least that long after the last
+one reads the highest ``BlacklistedToken`` id, a single step down the primary
+key index, and loads the rows above the highest id this process has loaded
+when there are any. Rows of tokens that have already expired are not loaded.
+A check therefore costs at most one indexed query however large the tables
+grow, and a token blacklisted on one worker is refused by every worker within
+``SYNC_SECONDS``; the worker that blacklists it refuses it at once.
+
+Transactions on other backends can commit ids out of order, so each load
+re-reads the last ``SYNC_OVERLAP`` rows.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+SYNC_OVERLAP = 32
+SYNC_SECONDS = 1.0
+MIN_CAPACITY = 1024
+PURGE_BATCH_SIZE = 1000
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and about ``error_rate`` false
+    positives while it holds at most ``capacity`` items.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        # Double hashing: every probe is derived from one 128-bit digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, step = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * step) % self.size for index in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class TokenBlacklist:
+    """Blacklisted refresh token jtis of this process, kept in step with ``BlacklistedToken``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expiries = {}
+        self._bloom = BloomFilter(MIN_CAPACITY)
+        self._watermark = 0
+        self._synced_at = None
+
+    def __contains__(self, jti):
+        self.sync()
+        if jti not in self._bloom:
+            return False
+        expires_at = self._expiries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def add(self, jti, expires_at):
+        """Record ``jti``, blacklisted until ``expires_at`` (epoch seconds), once the transaction commits."""
+        def added():
+            with self._lock:
+                self._insert(jti, expires_at)
+        transaction.on_commit(added)
+
+    def sync(self):
+        """Load the rows blacklisted since the last load, by any process, at most every ``SYNC_SECONDS``."""
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < SYNC_SECONDS:
+            return
+        self._synced_at = now
+        latest = BlacklistedToken.objects.order_by("-id").values_list("id", flat=True).first()
+        if latest is None or latest <= self._watermark:
+            return
+        with self._lock:
+            if latest <= self._watermark:
+                return
+            rows = BlacklistedToken.objects.filter(
+                id__gt=self._watermark - SYNC_OVERLAP, token__expires_at__gt=timezone.now()).order_by("id")
+            for row_id, jti, expires_at in rows.values_list("id", "token__jti", "token__expires_at").iterator():
+                self._insert(jti, expires_at.timestamp())
+                self._watermark = max(self._watermark, row_id)
+            # The rows up to ``latest`` that were not loaded belong to expired tokens.
+            self._watermark = max(self._watermark, latest)
+
+    def forget_sync(self):
+        """Make the next check read the table, however recently the last one did."""
+        self._synced_at = None
+
+    def clear(self):
+        with self._lock:
+            self._expiries = {}
+            self._bloom = BloomFilter(MIN_CAPACITY)
+            self._watermark = 0
+            self._synced_at = None
+
+    def _insert(self, jti, expires_at):
+        if jti in self._expiries or expires_at <= time.time():
+            return
+        if self._bloom.count >= self._bloom.capacity:
+            self._rebuild()
+        self._expiries[jti] = expires_at
+        self._bloom.add(jti)
+
+    def _rebuild(self):
+        """Drop lapsed entries and size a new filter for twice the live ones."""
+        now = time.time()
+        expiries = {jti: expires_at for jti, expires_at in self._expiries.items() if expires_at > now}
+        bloom = BloomFilter(max(MIN_CAPACITY, 2 * len(expiries)))
+        for jti in expiries:
+            bloom.add(jti)
+        # Published filled, as checks read them without the lock.
+        self._expiries, self._bloom = expiries, bloom
+
+
+blacklist = TokenBlacklist()
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE):
+    """
+    Delete expired outstanding tokens and their blacklist rows, one
+    transaction per ``batch_size`` tokens scanned. ``expires_at`` has no
+    index, so tokens are walked in primary key order, one pass over the table.
+    Returns the number of tokens deleted.
+    """
+    cutoff = timezone.now()
+    position, deleted = 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(OutstandingToken.objects.filter(id__gt=position).order_by("id")
+                         .values_list("id", "expires_at")[:batch_size])
+            if not batch:
+                return deleted
+            position = batch[-1][0]
+            expired = [token_id for token_id, expires_at in batch if expires_at < cutoff]
+            if expired:
+                BlacklistedToken.objects.filter(token_id__in=expired).delete()
+                OutstandingToken.objects.filter(id__in=expired).delete()
+        deleted += len(expired)
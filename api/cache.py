@@ -0,0 +1,161 @@
+"""
+Caches kept in front of the medicine table.
+
+Stock availability pages: each page of ``StockAvailabilityAPI`` is stored
+pre-serialized under the current stock version. Any write that changes stock
+bumps the version once the transaction commits, which orphans every cached
+page at once; the version also serves as the ETag, so conditional GETs are
+answered without a database query.
+
+Medicine catalog: a per-process LRU of the fields billing validates against
+(packaging type and price). It is flushed whenever the catalog version changes,
+which happens on medicine writes but not on stock movements.
+
+The versions are ``CacheVersion`` rows, so a bump reaches every process
+whatever the cache backend. Each process keeps its copy of a version for
+``VERSION_CHECK_SECONDS``, so it sees a bump made by another process at most
+that long after it commits; the process that bumps sees it at once.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from api.models import CacheVersion, Medicine
+
+STOCK_VERSION_KEY = "stock:version"
+CATALOG_VERSION_KEY = "catalog:version"
+VERSION_CHECK_SECONDS = 1.0
+
+
+class SharedVersions:
+    """This process's copies of the ``CacheVersion`` rows, each re-read at most every ``VERSION_CHECK_SECONDS``."""
+
+    def __init__(self):
+        self._versions = {}
+
+    def get(self, key):
+        now = time.monotonic()
+        cached = self._versions.get(key)
+        if cached is not None and now - cached[1] < VERSION_CHECK_SECONDS:
+            return cached[0]
+        # Always the primary's, even inside ``replica_reads``.
+        versions = CacheVersion.objects.using(DEFAULT_DB_ALIAS)
+        version = versions.filter(name=key).values_list("version", flat=True).first()
+        if version is None:
+            version = versions.get_or_create(name=key, defaults={"version": uuid4().hex})[0].version
+        self._versions[key] = (version, now)
+        return version
+
+    def forget(self, key):
+        self._versions.pop(key, None)
+
+    def reset(self):
+        self._versions.clear()
+
+
+versions = SharedVersions()
+
+
+def current_version(key):
+    return versions.get(key)
+
+
+def bump_version(key):
+    """Give ``key`` a new version, which other processes see once the current transaction commits."""
+    version = uuid4().hex
+    if not CacheVersion.objects.filter(name=key).update(version=version):
+        CacheVersion.objects.update_or_create(name=key, defaults={"version": version})
+    versions.forget(key)
+
+
+def stock_version():
+    return current_version(STOCK_VERSION_KEY)
+
+
+def invalidate_stock():
+    bump_version(STOCK_VERSION_KEY)
+
+
+def invalidate_stock_on_commit():
+    """Bump the stock version after the current transaction commits."""
+    transaction.on_commit(invalidate_stock)
+
+
+def stock_page_key(version, cursor, page_size):
+    page = hashlib.md5(f"{cursor}:{page_size}".encode()).hexdigest()
+    return f"stock:{version}:{page}"
+
+
+def get_stock_page(key):
+    return cache.get(key)
+
+
+def set_stock_page(key, payload, timeout=None):
+    cache.set(key, payload, settings.STOCK_CACHE_TIMEOUT if timeout is None else timeout)
+
+
+CatalogEntry = namedtuple("CatalogEntry", ["id", "packaging_type", "price"])
+
+
+def invalidate_catalog():
+    """
+    Flush this process's catalog now and every process's once the current
+    transaction commits; bumping again on commit also drops entries loaded
+    from the pre-commit row meanwhile.
+    """
+    bump_version(CATALOG_VERSION_KEY)
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+
+
+class MedicineCatalog:
+    """
+    Bounded, thread-safe LRU of ``CatalogEntry`` by medicine id.
+
+    Only static catalog fields are held; stock always comes from the row.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_many(self, medicine_ids):
+        """Return ``{id: CatalogEntry}`` for the ids that exist, loading misses in one query."""
+        version = current_version(CATALOG_VERSION_KEY)
+        found, missing = {}, []
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            for medicine_id in medicine_ids:
+                entry = self._entries.get(medicine_id)
+                if entry is None:
+                    missing.append(medicine_id)
+                else:
+                    self._entries.move_to_end(medicine_id)
+                    found[medicine_id] = entry
+
+        if missing:
+            rows = Medicine.objects.filter(id__in=missing).values_list("id", "packaging_type", "price")
+            loaded = [CatalogEntry(*row) for row in rows]
+            with self._lock:
+                for entry in loaded:
+                    found[entry.id] = entry
+                    if self._version == version:
+                        self._entries[entry.id] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return found
+
+    def get(self, medicine_id):
+        return self.get_many([medicine_id]).get(medicine_id)
+
+
+medicine_catalog = MedicineCatalog(settings.MEDICINE_CATALOG_SIZE)
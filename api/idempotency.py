@@ -0,0 +1,99 @@
+"""
+``Idempotency-Key`` support for the billing endpoints.
+
+A till that times out retries its POST with the same ``Idempotency-Key``
+header. ``@idempotent`` runs the first request with a given key and stores its
+response in the ``idempotency`` cache, which bounds the number of keys held
+(``MAX_ENTRIES``) and expires them (``TIMEOUT``). A retry gets the stored
+response back, marked ``Idempotent-Replayed: true``, without validation or
+stock being touched again.
+
+The first request claims its key with ``cache.add`` before running, so
+concurrent duplicates wait up to ``IDEMPOTENCY_WAIT_SECONDS`` for its
+response instead of running too; if it is still running then, they get 409.
+Keys are scoped to the authenticated user, and reusing one for a different
+request body is rejected with 422. Server errors are not stored, so the
+request can be retried.
+
+The claim is only atomic across processes with a shared cache backend; see
+``CACHES`` in the settings.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# How long a claim outlives a worker that died while holding it.
+PENDING_SECONDS = 60
+POLL_SECONDS = 0.05
+
+
+def get_store():
+    return caches["idempotency"]
+
+
+def error(status_code, detail):
+    return Response({"detail": detail}, status=status_code)
+
+
+def await_response(store, key, fingerprint):
+    """
+    Wait for the request holding ``key`` to store its response. Returns the
+    stored entry, or None once the key is free to claim again.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        entry = store.get(key)
+        if entry is None or entry["fingerprint"] != fingerprint or "status" in entry:
+            return entry
+        if time.monotonic() >= deadline:
+            return entry
+        time.sleep(POLL_SECONDS)
+
+
+def idempotent(handler):
+    """Make a view's POST handler replay its response for a repeated ``Idempotency-Key``."""
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        if idempotency_key is None:
+            return handler(view, request, *args, **kwargs)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return error(status.HTTP_400_BAD_REQUEST,
+                         f"{HEADER} must be between 1 and {MAX_KEY_LENGTH} characters.")
+
+        store = get_store()
+        key = hashlib.sha256(f"{request.user.pk}:{request.path}:{idempotency_key}".encode()).hexdigest()
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+        while not store.add(key, {"fingerprint": fingerprint}, PENDING_SECONDS):
+            entry = await_response(store, key, fingerprint)
+            if entry is None:
+                continue  # expired or released by a failed request; claim it
+            if entry["fingerprint"] != fingerprint:
+                return error(status.HTTP_422_UNPROCESSABLE_ENTITY,
+                             f"This {HEADER} was already used for a different request.")
+            if "status" not in entry:
+                return error(status.HTTP_409_CONFLICT, f"A request with this {HEADER} is still in progress.")
+            return Response(entry["data"], status=entry["status"], headers={"Idempotent-Replayed": "true"})
+
+        try:
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except Exception as exc:
+                # Turn API errors into their response here so that they are stored as well.
+                response = view.handle_exception(exc)
+        except BaseException:
+            store.delete(key)
+            raise
+        if response.status_code >= 500:
+            store.delete(key)
+        else:
+            store.set(key, {"fingerprint": fingerprint, "status": response.status_code, "data": response.data})
+        return response
+    return wrapper
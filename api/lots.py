@@ -0,0 +1,150 @@
+"""
+Lot-level stock, sold first-expiry-first-out (FEFO).
+
+Each ``StockLot`` is a received batch with its own expiry and quantity.
+``Medicine.stock`` is kept equal to the sum of its lots' quantities and
+``Medicine.expiry_date`` to the earliest expiry among lots still in stock, so
+list endpoints, reports and alerts keep reading single columns.
+
+Sales decrement ``Medicine.stock`` first with their conditional UPDATE, which
+also serialises concurrent sales of a medicine, and then ``consume`` takes the
+same units from its lots. ``stock_lot_fefo_idx`` holds only lots in stock, in
+expiry order, so a sale reads just the head lot of each medicine and walks on
+only through the lots it empties.
+
+Stock written directly to ``Medicine.stock`` (the medicine API, imports, the
+admin) is a stock count: ``adjust`` receives an increase as an adjustment
+lot expiring on the medicine's ``expiry_date`` and writes a decrease off
+first-expiry-first.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+from api.alerts import refresh as refresh_alerts
+from api.models import Medicine, StockLot
+
+# Lots fetched at a time while a sale walks past its medicine's head lot.
+WALK_CHUNK_SIZE = 20
+
+
+def adjustment_batch(expiry_date):
+    return f"ADJ-{expiry_date.isoformat()}"
+
+
+def in_stock():
+    """Lots still in stock in FEFO order; the filter matches ``stock_lot_fefo_idx``'s condition."""
+    return StockLot.objects.filter(quantity__gt=0).order_by("expiry_date", "id")
+
+
+def add_lots(rows):
+    """
+    Add ``(medicine_id, batch_number, expiry_date, quantity)`` rows to
+    ``StockLot``, topping up lots whose batch was received before. Does not
+    touch ``Medicine``.
+    """
+    if not rows:
+        return
+    table = connection.ops.quote_name(StockLot._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} (medicine_id, batch_number, expiry_date, quantity, received_at) "
+        "VALUES (%s, %s, %s, %s, %s) "
+        f"ON CONFLICT (medicine_id, batch_number) DO UPDATE SET quantity = {table}.quantity + excluded.quantity"
+    )
+    received_at = connection.ops.adapt_datetimefield_value(now())
+    params = [
+        (medicine_id, batch_number, connection.ops.adapt_datefield_value(expiry_date), quantity, received_at)
+        for medicine_id, batch_number, expiry_date, quantity in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def sync_expiry(medicine_ids):
+    """Set ``expiry_date`` to the earliest expiry among each medicine's lots in stock, if it has any."""
+    earliest = in_stock().filter(medicine=OuterRef("pk")).values("expiry_date")[:1]
+    Medicine.objects.filter(id__in=medicine_ids).update(expiry_date=Coalesce(Subquery(earliest), F("expiry_date")))
+
+
+def receive(rows):
+    """Add ``(medicine_id, batch_number, expiry_date, quantity)`` lots and raise the medicines' stock to match."""
+    totals = defaultdict(int)
+    for medicine_id, _, _, quantity in rows:
+        totals[medicine_id] += quantity
+    with transaction.atomic():
+        add_lots(rows)
+        Medicine.objects.filter(id__in=totals).update(stock=F("stock") + Case(
+            *[When(id=medicine_id, then=Value(quantity)) for medicine_id, quantity in totals.items()],
+            output_field=IntegerField(),
+        ))
+        sync_expiry(totals)
+    refresh_alerts(Medicine.objects.filter(id__in=totals))
+
+
+def first_lots(medicine_ids):
+    """
+    Return ``(medicine_id, lot_id, quantity)`` for the next lot to sell of each
+    medicine, with one LIMIT 1 probe of ``stock_lot_fefo_idx`` per medicine.
+    Raw SQL: this runs on every sale and the ORM's compile time would dominate.
+    """
+    ids = list(medicine_ids)
+    table = connection.ops.quote_name(StockLot._meta.db_table)
+    probe = f"id IN (SELECT id FROM {table} WHERE medicine_id = %s AND quantity > 0 ORDER BY expiry_date, id LIMIT 1)"
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT medicine_id, id, quantity FROM {table} WHERE {' OR '.join([probe] * len(ids))}", ids)
+        return cursor.fetchall()
+
+
+def consume(quantities):
+    """
+    Take ``{medicine_id: units}`` from lots, first-expiry-first-out, after the
+    caller has taken them from ``Medicine.stock``. Returns the units no lot
+    could supply by medicine, which is empty unless stock and lots disagree.
+    """
+    heads = {medicine_id: (lot_id, lot_quantity) for medicine_id, lot_id, lot_quantity in first_lots(quantities)}
+
+    remaining, missing, emptied = {}, {}, []
+    for medicine_id, wanted in quantities.items():
+        lot_id, lot_quantity = heads.get(medicine_id, (None, 0))
+        if lot_quantity > wanted:
+            remaining[lot_id] = lot_quantity - wanted
+            continue
+        # The head lot runs out, so walk on through the lots this sale empties.
+        lots = in_stock().filter(medicine_id=medicine_id).values_list("id", "quantity")
+        for lot_id, lot_quantity in lots.iterator(chunk_size=WALK_CHUNK_SIZE):
+            taken = min(wanted, lot_quantity)
+            remaining[lot_id] = lot_quantity - taken
+            wanted -= taken
+            if not wanted:
+                break
+        if wanted:
+            missing[medicine_id] = wanted
+        emptied.append(medicine_id)
+
+    if remaining:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {connection.ops.quote_name(StockLot._meta.db_table)} SET quantity = %s WHERE id = %s",
+                [(quantity, lot_id) for lot_id, quantity in remaining.items()],
+            )
+    if emptied:
+        sync_expiry(emptied)
+        refresh_alerts(Medicine.objects.filter(id__in=emptied))
+    return missing
+
+
+def adjust(counts):
+    """
+    Bring lots in line with ``(medicine_id, change, expiry_date)`` stock counts
+    already written to ``Medicine.stock``.
+    """
+    received = [(medicine_id, adjustment_batch(expiry_date), expiry_date, change)
+                for medicine_id, change, expiry_date in counts if change > 0]
+    written_off = {medicine_id: -change for medicine_id, change, _ in counts if change < 0}
+    add_lots(received)
+    if written_off:
+        consume(written_off)
+    sync_expiry([medicine_id for medicine_id, change, _ in counts if change])
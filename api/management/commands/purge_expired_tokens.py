@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.blacklist import PURGE_BATCH_SIZE, purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired refresh tokens from the outstanding and blacklisted token tables in batches. "
+        "Run daily; expired tokens fail verification whether or not they are still listed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE, help="Tokens scanned per transaction.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        deleted = purge_expired(options["batch_size"])
+        self.stdout.write(f"Purged {deleted} expired tokens in {time.perf_counter() - started:.1f}s.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the medicine full-text search index from the medicine table."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The full-text index is only used on SQLite.")
+        rebuild_index()
+        self.stdout.write("Medicine search index rebuilt.")
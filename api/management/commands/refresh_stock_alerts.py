@@ -0,0 +1,18 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.alerts import refresh_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute low-stock and near-expiry alerts for every medicine. Run daily so medicines "
+        f"entering the {settings.EXPIRY_ALERT_DAYS}-day expiry window are picked up."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        raised, cleared = refresh_all()
+        self.stdout.write(f"Raised {raised} and cleared {cleared} alerts in {time.perf_counter() - started:.1f}s.")
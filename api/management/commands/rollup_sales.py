@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.rollup import CATCH_UP_BATCH_SIZE, catch_up, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Add bills written outside the billing API (bulk loads, admin edits) to the daily sales rollup. "
+        "Only bills above the stored watermark are read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=CATCH_UP_BATCH_SIZE, help="Bill ids per transaction.")
+        parser.add_argument("--rebuild", action="store_true", help="Recompute the rollup from every bill.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed = rebuild() if options["rebuild"] else catch_up(options["batch_size"])
+        self.stdout.write(f"Rolled up {processed} bills in {time.perf_counter() - started:.1f}s.")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.report_jobs import pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued sales report jobs until interrupted. Use with REPORT_JOB_WORKERS = 0 to keep "
+        "report jobs out of the web processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=2, help="jobs to run at the same time")
+        parser.add_argument("--once", action="store_true", help="run the jobs queued now, then exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            started = time.perf_counter()
+            pool.drain()
+            self.stdout.write(f"Ran queued report jobs in {time.perf_counter() - started:.1f}s.")
+            return
+        pool.start(options["threads"])
+        self.stdout.write(f"Running report jobs on {options['threads']} threads.")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the running jobs.")
+            pool.stop()
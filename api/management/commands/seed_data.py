@@ -0,0 +1,208 @@
+import random
+import time
+from bisect import bisect
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api import alerts, rollup
+from api.cache import CATALOG_VERSION_KEY, bump_version, invalidate_stock
+from api.models import Bill, Medicine, StockLot
+
+User = get_user_model()
+
+CATEGORIES = [
+    "Analgesic", "Antibiotic", "Antacid", "Antifungal", "Antihistamine", "Antihypertensive", "Antiseptic",
+    "Antiviral", "Cardiac", "Cough & Cold", "Dermatology", "Diabetes", "Gastro", "Hormone", "Neurology",
+    "Ophthalmic", "Respiratory", "Supplement", "Vaccine", "Vitamin",
+]
+STEMS = [
+    "Amoxi", "Azithro", "Cetiri", "Cipro", "Dolo", "Ibupro", "Levo", "Lora", "Metfor", "Omepra",
+    "Panto", "Parace", "Ranit", "Salbu", "Telmi", "Amlo", "Atorva", "Clopi", "Diclo", "Fluco",
+]
+FORMS = ["Tablet", "Capsule", "Syrup", "Gel", "Drops", "Injection", "Cream", "Inhaler"]
+PACKAGING = [choice for choice, _ in Medicine.PACKAGING_CHOICES]
+
+# Relative sales per hour of day: closed overnight, late-morning and early-evening peaks.
+HOURLY_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 4, 7, 10, 11, 9, 7, 6, 6, 7, 9, 11, 10, 7, 4, 2, 0]
+# Relative sales per weekday, Monday first.
+WEEKDAY_WEIGHTS = [1.0, 0.95, 0.95, 1.0, 1.1, 1.25, 0.6]
+QUANTITY_WEIGHTS = [50, 25, 12, 8, 5]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic benchmark dataset: staff, medicines and bills with realistic "
+        "popularity and time-of-day distributions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bills", type=int, default=1000000)
+        parser.add_argument("--medicines", type=int, default=50000)
+        parser.add_argument("--staff", type=int, default=500)
+        parser.add_argument("--days", type=int, default=365, help="Days of sales history ending at --end-date.")
+        parser.add_argument("--end-date", type=date.fromisoformat, default=date.today())
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--password", default="password123", help="Password shared by every seeded user.")
+        parser.add_argument("--batch-size", type=int, default=50000)
+        parser.add_argument("--flush", action="store_true", help="Flush the whole database first.")
+
+    def handle(self, *args, **options):
+        if Medicine.objects.exists() or Bill.objects.exists():
+            if not options["flush"]:
+                raise CommandError("The database already has medicines or bills; pass --flush to replace them.")
+            call_command("flush", interactive=False, verbosity=0)
+
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite" and not connection.in_atomic_block:
+                # Bulk-load settings for this connection only; a crash leaves a scratch DB to re-seed.
+                cursor.execute("PRAGMA synchronous = OFF")
+                cursor.execute("PRAGMA cache_size = -262144")
+
+            with transaction.atomic():
+                staff = self.seed_users(options["staff"], options["password"])
+                medicines = self.seed_medicines(rng, options["medicines"], options["end_date"])
+                # Own generator, so the bills seeded for a given --seed do not depend on the lots.
+                self.seed_lots(random.Random(f"lots:{options['seed']}"))
+                self.log(f"{len(staff) + 2} users and {len(medicines)} medicines", started)
+                self.seed_bills(cursor, rng, staff, medicines, options)
+                self.log(f"{options['bills']} bills", started)
+
+            rollup.catch_up()
+            self.log("daily sales rollup", started)
+            alerts.refresh_all()
+            self.log("stock alerts", started)
+
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+
+        # Rows were written without model signals, so drop anything cached from before.
+        invalidate_stock()
+        bump_version(CATALOG_VERSION_KEY)
+        self.log("done", started)
+
+    def log(self, message, started):
+        self.stdout.write(f"[{time.perf_counter() - started:6.1f}s] {message}")
+
+    def seed_users(self, count, password):
+        """Create ``admin``, ``inventory`` and ``staff0001``... sharing one precomputed hash."""
+        password_hash = make_password(password)
+        users = [
+            User(username="admin", password=password_hash, full_name="Admin", role="admin"),
+            User(username="inventory", password=password_hash, full_name="Inventory Manager",
+                 role="inventory_manager"),
+        ]
+        users += [
+            User(username=f"staff{i:04d}", password=password_hash, full_name=f"Staff {i:04d}", role="staff")
+            for i in range(1, count + 1)
+        ]
+        User.objects.bulk_create(users, batch_size=1000)
+        return list(User.objects.filter(role="staff").order_by("id").values_list("id", flat=True))
+
+    def seed_medicines(self, rng, count, today):
+        """Create medicines and return ``[(id, packaging_type, price_in_cents)]`` in popularity order."""
+        medicines = []
+        for i in range(1, count + 1):
+            price_cents = rng.randrange(50, 50000)
+            medicines.append(Medicine(
+                name=f"{rng.choice(STEMS)}{rng.choice(['cin', 'zole', 'pril', 'mab', 'fen', 'mol'])} "
+                     f"{rng.choice([5, 10, 20, 25, 50, 100, 250, 500])}mg {rng.choice(FORMS)} #{i:05d}",
+                description=f"Batch-seeded medicine #{i}",
+                category=rng.choice(CATEGORIES),
+                stock=rng.randrange(0, 2000),
+                expiry_date=today + timedelta(days=rng.randrange(-30, 3 * 365)),
+                packaging_type=rng.choice(PACKAGING),
+                price=f"{price_cents // 100}.{price_cents % 100:02d}",
+            ))
+        Medicine.objects.bulk_create(medicines, batch_size=5000)
+        rows = Medicine.objects.order_by("id").values_list("id", "packaging_type", "price")
+        return [(medicine_id, packaging, int(price * 100)) for medicine_id, packaging, price in rows]
+
+    def seed_lots(self, rng):
+        """Split each medicine's stock into one to four lots, the earliest expiring on its ``expiry_date``."""
+        lots = []
+        for medicine_id, stock, expiry_date in Medicine.objects.filter(stock__gt=0).values_list(
+                "id", "stock", "expiry_date"):
+            cuts = sorted(rng.sample(range(1, stock), min(rng.randrange(4), stock - 1)))
+            expiry = expiry_date
+            for number, (start, end) in enumerate(zip([0] + cuts, cuts + [stock]), 1):
+                lots.append(StockLot(medicine_id=medicine_id, batch_number=f"LOT{medicine_id:05d}-{number}",
+                                     expiry_date=expiry, quantity=end - start))
+                expiry += timedelta(days=rng.randrange(30, 365))
+        StockLot.objects.bulk_create(lots, batch_size=5000)
+
+    def seed_bills(self, cursor, rng, staff, medicines, options):
+        """
+        Insert bills in ``--batch-size`` batches, in ``created_at`` order.
+
+        Bills go through ``executemany`` rather than ``bulk_create``: at this volume
+        the ORM's per-field value preparation costs more than the inserts themselves.
+        On SQLite the Bill indexes are dropped for the load and rebuilt afterwards.
+        """
+        count, days = options["bills"], options["days"]
+        first_day = options["end_date"] - timedelta(days=days - 1)
+
+        day_weights = []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            growth = 0.8 + 0.4 * offset / max(days - 1, 1)
+            day_weights.append(WEEKDAY_WEIGHTS[day.weekday()] * growth)
+        day_cum = list(accumulate(day_weights))
+        hour_cum = list(accumulate(HOURLY_WEIGHTS))
+        # Zipf-like popularity: a few medicines and staff account for most sales.
+        medicine_cum = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(medicines))))
+        staff_cum = list(accumulate(1 / (rank + 1) ** 0.3 for rank in range(len(staff))))
+        quantity_cum = list(accumulate(QUANTITY_WEIGHTS))
+
+        # One sortable int per bill: microseconds since midnight of the first day.
+        timestamps = sorted(
+            ((bisect(day_cum, rng.random() * day_cum[-1]) * 24 + bisect(hour_cum, rng.random() * hour_cum[-1]))
+             * 3600 + rng.randrange(3600)) * 1000000 + rng.randrange(1000000)
+            for _ in range(count)
+        )
+        day_labels = [(first_day + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+        indexes = []
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                [Bill._meta.db_table],
+            )
+            indexes = cursor.fetchall()
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX "{name}"')
+
+        insert = (
+            f"INSERT INTO {Bill._meta.db_table} "
+            "(staff_id, medicine_id, quantity, packaging_type, total_price, created_at, rolled_up) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        )
+        for start in range(0, count, options["batch_size"]):
+            rows = []
+            for timestamp in timestamps[start:start + options["batch_size"]]:
+                seconds, micro = divmod(timestamp, 1000000)
+                day, seconds = divmod(seconds, 86400)
+                hour, seconds = divmod(seconds, 3600)
+                medicine_id, packaging, price_cents = medicines[bisect(medicine_cum, rng.random() * medicine_cum[-1])]
+                quantity = bisect(quantity_cum, rng.random() * quantity_cum[-1]) + 1
+                total = price_cents * quantity
+                rows.append((
+                    staff[bisect(staff_cum, rng.random() * staff_cum[-1])],
+                    medicine_id,
+                    quantity,
+                    packaging,
+                    f"{total // 100}.{total % 100:02d}",
+                    f"{day_labels[day]} {hour:02d}:{seconds // 60:02d}:{seconds % 60:02d}.{micro:06d}",
+                    False,
+                ))
+            cursor.executemany(insert, rows)
+
+        for _, sql in indexes:
+            cursor.execute(sql)
@@ -0,0 +1,60 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api.routers import beat
+
+
+def sqlite_path(name):
+    """The file behind a SQLite database ``NAME``, which may be a ``file:`` URI."""
+    name = str(name)
+    if name.startswith("file:"):
+        name = name[len("file:"):].split("?", 1)[0]
+    return name
+
+
+class Command(BaseCommand):
+    help = (
+        "Stamp the replica heartbeat on the primary and, when the replica is a SQLite file, copy the "
+        "primary onto it. With a replicating database, run with --skip-copy so the heartbeat dates it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="repeat every this many seconds until interrupted")
+        parser.add_argument("--skip-copy", action="store_true", help="only stamp the heartbeat")
+
+    def handle(self, *args, **options):
+        alias = settings.REPLICA_DATABASE
+        if alias not in settings.DATABASES:
+            raise CommandError(f"No '{alias}' database is configured.")
+        replica = connections[alias]
+        copy = not options["skip_copy"]
+        if copy and replica.vendor != "sqlite":
+            raise CommandError(f"'{alias}' is not SQLite; replicate it with the database and use --skip-copy.")
+        while True:
+            started = time.perf_counter()
+            beat()
+            if copy:
+                self.copy(sqlite_path(replica.settings_dict["NAME"]))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Synced '{alias}' in {elapsed:.2f}s.")
+            if not options["interval"]:
+                return
+            time.sleep(max(0.0, options["interval"] - elapsed))
+
+    def copy(self, path):
+        """
+        Copy the primary onto ``path`` in one consistent step. The copy uses a
+        rollback journal, so it can be opened read-only without WAL files.
+        """
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            primary.connection.backup(target)
+            target.execute("PRAGMA journal_mode = delete")
+        finally:
+            target.close()
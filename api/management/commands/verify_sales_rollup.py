@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.rollup import differences
+
+
+class Command(BaseCommand):
+    help = "Re-derive the daily sales rollup from the bills and report every (date, staff, medicine) that differs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Differences to print.")
+
+    def handle(self, *args, **options):
+        count = 0
+        for day, staff_id, medicine_id, expected, stored in differences():
+            count += 1
+            if count <= options["limit"]:
+                self.stdout.write(
+                    f"{day} staff={staff_id} medicine={medicine_id}: "
+                    f"bills give {self.format(expected)}, rollup has {self.format(stored)}"
+                )
+        if count:
+            raise CommandError(
+                f"{count} rollup rows differ from the bills; run `rollup_sales` to catch up "
+                "or `rollup_sales --rebuild` to recompute."
+            )
+        self.stdout.write("Daily sales rollup matches the bills.")
+
+    def format(self, totals):
+        return "nothing" if totals is None else f"{totals[0]} units / {totals[1]}"
@@ -0,0 +1,181 @@
+"""
+In-process request metrics.
+
+``RequestMetricsMiddleware`` records, per named URL route, the wall time, the
+number and total time of database queries, and the response size of every
+request into fixed-bucket histograms held by ``registry``. ``MetricsView``
+exposes them in the Prometheus text format. Requests slower than
+``METRICS_SLOW_REQUEST_SECONDS`` are logged to ``api.metrics.slow`` together
+with the SQL of their slowest queries.
+
+Queries are attributed through a context variable read by an execute wrapper
+that api/signals.py installs on every new database connection, so queries a
+view runs on another thread (see api/async_views.py) are still counted.
+
+Histograms are per process; with several workers, scrape each one.
+"""
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+
+slow_logger = logging.getLogger("api.metrics.slow")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = (
+    ("api_request_duration_seconds", "Wall time spent serving the request.", DURATION_BUCKETS),
+    ("api_request_db_queries", "Database queries issued by the request.", QUERY_BUCKETS),
+    ("api_request_db_seconds", "Time spent in database queries.", DURATION_BUCKETS),
+    ("api_response_size_bytes", "Size of the response body; streamed bodies are not counted.", SIZE_BUCKETS),
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram; not thread-safe on its own, the registry locks around it."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {name: {} for name, _, _ in HISTOGRAMS}
+            self._responses = {}
+
+    def observe(self, route, status, duration, queries, db_time, size):
+        values = (duration, queries, db_time, size)
+        with self._lock:
+            for (name, _, buckets), value in zip(HISTOGRAMS, values):
+                if value is None:
+                    continue
+                series = self._histograms[name]
+                histogram = series.get(route)
+                if histogram is None:
+                    histogram = series[route] = Histogram(buckets)
+                histogram.observe(value)
+            key = (route, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = [
+            "# HELP api_responses_total Responses sent, by route and status code.",
+            "# TYPE api_responses_total counter",
+        ]
+        with self._lock:
+            for (route, status), count in sorted(self._responses.items()):
+                lines.append(f'api_responses_total{{route="{route}",status="{status}"}} {count}')
+            for name, help_text, buckets in HISTOGRAMS:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for route, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{route="{route}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{route="{route}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class QueryRecorder:
+    """Collects ``(seconds, sql)`` for each query run while it is the current recorder."""
+
+    def __init__(self):
+        self.queries = []
+
+
+current_recorder = ContextVar("current_recorder", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.queries.append((time.perf_counter() - started, sql))
+
+
+def route_name(request):
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    return match.view_name or match.route
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Lets Django keep the whole chain async instead of adapting around this middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.observe(request, response, time.perf_counter() - started, recorder.queries)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.observe(request, response, time.perf_counter() - started, recorder.queries)
+        return response
+
+    def observe(self, request, response, duration, queries):
+        route = route_name(request)
+        db_time = sum(seconds for seconds, _ in queries)
+        size = None if response.streaming else len(response.content)
+        registry.observe(route, response.status_code, duration, len(queries), db_time, size)
+
+        if duration >= settings.METRICS_SLOW_REQUEST_SECONDS:
+            self.log_slow_request(request, route, duration, db_time, queries)
+
+    def log_slow_request(self, request, route, duration, db_time, queries):
+        worst = sorted(queries, key=lambda query: query[0], reverse=True)[:settings.METRICS_SLOW_QUERY_LIMIT]
+        slow_logger.warning(
+            "Slow request %s %s (%s): %.1f ms, %d queries, %.1f ms in database.%s",
+            request.method, request.path, route, duration * 1000, len(queries), db_time * 1000,
+            "".join(f"\n  {seconds * 1000:8.1f} ms  {sql}" for seconds, sql in worst),
+        )
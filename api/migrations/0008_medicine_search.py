@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# External-content FTS5 index over api_medicine, kept in sync by triggers.
+# On SQLite, a later migration that rebuilds api_medicine drops these
+# triggers and must create them again.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE api_medicine_fts USING fts5(
+        name, description, category,
+        content='api_medicine', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER api_medicine_fts_insert AFTER INSERT ON api_medicine BEGIN
+        INSERT INTO api_medicine_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER api_medicine_fts_delete AFTER DELETE ON api_medicine BEGIN
+        INSERT INTO api_medicine_fts(api_medicine_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER api_medicine_fts_update AFTER UPDATE OF name, description, category ON api_medicine BEGIN
+        INSERT INTO api_medicine_fts(api_medicine_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO api_medicine_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    "INSERT INTO api_medicine_fts(api_medicine_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS api_medicine_fts_update",
+    "DROP TRIGGER IF EXISTS api_medicine_fts_delete",
+    "DROP TRIGGER IF EXISTS api_medicine_fts_insert",
+    "DROP TABLE IF EXISTS api_medicine_fts",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_daily_sales'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
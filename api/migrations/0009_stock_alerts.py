@@ -0,0 +1,85 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+
+# Adding reorder_level rebuilds api_medicine on SQLite, which drops 0008's
+# search index triggers, and removing it again on the way back does the same.
+# The triggers are spelled out here rather than taken from api.search so that
+# this migration keeps creating the ones it was written against.
+TRIGGER_SQL = [
+    """
+    CREATE TRIGGER api_medicine_fts_insert AFTER INSERT ON api_medicine BEGIN
+        INSERT INTO api_medicine_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER api_medicine_fts_delete AFTER DELETE ON api_medicine BEGIN
+        INSERT INTO api_medicine_fts(api_medicine_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER api_medicine_fts_update AFTER UPDATE OF name, description, category ON api_medicine BEGIN
+        INSERT INTO api_medicine_fts(api_medicine_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO api_medicine_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+]
+
+DROP_TRIGGER_SQL = [
+    "DROP TRIGGER IF EXISTS api_medicine_fts_update",
+    "DROP TRIGGER IF EXISTS api_medicine_fts_delete",
+    "DROP TRIGGER IF EXISTS api_medicine_fts_insert",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_medicine_search'),
+    ]
+
+    operations = [
+        # Reversed last, once api_medicine has been rebuilt without reorder_level.
+        migrations.RunPython(migrations.RunPython.noop, run(TRIGGER_SQL)),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('low_stock', 'Low stock'), ('expiring', 'Expiring')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.F('stock'), '-', django.db.models.expressions.F('reorder_level')), name='medicine_shortfall_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='medicine',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='api.medicine'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockalert',
+            constraint=models.UniqueConstraint(fields=('kind', 'medicine'), name='stock_alert_unique'),
+        ),
+        migrations.RunPython(run(TRIGGER_SQL), run(DROP_TRIGGER_SQL)),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_lots(apps, schema_editor):
+    """Carry each medicine's existing stock over as one lot expiring on its expiry date."""
+    Medicine = apps.get_model("api", "Medicine")
+    StockLot = apps.get_model("api", "StockLot")
+    medicines = Medicine.objects.filter(stock__gt=0).values_list("id", "stock", "expiry_date")
+    StockLot.objects.bulk_create(
+        (StockLot(medicine_id=medicine_id, batch_number=f"ADJ-{expiry_date.isoformat()}", expiry_date=expiry_date,
+                  quantity=stock) for medicine_id, stock, expiry_date in medicines.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_number', models.CharField(max_length=50)),
+                ('expiry_date', models.DateField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='api.medicine')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('quantity__gt', 0)), fields=['medicine', 'expiry_date', 'id'], name='stock_lot_fefo_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocklot',
+            constraint=models.UniqueConstraint(fields=('medicine', 'batch_number'), name='stock_lot_batch_unique'),
+        ),
+        migrations.RunPython(open_lots, migrations.RunPython.noop),
+    ]
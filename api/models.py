@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -10,6 +11,8 @@ class CustomUser(AbstractUser):
     full_name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='admin')
+    # Embedded in issued tokens; bumping it revokes them (see api.authentication).
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.username} ({self.role})"
@@ -26,15 +29,88 @@ class Medicine(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True, null=True)
     category = models.CharField(max_length=100)
+    # Sum of the medicine's lot quantities; see api/lots.py.
     stock = models.IntegerField(default=0)
+    # Stock below this raises a low-stock alert; see api/alerts.py.
+    reorder_level = models.PositiveIntegerField(default=10)
+    # Earliest expiry among the medicine's lots in stock.
     expiry_date = models.DateField()
     packaging_type = models.CharField(max_length=10, choices=PACKAGING_CHOICES)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["expiry_date"], name="medicine_expiry_idx"),
+            models.Index(fields=["category"], name="medicine_category_idx"),
+            models.Index(F("stock") - F("reorder_level"), name="medicine_shortfall_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.packaging_type})"
 
+
+class StockLot(models.Model):
+    """A received batch of a medicine, sold first-expiry-first-out by api/lots.py."""
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="lots")
+    batch_number = models.CharField(max_length=50)
+    expiry_date = models.DateField()
+    quantity = models.PositiveIntegerField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["medicine", "batch_number"], name="stock_lot_batch_unique"),
+        ]
+        indexes = [
+            # Lots still in stock, in the order sales consume them.
+            models.Index(fields=["medicine", "expiry_date", "id"], name="stock_lot_fefo_idx",
+                         condition=Q(quantity__gt=0)),
+        ]
+
+    def __str__(self):
+        return f"{self.batch_number} - medicine {self.medicine_id}: {self.quantity}"
+
+def remove_from_rollup(bills):
+    # Imported here: api.rollup imports these models.
+    from api.rollup import remove_bills
+    remove_bills(bills)
+
+
+class InvoiceQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete the invoices, taking their lines out of the daily sales rollup first."""
+        with transaction.atomic(using=self.db):
+            remove_from_rollup(Bill.objects.using(self.db).filter(invoice__in=self))
+            return super().delete()
+
+
+class Invoice(models.Model):
+    """Header for a multi-line sale; each line is a ``Bill`` row."""
+    staff = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="invoices")
+    total_price = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = InvoiceQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Invoice {self.id} - {self.total_price}"
+
+    def delete(self, using=None, keep_parents=False):
+        with transaction.atomic(using=using):
+            remove_from_rollup(self.lines.all())
+            return super().delete(using=using, keep_parents=keep_parents)
+
+
+class BillQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete the bills, taking them out of the daily sales rollup first."""
+        with transaction.atomic(using=self.db):
+            remove_from_rollup(self._chain())
+            return super().delete()
+
+
 class Bill(models.Model):
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="lines", blank=True, null=True)
     staff = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="bills")
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="bills")
     quantity = models.PositiveIntegerField()
@@ -46,6 +122,131 @@ class Bill(models.Model):
     ])
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the bill was added to DailySales as it was sold; see api/rollup.py.
+    rolled_up = models.BooleanField(default=False, editable=False)
+
+    objects = BillQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="bill_created_idx"),
+            models.Index(fields=["staff", "created_at"], name="bill_staff_created_idx"),
+            models.Index(fields=["medicine", "created_at"], name="bill_medicine_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Bill {self.id} - {self.medicine.name} ({self.quantity} {self.packaging_type})"
+
+    def delete(self, using=None, keep_parents=False):
+        with transaction.atomic(using=using):
+            remove_from_rollup(Bill.objects.using(using).filter(pk=self.pk))
+            return super().delete(using=using, keep_parents=keep_parents)
+
+class DailySales(models.Model):
+    """Units sold and revenue per day, staff member and medicine, maintained by api/rollup.py."""
+    date = models.DateField()
+    staff = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="daily_sales")
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="daily_sales")
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "staff", "medicine"], name="daily_sales_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["staff", "date"], name="daily_sales_staff_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - staff {self.staff_id} - medicine {self.medicine_id}: {self.units}"
+
+
+class Watermark(models.Model):
+    """Highest row id a background job has processed, by job name."""
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+
+class ReplicaHeartbeat(models.Model):
+    """A single row ``sync_replica`` stamps on the primary; a replica's copy of it dates the replica (api/routers.py)."""
+    beat_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Heartbeat at {self.beat_at}"
+
+
+class CacheVersion(models.Model):
+    """Current version of a cache, by name; changing it orphans whatever every process cached under the old one (api/cache.py)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class StockAlert(models.Model):
+    """A medicine that is below its reorder level or close to expiry, maintained by api/alerts.py."""
+    LOW_STOCK = "low_stock"
+    EXPIRING = "expiring"
+    KIND_CHOICES = [
+        (LOW_STOCK, "Low stock"),
+        (EXPIRING, "Expiring"),
+    ]
+
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="alerts")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "medicine"], name="stock_alert_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.medicine_id}"
+
+
+class ReportJob(models.Model):
+    """A sales report computed in the background and stored as a file, by api/report_jobs.py."""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+    IN_FLIGHT = (PENDING, RUNNING)
+
+    # Hash of the parameters and format; jobs in flight with the same key are one job.
+    key = models.CharField(max_length=64)
+    params = models.JSONField()
+    export = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, related_name="report_jobs",
+                                     blank=True, null=True)
+    result = models.FileField(upload_to="reports/", blank=True)
+    error = models.TextField(blank=True)
+    # Times a worker has claimed the job; a job is only run again if a worker abandoned it.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key"], condition=Q(status__in=("pending", "running")),
+                                    name="report_job_in_flight_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="report_job_status_idx"),
+        ]
 
     def __str__(self):
-        return f"Bill {self.id} - {self.medicine.name} ({self.quantity} {self.packaging_type})"
\ No newline at end of file
+        return f"Report job {self.id} ({self.status})"
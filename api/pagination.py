@@ -0,0 +1,120 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a composite ordering such as ``("name", "id")``.
+
+    The cursor holds the ordering values of the last row on the page, and the
+    next page is fetched with ``WHERE (name, id) > (:name, :id)``. Every page
+    costs the same index seek however deep the client goes, unlike OFFSET.
+    Views choose the ordering with an ``ordering`` attribute; the last field
+    must be unique so that ties are broken deterministically.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("id",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, "ordering", None) or self.ordering)
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            pass
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def decode_cursor(self, request, model):
+        """Return the cursor's ordering values, each converted to its ``model`` field's type."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return [self.to_python(model._meta.get_field(name), value) for name, value in zip(self.names, values)]
+
+    def to_python(self, field, value):
+        # A tampered value must not reach the seek filter, where it fails as a 500.
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        # SQLite gives integer fields no range validators, but stores at most 64 bits.
+        if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+            raise NotFound(self.invalid_cursor_message)
+        return value
+
+    def encode_cursor(self, item):
+        values = [item[name] if isinstance(item, dict) else getattr(item, name) for name in self.names]
+        return urlsafe_b64encode(json.dumps(values, cls=JSONEncoder).encode()).decode("ascii")
+
+    def seek(self, queryset, values):
+        """Filter ``queryset`` to the rows that sort after ``values``."""
+        lookups = ["%s__%s" % (name, "lt" if field.startswith("-") else "gt")
+                   for name, field in zip(self.names, self.fields)]
+        condition = Q()
+        for i, lookup in enumerate(lookups):
+            equal = dict(zip(self.names[:i], values[:i]))
+            condition |= Q(**equal, **{lookup: values[i]})
+        leading = "%s__%s" % (self.names[0], "lte" if self.fields[0].startswith("-") else "gte")
+        return queryset.filter(**{leading: values[0]}).filter(condition)
+
+    def paginate_queryset(self, queryset, request, view=None, rows=list):
+        """
+        Return one page of ``queryset``. ``rows`` turns the sliced queryset into
+        the page items, e.g. a projection that yields dicts.
+        """
+        self.request = request
+        self.fields = self.get_ordering(view)
+        self.names = [field.lstrip("-") for field in self.fields]
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.fields)
+        values = self.decode_cursor(request, queryset.model)
+        if values is not None:
+            queryset = self.seek(queryset, values)
+
+        page = list(rows(queryset[:self.page_size + 1]))
+        self.has_next = len(page) > self.page_size
+        del page[self.page_size:]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
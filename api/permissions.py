@@ -1,4 +1,10 @@
 from rest_framework.permissions import BasePermission
+from django.conf import settings
+
+# Set by reverse proxies. A proxied request arrives from the proxy's address,
+# which is often local, so it never counts as the local scraper.
+PROXY_HEADERS = ('HTTP_X_FORWARDED_FOR', 'HTTP_X_REAL_IP', 'HTTP_FORWARDED')
+
 
 class IsAdminUser(BasePermission):
     """
@@ -15,4 +21,15 @@ class IsInventoryManager(BasePermission):
 class IsStaff(BasePermission):
     """Allow only Staff to create bills"""
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.role == 'staff'
\ No newline at end of file
+        return request.user.is_authenticated and request.user.role == 'staff'
+
+class IsMetricsScraper(BasePermission):
+    """
+    Allow direct requests from METRICS_ALLOWED_IPS (the local scraper), or
+    Admin users. Requests that came through a proxy need the admin token.
+    """
+    def has_permission(self, request, view):
+        proxied = any(header in request.META for header in PROXY_HEADERS)
+        if not proxied and request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+            return True
+        return request.user.is_authenticated and request.user.role == 'admin'
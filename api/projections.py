@@ -0,0 +1,192 @@
+"""
+Read-only serialization straight from ``values_list()`` rows.
+
+A ``ModelSerializer`` builds every row by loading a model instance, resolving
+each field's attribute and calling its ``to_representation``, which for
+decimals and datetimes also rebuilds contexts and looks up settings per value.
+On large list responses that is most of the request's CPU.
+
+``Projection`` inspects a serializer class once, maps each readable field to
+a ``values_list()`` lookup and a converter compiled for that field (strings,
+integers, choices and booleans need none), and yields the dicts the
+serializer would have produced, key for key and value for value.
+
+Values go through Django's database converters for their column, exactly as
+``values_list()`` would load them, and then through the field's converter. The
+converters are applied a column at a time over each fetched batch.
+
+Fetching the rows and Django's converters cost the same on either path and set
+a floor on the speedup. On SQLite, parsing datetime text is most of that floor,
+so rows with datetimes gain less than others; benchmarks/serialization.py
+prints the floor next to both paths.
+
+Only fields that read a column, directly or through ``source="fk.column"``,
+are supported; anything else raises ``ImproperlyConfigured`` on first use.
+"""
+import decimal
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Rows fetched from the cursor at a time, as by ``QuerySet.iterator()``.
+FETCH_SIZE = 2000
+
+# Field types whose representation of a database value is the value itself.
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+                   serializers.ChoiceField)
+
+
+def decimal_converter(field):
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        return "{:f}".format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def output_timezone(field):
+    return field.timezone if hasattr(field, "timezone") else (
+        timezone.get_current_timezone() if settings.USE_TZ else None)
+
+
+def datetime_converter(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return None
+    field_timezone = output_timezone(field)
+    if output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        text = value.astimezone(field_timezone).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return convert
+
+
+def date_converter(field):
+    output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+    if output_format is None:
+        return None
+    if output_format.lower() != ISO_8601:
+        return field.to_representation
+    return date.isoformat
+
+
+def converter(field):
+    """Return a function turning a non-null database value into ``field``'s representation, or None if it is already."""
+    if isinstance(field, serializers.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return date_converter(field)
+    if isinstance(field, serializers.ChoiceField):
+        # Stored choices are represented as themselves; anything else goes through the field.
+        if all(str(key) == key for key in field.choice_strings_to_values.values()):
+            return None
+        return field.to_representation
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    return field.to_representation
+
+
+def column_converter(field, expression, connection):
+    """
+    Return a function turning a non-null raw database value of ``expression``
+    into ``field``'s representation, or None if it is already: Django's
+    database converters for the expression, then the field's converter.
+    """
+    convert = converter(field)
+    db_converters = connection.ops.get_db_converters(expression) + expression.get_db_converters(connection)
+    if not db_converters:
+        return convert
+    if len(db_converters) > 1:
+        def convert_column(value):
+            for db_converter in db_converters:
+                value = db_converter(value, expression, connection)
+            return value if value is None or convert is None else convert(value)
+        return convert_column
+    # The common case, spelled out: this runs once per value.
+    db_converter = db_converters[0]
+    if convert is None:
+        return lambda value: db_converter(value, expression, connection)
+
+    def convert_single(value):
+        value = db_converter(value, expression, connection)
+        return None if value is None else convert(value)
+    return convert_single
+
+
+def select(queryset, lookups, connection):
+    """
+    Return the SQL and parameters of ``queryset.values_list(*lookups)`` and the
+    expression each of its columns reads.
+    """
+    compiler = queryset.values_list(*lookups).query.get_compiler(connection.alias)
+    sql, params = compiler.as_sql()
+    expressions = [expression for expression, _, _ in compiler.select]
+    return sql, params, expressions
+
+
+class Projection:
+    """
+    Callable producing ``serializer_class`` output for a queryset from its
+    ``values_list()`` rows; usable as the ``rows`` argument of
+    ``KeysetPagination.paginate_queryset``.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def fields(self):
+        """``[(name, lookup, field)]`` for the serializer's readable fields, built on first use."""
+        fields = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField,
+                                  serializers.RelatedField, serializers.ManyRelatedField)) or field.source == "*":
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name} cannot be read from values_list() rows.")
+            fields.append((name, field.source.replace(".", "__"), field))
+        return fields
+
+    def __call__(self, queryset):
+        names = [name for name, _, _ in self.fields]
+        connection = connections[queryset.db]
+        try:
+            sql, params, expressions = select(queryset, [lookup for _, lookup, _ in self.fields], connection)
+        except EmptyResultSet:
+            return
+        # Converters are compiled per call: datetimes depend on the active time zone.
+        converters = [
+            (index, convert) for index, ((_, _, field), expression) in enumerate(zip(self.fields, expressions))
+            for convert in [column_converter(field, expression, connection)] if convert is not None
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for rows in iter(lambda: cursor.fetchmany(FETCH_SIZE), []):
+                if not converters:
+                    for row in rows:
+                        yield dict(zip(names, row))
+                    continue
+                # Converted a column at a time, which keeps the per-value work to the call itself.
+                columns = list(zip(*rows))
+                for index, convert in converters:
+                    columns[index] = [None if value is None else convert(value) for value in columns[index]]
+                for row in zip(*columns):
+                    yield dict(zip(names, row))
@@ -0,0 +1,193 @@
+"""
+Background sales report jobs.
+
+A report over a year of bills can take longer than the proxy waits for a
+response. ``POST dashboard/reports/jobs/`` queues it as a ``ReportJob``
+instead; the client polls the job until it is done and then downloads the
+report file. Submitting the parameters of a job that is still pending or
+running returns that job rather than queueing another, and a unique
+constraint on the parameter key settles concurrent submits.
+
+The queue is the ``ReportJob`` table, so no broker is involved and any process
+can run jobs. ``WorkerPool`` threads claim the oldest pending job with a
+conditional update that only one of them can win, write the report to the
+default storage, and record the outcome. Each web process starts
+``REPORT_JOB_WORKERS`` of them on its first submit, and wakes them on each
+submit; ``run_report_workers`` runs a pool in a process of its own. Workers
+also look for jobs every ``REPORT_JOB_POLL_SECONDS``, which picks up jobs
+queued by other processes.
+
+A job still running after ``REPORT_JOB_TIMEOUT`` is taken to be abandoned by
+a worker that died and is claimed again, up to ``MAX_ATTEMPTS`` times. Jobs
+and their files are deleted ``REPORT_JOB_RETENTION`` seconds after they finish.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import ReportJob
+from api.reports import EXPORT_FORMATS, report_rows
+from api.routers import monitor, read_from
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# Oldest claimable jobs a worker tries before giving up on a round.
+CLAIM_CANDIDATES = 10
+PURGE_INTERVAL_SECONDS = 600
+
+
+def job_key(params, export):
+    return hashlib.sha256(json.dumps([params, export], sort_keys=True).encode()).hexdigest()
+
+
+def submit(params, export, requested_by_id=None):
+    """
+    Return the job in flight for ``params`` and ``export``, queueing one if
+    there is none, and whether it was queued.
+    """
+    key = job_key(params, export)
+    while True:
+        job = ReportJob.objects.filter(key=key, status__in=ReportJob.IN_FLIGHT).first()
+        if job is not None:
+            return job, False
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(key=key, params=params, export=export, requested_by_id=requested_by_id)
+        except IntegrityError:
+            continue  # queued by a concurrent submit; return that one
+        transaction.on_commit(pool.wake)
+        return job, True
+
+
+def claimable():
+    stale = timezone.now() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT)
+    return Q(status=ReportJob.PENDING) | Q(status=ReportJob.RUNNING, started_at__lt=stale)
+
+
+def claim():
+    """Mark the oldest claimable job running and return it, or None if there is none."""
+    now = timezone.now()
+    ReportJob.objects.filter(claimable(), status=ReportJob.RUNNING, attempts__gte=MAX_ATTEMPTS).update(
+        status=ReportJob.FAILED, error="Abandoned by its workers.", finished_at=now)
+    candidates = ReportJob.objects.filter(claimable()).order_by("created_at", "id")
+    for job_id, attempts in candidates.values_list("id", "attempts")[:CLAIM_CANDIDATES]:
+        # Matching the attempts as well makes the update fail for all but one of the workers racing for the job.
+        claimed = ReportJob.objects.filter(claimable(), pk=job_id, attempts=attempts).update(
+            status=ReportJob.RUNNING, started_at=now, attempts=F("attempts") + 1)
+        if claimed:
+            return ReportJob.objects.get(pk=job_id)
+    return None
+
+
+def finish(job, **fields):
+    """Record the outcome of ``job`` unless another worker has claimed it since; returns whether it did."""
+    return bool(ReportJob.objects.filter(pk=job.pk, status=ReportJob.RUNNING, attempts=job.attempts)
+                .update(finished_at=timezone.now(), **fields))
+
+
+def run(job):
+    """Write the report of ``job`` to a file, with its reads on the replica when it is usable."""
+    stream, _ = EXPORT_FORMATS[job.export]
+    try:
+        with tempfile.TemporaryFile() as buffer:
+            for chunk in read_from(monitor.alias(), stream(report_rows(job.params))):
+                buffer.write(chunk.encode())
+            name = default_storage.save(f"reports/report-{job.pk}.{job.export}", File(buffer))
+    except Exception as exc:
+        logger.exception("Report job %s failed", job.pk)
+        finish(job, status=ReportJob.FAILED, error=str(exc) or exc.__class__.__name__)
+        return
+    if not finish(job, status=ReportJob.DONE, result=name):
+        default_storage.delete(name)
+
+
+def purge_finished():
+    """Delete jobs finished more than ``REPORT_JOB_RETENTION`` seconds ago, and their files."""
+    cutoff = timezone.now() - timedelta(seconds=settings.REPORT_JOB_RETENTION)
+    finished = ReportJob.objects.filter(status__in=(ReportJob.DONE, ReportJob.FAILED), finished_at__lt=cutoff)
+    for job_id, name in finished.values_list("id", "result"):
+        if name:
+            default_storage.delete(name)
+        ReportJob.objects.filter(pk=job_id).delete()
+
+
+class WorkerPool:
+    """Threads that run queued report jobs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._purged_at = None
+
+    def start(self, threads):
+        """Start ``threads`` workers unless the pool is running already."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._threads = [threading.Thread(target=self._work, name=f"report-worker-{index}", daemon=True)
+                             for index in range(threads)]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self):
+        """Stop the workers once their current jobs are done."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping.set()
+            self._wakeup.set()
+        for thread in threads:
+            thread.join()
+
+    def wake(self):
+        """Have the workers look for jobs now, starting this process's workers if they are not running."""
+        if settings.REPORT_JOB_WORKERS:
+            self.start(settings.REPORT_JOB_WORKERS)
+        self._wakeup.set()
+
+    def drain(self):
+        """Run claimable jobs until there are none left, then purge old ones if they are due."""
+        while not self._stopping.is_set():
+            job = claim()
+            if job is None:
+                break
+            run(job)
+        now = time.monotonic()
+        with self._lock:
+            due = self._purged_at is None or now - self._purged_at >= PURGE_INTERVAL_SECONDS
+            if due:
+                self._purged_at = now
+        if due:
+            purge_finished()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            # Cleared before draining, so that a job submitted meanwhile wakes the next round.
+            self._wakeup.clear()
+            # Like a request, each round starts and ends with connections that are still usable.
+            close_old_connections()
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Report worker failed")
+            finally:
+                close_old_connections()
+            self._wakeup.wait(settings.REPORT_JOB_POLL_SECONDS)
+        connections.close_all()
+
+
+pool = WorkerPool()
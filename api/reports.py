@@ -0,0 +1,124 @@
+"""
+Sales report rows and exports.
+
+Shared by ``SalesReportsAPI``, which answers a report in the request, and the
+report jobs of api/report_jobs.py, which write it to a file in the background.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.utils.dateparse import parse_date
+from django.utils.timezone import make_aware
+from rest_framework.exceptions import ValidationError
+
+from api.models import Bill, DailySales
+from api.serializers import REPORT_GROUPINGS, REPORT_PERIODS, sales_report_rows, sales_report_totals
+
+EXPORT_CHUNK_ROWS = 500
+REPORT_PARAMETERS = ("start_date", "end_date", "staff_id", "period", "group_by")
+# Bills are listed, paginated and exported in this order.
+REPORT_ORDERING = ("created_at", "id")
+
+
+class Echo:
+    """Pseudo-buffer that hands back whatever the csv writer writes to it."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yield CSV text in chunks of ``EXPORT_CHUNK_ROWS`` rows, header first."""
+    writer = csv.writer(Echo())
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    yield writer.writerow(first.keys()) + writer.writerow(first.values())
+    for chunk in iter(lambda: list(islice(rows, EXPORT_CHUNK_ROWS)), []):
+        yield "".join(writer.writerow(row.values()) for row in chunk)
+
+
+def stream_ndjson(rows):
+    """Yield newline-delimited JSON in chunks of ``EXPORT_CHUNK_ROWS`` rows."""
+    rows = iter(rows)
+    for chunk in iter(lambda: list(islice(rows, EXPORT_CHUNK_ROWS)), []):
+        yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
+
+
+def report_dates(start_date, end_date):
+    """Parse the inclusive ``start_date``/``end_date`` report parameters."""
+    try:
+        start, end = parse_date(start_date), parse_date(end_date)
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        raise ValidationError({"start_date": "Dates must be in YYYY-MM-DD format."})
+    return start, end
+
+
+def created_at_range(start_date, end_date):
+    """
+    Turn an inclusive ``start_date``/``end_date`` pair into a half-open
+    ``created_at`` range. Comparing the raw column instead of ``created_at__date``
+    lets the database seek on the ``created_at`` indexes instead of scanning.
+    """
+    start, end = report_dates(start_date, end_date)
+    return {
+        "created_at__gte": make_aware(datetime.combine(start, time.min)),
+        "created_at__lt": make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    }
+
+
+def report_parameters(query):
+    """
+    Validate the report parameters in ``query`` and return the given ones as
+    strings. The dates only filter the report when both are given.
+    """
+    params = {name: str(query[name]) for name in REPORT_PARAMETERS if query.get(name) not in (None, "")}
+    period, group_by = params.get("period"), params.get("group_by")
+    if period and period not in REPORT_PERIODS:
+        raise ValidationError({"period": f"Must be one of: {', '.join(REPORT_PERIODS)}."})
+    if group_by and group_by not in REPORT_GROUPINGS:
+        raise ValidationError({"group_by": f"Must be one of: {', '.join(REPORT_GROUPINGS)}."})
+    if group_by and not period:
+        raise ValidationError({"period": "Required when group_by is set."})
+    if "staff_id" in params and not params["staff_id"].isdigit():
+        raise ValidationError({"staff_id": "Must be a user id."})
+    if "start_date" in params and "end_date" in params:
+        report_dates(params["start_date"], params["end_date"])
+    return params
+
+
+def report_bills(params):
+    """The bills a per-bill report lists."""
+    bills = Bill.objects.all()
+    if "start_date" in params and "end_date" in params:
+        bills = bills.filter(**created_at_range(params["start_date"], params["end_date"]))
+    if "staff_id" in params:
+        bills = bills.filter(staff_id=params["staff_id"])
+    return bills
+
+
+def report_totals(params):
+    """Per-period rows of a report with a ``period``, which come from the daily rollup rather than the bills."""
+    sales = DailySales.objects.all()
+    if "start_date" in params and "end_date" in params:
+        sales = sales.filter(date__range=report_dates(params["start_date"], params["end_date"]))
+    if "staff_id" in params:
+        sales = sales.filter(staff_id=params["staff_id"])
+    return sales_report_totals(sales, params["period"], params.get("group_by"))
+
+
+def report_rows(params):
+    """Every row of the report for ``params``, as exported."""
+    if params.get("period"):
+        return report_totals(params)
+    return sales_report_rows(report_bills(params).order_by(*REPORT_ORDERING))
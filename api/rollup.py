@@ -0,0 +1,193 @@
+"""
+Daily sales rollup.
+
+``DailySales`` holds units and revenue per (date, staff, medicine), so period
+reports read a few rows per day instead of every bill. Bills sold through the
+API are added by ``add_bills`` inside the transaction that creates them and
+are flagged ``rolled_up``. Bills written any other way (``seed_data``, the
+admin, fixtures) are added by ``catch_up``, which only reads bills above the
+``sales_rollup`` watermark that are not flagged.
+
+Editing or deleting a bill the rollup already includes moves its amounts.
+``replace_bill``, called from the ``Bill`` save signals, takes an edited
+bill's old amounts out of their day and adds the new ones. ``remove_bills``
+takes deleted bills out, one (date, staff, medicine) key at a time; the
+``delete()`` methods of bills and invoices and of their querysets call it,
+which covers the admin. Bills deleted with their medicine or staff member are
+not subtracted: their ``DailySales`` rows go in the same cascade, and with no
+delete signals on ``Bill`` the cascade deletes them without loading them.
+``QuerySet.update`` and raw SQL bypass all of this; repair after those with
+``rollup_sales --rebuild``.
+
+Dates are the bill's ``created_at`` in the current time zone, matching
+``created_at_range`` in api/reports.py.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import get_current_timezone_name, localdate
+
+from api.models import Bill, DailySales, Watermark
+
+ROLLUP_WATERMARK = "sales_rollup"
+CATCH_UP_BATCH_SIZE = 100000
+CENT = Decimal("0.01")
+
+
+def upsert_sql(rows_sql):
+    """``INSERT ... ON CONFLICT DO UPDATE`` adding the ``rows_sql`` rows to ``DailySales`` (SQLite 3.24+ and PostgreSQL)."""
+    table = connection.ops.quote_name(DailySales._meta.db_table)
+    return (
+        f"INSERT INTO {table} (date, staff_id, medicine_id, units, revenue) {rows_sql} "
+        "ON CONFLICT (date, staff_id, medicine_id) DO UPDATE SET "
+        f"units = {table}.units + excluded.units, revenue = {table}.revenue + excluded.revenue"
+    )
+
+
+def upsert(rows):
+    """Add ``(date, staff_id, medicine_id, units, revenue)`` rows to ``DailySales`` with one ``executemany``."""
+    if not rows:
+        return
+    sql = upsert_sql("VALUES (%s, %s, %s, %s, %s)")
+    params = [
+        (connection.ops.adapt_datefield_value(day), staff_id, medicine_id, units,
+         connection.ops.adapt_decimalfield_value(revenue))
+        for day, staff_id, medicine_id, units, revenue in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def upsert_totals(totals):
+    """
+    Add the rows of an ``aggregate`` queryset to ``DailySales`` in one
+    ``INSERT ... SELECT``, without reading them into Python.
+    """
+    sql, params = totals.query.sql_with_params()
+    # "WHERE true" keeps SQLite from reading ON CONFLICT as a join constraint.
+    rows_sql = f"SELECT date, staff_id, medicine_id, units, revenue FROM ({sql}) totals WHERE true"
+    with connection.cursor() as cursor:
+        cursor.execute(upsert_sql(rows_sql), params)
+
+
+def bill_totals(bills):
+    """Return ``{(date, staff_id, medicine_id): [units, revenue]}`` for Bill instances."""
+    totals = defaultdict(lambda: [0, 0])
+    for bill in bills:
+        total = totals[localdate(bill.created_at), bill.staff_id, bill.medicine_id]
+        total[0] += bill.quantity
+        total[1] += bill.total_price
+    return totals
+
+
+def add_bills(bills):
+    """Add just-saved bills, which the caller created with ``rolled_up=True``, to the rollup."""
+    upsert([(*key, units, revenue) for key, (units, revenue) in bill_totals(bills).items()])
+
+
+def watermark():
+    return Watermark.objects.filter(name=ROLLUP_WATERMARK).values_list("position", flat=True).first() or 0
+
+
+def included(bill):
+    """Whether the rollup includes ``bill``: added as it was sold, or read by ``catch_up``."""
+    return bill.rolled_up or bill.pk <= watermark()
+
+
+def subtract(day, staff_id, medicine_id, units, revenue):
+    """Take amounts out of a day's row, dropping the row once nothing is left in it."""
+    rows = DailySales.objects.filter(date=day, staff_id=staff_id, medicine_id=medicine_id)
+    rows.update(units=F("units") - units, revenue=F("revenue") - revenue)
+    rows.filter(units=0, revenue=0).delete()
+
+
+def replace_bill(previous, bill):
+    """Move an edited bill's amounts from ``previous``, its saved state before the edit, to ``bill``."""
+    if included(previous):
+        for key, (units, revenue) in bill_totals([previous]).items():
+            subtract(*key, units, revenue)
+        add_bills([bill])
+
+
+def remove_bills(bills):
+    """Take the bills of a Bill queryset that the rollup includes out of it, before they are deleted."""
+    rolled_up = bills.filter(Q(rolled_up=True) | Q(pk__lte=watermark()))
+    for day, staff_id, medicine_id, units, revenue in list(aggregate(rolled_up)):
+        subtract(day, staff_id, medicine_id, units, revenue.quantize(CENT))
+
+
+class BillDate(TruncDate):
+    """
+    ``TruncDate`` that SQLite computes with its built-in ``date()`` while the
+    current time zone is UTC, instead of calling a Python function per row.
+    Datetimes are stored in UTC, so the two agree in that case.
+    """
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        if get_current_timezone_name() != "UTC":
+            return super().as_sqlite(compiler, connection, **extra_context)
+        sql, params = compiler.compile(self.lhs)
+        return f"date({sql})", params
+
+
+def aggregate(bills):
+    """Return ``(date, staff_id, medicine_id, units, revenue)`` totals for a Bill queryset."""
+    return (
+        bills.annotate(date=BillDate("created_at"))
+        .values("date", "staff_id", "medicine_id")
+        .annotate(units=Sum("quantity"), revenue=Sum("total_price"))
+        .order_by()
+        .values_list("date", "staff_id", "medicine_id", "units", "revenue")
+    )
+
+
+def catch_up(batch_size=CATCH_UP_BATCH_SIZE):
+    """
+    Roll up bills above the watermark that were not added as they were sold,
+    ``batch_size`` ids at a time, each batch committed with its watermark.
+    Returns the number of bills read.
+    """
+    last_id = Bill.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+    position = Watermark.objects.get_or_create(name=ROLLUP_WATERMARK)[0].position
+    processed = 0
+    while position < last_id:
+        end = min(position + batch_size, last_id)
+        with transaction.atomic():
+            pending = Bill.objects.filter(id__gt=position, id__lte=end, rolled_up=False)
+            processed += pending.aggregate(count=Count("id"))["count"]
+            upsert_totals(aggregate(pending))
+            Watermark.objects.filter(name=ROLLUP_WATERMARK).update(position=end)
+        position = end
+    return processed
+
+
+def rebuild():
+    """Recompute the whole rollup from the bills."""
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        Watermark.objects.update_or_create(name=ROLLUP_WATERMARK, defaults={"position": 0})
+        Bill.objects.filter(rolled_up=True).update(rolled_up=False)
+        return catch_up()
+
+
+def differences():
+    """
+    Re-derive the rollup from the bills and yield
+    ``(date, staff_id, medicine_id, expected, stored)`` for every key whose
+    ``(units, revenue)`` differ; a missing side is ``None``.
+    """
+    stored = {
+        (day, staff_id, medicine_id): (units, revenue)
+        for day, staff_id, medicine_id, units, revenue in DailySales.objects.values_list(
+            "date", "staff_id", "medicine_id", "units", "revenue").iterator()
+    }
+    for day, staff_id, medicine_id, units, revenue in aggregate(Bill.objects.all()).iterator():
+        expected = (units, revenue.quantize(CENT))
+        actual = stored.pop((day, staff_id, medicine_id), None)
+        if actual != expected:
+            yield day, staff_id, medicine_id, expected, actual
+    for (day, staff_id, medicine_id), actual in stored.items():
+        yield day, staff_id, medicine_id, None, actual
@@ -0,0 +1,120 @@
+"""
+Read replica routing for the dashboard and report endpoints.
+
+``ReplicaRouter`` sends reads made inside a ``@replica_reads`` view handler to
+the ``REPLICA_DATABASE`` alias; every other read, and every write, goes to the
+primary. Views opt in per handler, so billing, user management and medicine
+writes never see the replica, and authentication, which runs before the
+handler, keeps reading token revocations from the primary. Rows a handler
+streams after returning are read from the replica as well.
+
+The replica is used only while it is at most ``REPLICA_LAG_TOLERANCE``
+seconds behind. Its lag is the age of its copy of ``ReplicaHeartbeat``, which
+``sync_replica`` stamps on the primary. Each process checks it at most once
+every ``LAG_CHECK_SECONDS``; a replica that is not configured, unreachable or
+too far behind sends reads back to the primary until the next check.
+"""
+import contextvars
+import functools
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils import timezone
+
+from api.models import ReplicaHeartbeat
+
+# Alias the current handler reads from; None reads from the primary.
+reads_from = contextvars.ContextVar("reads_from", default=None)
+
+LAG_CHECK_SECONDS = 1.0
+
+
+def beat(using=DEFAULT_DB_ALIAS):
+    """Stamp the heartbeat on the primary with the current time."""
+    ReplicaHeartbeat.objects.using(using).update_or_create(pk=1, defaults={"beat_at": timezone.now()})
+
+
+def replica_lag(alias):
+    """Return how many seconds the database ``alias`` is behind the primary, or None if it cannot tell."""
+    try:
+        beat_at = ReplicaHeartbeat.objects.using(alias).values_list("beat_at", flat=True).first()
+    except DatabaseError:
+        return None
+    return None if beat_at is None else (timezone.now() - beat_at).total_seconds()
+
+
+class ReplicaMonitor:
+    """Caches, per process, whether the replica is recent enough to read from."""
+
+    def __init__(self):
+        self.checked_at = None
+        self.usable = False
+
+    def reset(self):
+        self.checked_at = None
+
+    def alias(self):
+        """Return ``REPLICA_DATABASE`` if it is configured and within the lag tolerance, else None."""
+        alias = settings.REPLICA_DATABASE
+        if alias not in settings.DATABASES:
+            return None
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= LAG_CHECK_SECONDS:
+            lag = replica_lag(alias)
+            self.usable = lag is not None and lag <= settings.REPLICA_LAG_TOLERANCE
+            self.checked_at = now
+        return alias if self.usable else None
+
+
+monitor = ReplicaMonitor()
+
+
+def read_from(alias, iterable):
+    """Iterate ``iterable`` with its reads going to ``alias``."""
+    iterator = iter(iterable)
+    while True:
+        token = reads_from.set(alias)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            reads_from.reset(token)
+        yield item
+
+
+def replica_reads(handler):
+    """Run a view handler, and any body it streams, with its reads going to the replica when it is usable."""
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        alias = monitor.alias()
+        if alias is None:
+            return handler(view, request, *args, **kwargs)
+        token = reads_from.set(alias)
+        try:
+            response = handler(view, request, *args, **kwargs)
+        finally:
+            reads_from.reset(token)
+        if response.streaming:
+            response.streaming_content = read_from(alias, response.streaming_content)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Routes reads inside ``replica_reads`` to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return reads_from.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the primary's rows, so objects read from either can be related.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica is a copy of the primary, schema included.
+        return db != settings.REPLICA_DATABASE
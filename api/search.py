@@ -0,0 +1,101 @@
+"""
+Medicine search backed by the ``api_medicine_fts`` FTS5 table.
+
+The table is an external-content index over ``api_medicine`` (name,
+description, category) created by migration 0008. Triggers on
+``api_medicine`` keep it in sync for every write, including bulk and raw
+SQL ones; stock updates do not touch it. Each search term is matched as a
+prefix, so "para tab" finds "Paracetamol 500mg Tablet", and results are
+ranked by BM25 with name matches weighted above category and description.
+
+Every match is ranked, with FTS5's ``ORDER BY rank LIMIT n``, which keeps only
+the best ``n`` while it scores. BM25 costs about two microseconds per matching
+row: a few milliseconds for a typical typeahead prefix over 100k medicines,
+about 100ms for a one-letter prefix matching half of them.
+
+On databases other than SQLite the search falls back to ``icontains``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from api.models import Medicine
+
+FTS_TABLE = "api_medicine_fts"
+# BM25 weights for the name, description and category columns.
+RANK_WEIGHTS = (10.0, 1.0, 4.0)
+MAX_TERMS = 8
+
+TERM_RE = re.compile(r"\w+")
+
+RANK_FUNCTION = f"bm25({', '.join(map(str, RANK_WEIGHTS))})"
+SEARCH_SQL = (
+    f"SELECT m.* FROM ("
+    f"SELECT rowid AS id, rank AS score FROM {FTS_TABLE} "
+    f"WHERE {FTS_TABLE} MATCH %s AND rank MATCH %s ORDER BY rank LIMIT %s"
+    f") hit JOIN api_medicine m ON m.id = hit.id ORDER BY hit.score, hit.id"
+)
+
+
+def search_terms(query):
+    return TERM_RE.findall(query)[:MAX_TERMS]
+
+
+def search_medicines(query, limit):
+    """Return up to ``limit`` medicines matching every term of ``query``, best first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor != "sqlite":
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(description__icontains=term) | Q(category__icontains=term)
+        return list(Medicine.objects.filter(condition).order_by("name", "id")[:limit])
+    # Quoted so terms are never parsed as FTS5 operators; the trailing * makes each a prefix query.
+    expression = " ".join(f'"{term}"*' for term in terms)
+    return list(Medicine.objects.raw(SEARCH_SQL, [expression, RANK_FUNCTION, limit]))
+
+
+TRIGGER_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON api_medicine BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON api_medicine BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name, description, category ON api_medicine
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+]
+
+
+def install_triggers(using=connection):
+    """
+    (Re)create any missing sync triggers. SQLite drops them whenever Django
+    rebuilds ``api_medicine`` in a migration; such migrations recreate them
+    from their own copy of the SQL, as 0009 does, rather than calling this.
+    """
+    if using.vendor == "sqlite":
+        with using.cursor() as cursor:
+            for statement in TRIGGER_SQL:
+                cursor.execute(statement)
+
+
+def rebuild_index():
+    """Recreate missing sync triggers and re-derive the whole index from ``api_medicine``."""
+    install_triggers()
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, DateField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.urls import reverse
 
-from api.models import Medicine, Bill
+from api.alerts import raise_low_stock, refresh as refresh_alerts
+from api.cache import invalidate_catalog, invalidate_stock_on_commit, medicine_catalog
+from api.lots import adjust as adjust_lots, consume as consume_lots, receive as receive_lots
+from api.models import Medicine, Bill, Invoice, ReportJob, StockLot
+from api.projections import Projection
+from api.rollup import add_bills
 
 User = get_user_model()
 
@@ -31,6 +40,114 @@ class MedicineSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return Medicine.objects.create(**validated_data)
 
+
+medicine_rows = Projection(MedicineSerializer)
+
+
+class MedicineImportSerializer(MedicineSerializer):
+    """Validates one imported row; ``name`` may already exist since rows are upserted."""
+    class Meta(MedicineSerializer.Meta):
+        extra_kwargs = {'name': {'validators': []}}
+
+
+class StockLotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockLot
+        fields = ['id', 'batch_number', 'expiry_date', 'quantity', 'received_at']
+        read_only_fields = ['received_at']
+        extra_kwargs = {'quantity': {'min_value': 1}}
+
+    def create(self, validated_data):
+        """Receive the lot, topping up an earlier delivery of the same batch."""
+        medicine = validated_data['medicine']
+        receive_lots([(medicine.id, validated_data['batch_number'], validated_data['expiry_date'],
+                       validated_data['quantity'])])
+        invalidate_stock_on_commit()
+        return StockLot.objects.get(medicine=medicine, batch_number=validated_data['batch_number'])
+
+
+IMPORT_CHUNK_SIZE = 500
+
+
+def count_rows(rowcounts):
+    """Execute wrapper appending the ``rowcount`` of every statement it runs to ``rowcounts``."""
+    def wrapper(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        rowcounts.append(context['cursor'].rowcount)
+        return result
+    return wrapper
+
+
+def import_medicines(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Upsert medicines by their unique ``name``.
+
+    Every row is validated independently so a bad row is reported without
+    aborting the rest. Valid rows are written per chunk: names missing from
+    the table are inserted with no stock, ignoring any that a concurrent
+    import inserts first, and then every row of the chunk is locked, read
+    and brought to its imported values with one ``bulk_update``. A racing
+    import therefore turns an insert into an update instead of failing on the
+    unique name, and the imported stock is always applied as a change to the
+    stock read under the lock. Returns the created and updated counts and a
+    list of ``{"row": index, "errors": ...}``.
+    """
+    validator = MedicineImportSerializer()
+    valid, errors, seen = [], [], set()
+    for index, row in enumerate(rows):
+        try:
+            data = validator.run_validation(row)
+        except serializers.ValidationError as exc:
+            errors.append({"row": index, "errors": exc.detail})
+            continue
+        if data['name'] in seen:
+            errors.append({"row": index, "errors": {"name": ["Duplicate name in this import."]}})
+            continue
+        seen.add(data['name'])
+        valid.append(data)
+
+    fields = [name for name in validator.fields if name not in ('id', 'name')]
+    created = updated = 0
+    with transaction.atomic():
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            names = [data['name'] for data in chunk]
+            existing = set(Medicine.objects.filter(name__in=names).values_list('name', flat=True))
+            # Inserted without stock, so that the update pass below counts all of it into lots.
+            # The rows a concurrent import inserted first are ignored, and left out of rowcount.
+            inserted = []
+            with connection.execute_wrapper(count_rows(inserted)):
+                Medicine.objects.bulk_create(
+                    [Medicine(**{**data, 'stock': 0}) for data in chunk if data['name'] not in existing],
+                    ignore_conflicts=True,
+                )
+            medicines = Medicine.objects.filter(name__in=names)
+            locked = {medicine.name: medicine for medicine in medicines.select_for_update()}
+            previous_stock, changed = {}, []
+            for data in chunk:
+                medicine = locked[data['name']]
+                previous_stock[medicine.id] = medicine.stock
+                for field in fields:
+                    if field in data:
+                        setattr(medicine, field, data[field])
+                changed.append(medicine)
+            Medicine.objects.bulk_update(changed, fields)
+
+            # Imported stock is a stock count for the lots.
+            counts = [
+                (medicine.id, medicine.stock - previous_stock[medicine.id], medicine.expiry_date)
+                for medicine in changed if medicine.stock != previous_stock[medicine.id]
+            ]
+            adjust_lots(counts)
+            refresh_alerts(medicines)
+            created += sum(inserted)
+            updated += len(chunk) - sum(inserted)
+        # bulk_create and bulk_update bypass the Medicine post_save signal.
+        invalidate_stock_on_commit()
+        invalidate_catalog()
+    return created, updated, errors
+
+
 class BillSerializer(serializers.ModelSerializer):
     medicine_id = serializers.IntegerField()
     staff = UserSerializer(required = False)
@@ -41,9 +158,9 @@ class BillSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         medicine_id = validated_data.pop('medicine_id')
-        try:
-            medicine = Medicine.objects.get(id=medicine_id)
-        except Medicine.DoesNotExist:
+        # Price and packaging come from the in-process catalog; stock is checked on the row below.
+        medicine = medicine_catalog.get(medicine_id)
+        if medicine is None:
             raise serializers.ValidationError({"medicine_id": "Medicine not found."})
 
         # Get the correct price based on packaging type
@@ -56,23 +173,195 @@ class BillSerializer(serializers.ModelSerializer):
 
         # Auto-calculate total price
         total_price = price_per_unit * quantity
-        validated_data['medicine'] = medicine
+        validated_data['medicine_id'] = medicine.id
         validated_data['total_price'] = total_price
-        return super().create(validated_data)
+        validated_data['rolled_up'] = True
+
+        with transaction.atomic():
+            # Single conditional UPDATE: concurrent sales can never drive stock below zero.
+            sold = Medicine.objects.filter(id=medicine.id, stock__gte=quantity).update(stock=F('stock') - quantity)
+            if not sold or consume_lots({medicine.id: quantity}):
+                raise serializers.ValidationError({"quantity": "Insufficient stock."})
+            invalidate_stock_on_commit()
+            bill = super().create(validated_data)
+            add_bills([bill])
+            raise_low_stock([medicine.id])
+            return bill
 
     def get_medicine_id(self, obj):
         return obj.medicine.id
 
 
+class BillLineSerializer(serializers.ModelSerializer):
+    medicine_id = serializers.IntegerField()
+
+    class Meta:
+        model = Bill
+        fields = ['medicine_id', 'quantity', 'packaging_type', 'total_price']
+        read_only_fields = ['total_price']
+
+
+class InvoiceSerializer(serializers.ModelSerializer):
+    """
+    A whole cart sold in one request. Medicines are resolved from the catalog
+    cache (misses in one ``id__in`` query), stock for every line is decremented
+    by one conditional UPDATE and taken from lots first-expiry-first-out, and
+    the lines are written with ``bulk_create``, all in a single transaction.
+    """
+    items = BillLineSerializer(many=True, source='lines')
+
+    class Meta:
+        model = Invoice
+        fields = ['id', 'staff', 'items', 'total_price', 'created_at']
+        read_only_fields = ['staff', 'total_price', 'created_at']
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("At least one item is required.")
+        medicine_ids = [item['medicine_id'] for item in items]
+        if len(set(medicine_ids)) != len(medicine_ids):
+            raise serializers.ValidationError("Each medicine may appear only once.")
+        return items
+
+    def create(self, validated_data):
+        items = validated_data.pop('lines')
+        staff_id = validated_data['staff_id']
+        medicines = medicine_catalog.get_many([item['medicine_id'] for item in items])
+
+        errors = []
+        for item in items:
+            medicine = medicines.get(item['medicine_id'])
+            if medicine is None:
+                errors.append({"medicine_id": "Medicine not found."})
+            elif medicine.packaging_type != item['packaging_type']:
+                errors.append({"packaging_type": "Invalid packaging type or price not set."})
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError({"items": errors})
+
+        lines = [
+            Bill(
+                staff_id=staff_id,
+                medicine_id=item['medicine_id'],
+                quantity=item['quantity'],
+                packaging_type=item['packaging_type'],
+                total_price=medicines[item['medicine_id']].price * item['quantity'],
+                rolled_up=True,
+            )
+            for item in items
+        ]
+        quantities = {line.medicine_id: line.quantity for line in lines}
+        needed = Case(
+            *[When(id=medicine_id, then=Value(quantity)) for medicine_id, quantity in quantities.items()],
+            output_field=IntegerField(),
+        )
+
+        with transaction.atomic():
+            sold = Medicine.objects.filter(id__in=quantities, stock__gte=needed).update(stock=F('stock') - needed)
+            if sold != len(quantities):
+                stock = dict(Medicine.objects.filter(id__in=quantities).values_list('id', 'stock'))
+                raise serializers.ValidationError({"items": [
+                    {"quantity": "Insufficient stock."} if stock.get(line.medicine_id, 0) < line.quantity else {}
+                    for line in lines
+                ]})
+            missing = consume_lots(quantities)
+            if missing:
+                raise serializers.ValidationError({"items": [
+                    {"quantity": "Insufficient stock."} if line.medicine_id in missing else {} for line in lines
+                ]})
+
+            invoice = Invoice.objects.create(staff_id=staff_id, total_price=sum(line.total_price for line in lines))
+            for line in lines:
+                line.invoice = invoice
+            Bill.objects.bulk_create(lines)
+            add_bills(lines)
+            raise_low_stock(quantities)
+            invalidate_stock_on_commit()
+
+        # Serve ``invoice.lines`` from the rows just written instead of re-reading them.
+        invoice._prefetched_objects_cache = {'lines': lines}
+        return invoice
+
+
 class StockAvailabilitySerializer(serializers.ModelSerializer):
     class Meta:
         model = Medicine
         fields = ["id", "name", "stock"]
 
+
+stock_rows = Projection(StockAvailabilitySerializer)
+
+
 class SalesReportSerializer(serializers.ModelSerializer):
     staff_name = serializers.CharField(source="staff.username", read_only=True)
     medicine_name = serializers.CharField(source="medicine.name", read_only=True)
 
     class Meta:
         model = Bill
-        fields = ["id", "staff_name", "medicine_name", "quantity", "packaging_type", "total_price", "created_at"]
\ No newline at end of file
+        fields = ["id", "staff_name", "medicine_name", "quantity", "packaging_type", "total_price", "created_at"]
+
+
+# Sales report rows built from one joined projection, without loading Bill, staff or medicine instances.
+sales_report_rows = Projection(SalesReportSerializer)
+
+
+REPORT_PERIODS = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+REPORT_GROUPINGS = {
+    "staff": {"staff_id": "staff_id", "staff_name": "staff__username"},
+    "medicine": {"medicine_id": "medicine_id", "medicine_name": "medicine__name"},
+    "category": {"category": "medicine__category"},
+}
+
+
+def sales_report_totals(sales, period, group_by=None):
+    """
+    Roll ``DailySales`` rows up into units sold and revenue per period,
+    optionally crossed with staff, medicine or medicine category.
+
+    The grouping and summing run in the database over the daily rollup, so a
+    report reads at most one row per day, staff member and medicine.
+    """
+    trunc = REPORT_PERIODS[period]
+    group_fields = REPORT_GROUPINGS[group_by] if group_by else {}
+    revenue_field = serializers.DecimalField(max_digits=None, decimal_places=2)
+    period_field = serializers.DateField()
+
+    lookups = ["period", *group_fields.values()]
+    rows = (
+        sales.annotate(period=trunc("date", output_field=DateField()))
+        .values(*lookups)
+        .annotate(total_units=Sum("units"), total_revenue=Sum("revenue"))
+        .order_by(*lookups)
+        .values_list(*lookups, "total_units", "total_revenue")
+    )
+    for period_start, *group_values, units, revenue in rows:
+        row = {"period": period_field.to_representation(period_start)}
+        row.update(zip(group_fields.keys(), group_values))
+        row["units"] = units
+        row["revenue"] = revenue_field.to_representation(revenue)
+        yield row
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """A report job's progress, with the link to its file once it is done."""
+    url = serializers.SerializerMethodField()
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ["id", "status", "params", "export", "error", "created_at", "started_at", "finished_at",
+                  "url", "result_url"]
+
+    def get_url(self, job):
+        return self.context["request"].build_absolute_uri(reverse("report-job-detail", args=[job.pk]))
+
+    def get_result_url(self, job):
+        if job.status != ReportJob.DONE:
+            return None
+        return self.context["request"].build_absolute_uri(reverse("report-job-result", args=[job.pk]))
@@ -0,0 +1,99 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from api.alerts import refresh as refresh_alerts
+from api.authentication import revoke_tokens
+from api.cache import invalidate_catalog, invalidate_stock_on_commit
+from api.lots import adjust as adjust_lots
+from api.metrics import record_query
+from api.rollup import replace_bill as replace_bill_in_rollup
+from api.models import Bill, CustomUser, Medicine
+from api.sqlite import configure as configure_connection
+
+# Changing any of these invalidates the user's outstanding tokens.
+TOKEN_SENSITIVE_FIELDS = ("role", "is_active", "password")
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """Tune the new connection, and attribute its queries to the request being measured, if any."""
+    configure_connection(connection)
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(post_save, sender=Medicine)
+@receiver(post_delete, sender=Medicine)
+def medicine_changed(sender, **kwargs):
+    """Drop cached stock pages and catalog entries whenever a medicine is written or removed."""
+    invalidate_stock_on_commit()
+    invalidate_catalog()
+
+
+@receiver(pre_save, sender=Medicine)
+def medicine_saving(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._previous_stock = 0
+    elif update_fields is None or "stock" in update_fields:
+        instance._previous_stock = sender.objects.filter(pk=instance.pk).values_list("stock", flat=True).first()
+
+
+@receiver(post_save, sender=Medicine)
+def medicine_saved(sender, instance, raw=False, **kwargs):
+    """
+    Treat a written stock level as a stock count for the medicine's lots, then
+    raise or clear its alerts to match its stock, reorder level and expiry.
+    """
+    if raw:
+        return
+    previous_stock = getattr(instance, "_previous_stock", None)
+    instance._previous_stock = None
+    if previous_stock is not None and instance.stock != previous_stock:
+        adjust_lots([(instance.pk, instance.stock - previous_stock, instance.expiry_date)])
+        instance.refresh_from_db(fields=["expiry_date"])
+    refresh_alerts(sender.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=Bill)
+def bill_saving(sender, instance, raw=False, **kwargs):
+    if instance._state.adding or raw:
+        instance._previous_bill = None
+    else:
+        instance._previous_bill = sender.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Bill)
+def bill_saved(sender, instance, **kwargs):
+    """Keep the daily sales rollup in step with an edited bill."""
+    previous = getattr(instance, "_previous_bill", None)
+    instance._previous_bill = None
+    if previous is not None:
+        replace_bill_in_rollup(previous, instance)
+
+# Deleted bills leave the rollup through Bill.delete() and BillQuerySet.delete()
+# rather than a delete signal, which would stop cascades from fast-deleting them.
+
+
+@receiver(pre_save, sender=CustomUser)
+def user_changing(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*TOKEN_SENSITIVE_FIELDS).first()
+    instance._revoke_tokens = previous is not None and any(
+        previous[field] != getattr(instance, field) for field in TOKEN_SENSITIVE_FIELDS
+    )
+
+
+@receiver(post_save, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    """Revoke tokens when the role, active flag or password of a user changes."""
+    if getattr(instance, "_revoke_tokens", False):
+        instance._revoke_tokens = False
+        revoke_tokens(instance.pk)
+        instance.refresh_from_db(fields=["token_version"])
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    revoke_tokens(instance.pk)
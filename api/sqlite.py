@@ -0,0 +1,29 @@
+"""
+SQLite connection tuning.
+
+api/signals.py runs ``configure`` on every new database connection, which
+applies ``SQLITE_PRAGMAS`` to SQLite ones. In WAL mode readers and the single
+writer stop blocking each other, so reports and stock polls keep running while
+a sale commits. The busy timeout makes a writer queue for the write lock
+instead of failing with "database is locked" at once. ``synchronous=NORMAL``
+skips the fsync on every commit, which WAL makes safe against crashes, though
+not against power loss. The page cache and memory map are per connection, so
+they pay off with the persistent connections ``CONN_MAX_AGE`` keeps.
+
+Pragmas are run on the raw sqlite3 connection, outside Django's execute
+wrappers, so they are not counted as a request's queries. Read-only
+connections (``mode=ro`` URIs, such as the replica in api/routers.py) skip
+``journal_mode``, which only a writer can change.
+"""
+from django.conf import settings
+
+
+def configure(connection):
+    """Apply ``SQLITE_PRAGMAS`` to ``connection`` if it is a SQLite connection."""
+    if connection.vendor != "sqlite":
+        return
+    read_only = "mode=ro" in str(connection.settings_dict["NAME"])
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        if name == "journal_mode" and read_only:
+            continue
+        connection.connection.execute(f"PRAGMA {name} = {value}")
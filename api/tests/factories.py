@@ -27,7 +27,7 @@ class MedicineFactory(factory.django.DjangoModelFactory):
     category = factory.Faker("word")
     stock = factory.LazyFunction(lambda: random.randint(1, 100))
     expiry_date = factory.LazyFunction(
-        lambda: date.today() + timedelta(days=random.randint(30, 365)))
+        lambda: date.today() + timedelta(days=random.randint(60, 365)))
     packaging_type = factory.LazyFunction(
         lambda: random.choice([choice[0] for choice in Medicine.PACKAGING_CHOICES]))
     price = factory.LazyFunction(lambda: round(random.uniform(10.0, 500.0), 2))
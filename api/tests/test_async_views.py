@@ -0,0 +1,131 @@
+import json
+import threading
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework import status
+from api.metrics import registry
+from api.models import Bill, Medicine
+from api.reports import EXPORT_CHUNK_ROWS
+from medical_billing.asgi import application
+from api.tests.factories import UserFactory, MedicineFactory, BillFactory
+
+
+@override_settings(ROOT_URLCONF="medical_billing.asgi_urls")
+class TestAsyncReadViews(TransactionTestCase):
+    """The ASGI app serves the read endpoints from async views backed by a thread pool."""
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.admin_user = UserFactory(role="admin")
+        self.admin_user.set_password("adminpass")
+        self.admin_user.save()
+        self.aspirin = MedicineFactory(name="Aspirin", stock=50)
+        self.paracetamol = MedicineFactory(name="Paracetamol", stock=30)
+        BillFactory(staff=self.admin_user, medicine=self.aspirin, created_at=now())
+        response = self.client.post(
+            reverse("token_obtain_pair"), {"username": self.admin_user.username, "password": "adminpass"}
+        )
+        self.auth = {"AUTHORIZATION": f"Bearer {response.data['access']}"}
+
+    async def test_medicine_list_matches_sync_view(self):
+        """The async route returns the same body as the synchronous view."""
+        response = await self.async_client.get(reverse("medicines-create-list"), **self.auth)
+        sync_response = await sync_to_async(self.client.get)(
+            reverse("medicines-create-list"), HTTP_AUTHORIZATION=self.auth["AUTHORIZATION"]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, sync_response.content)
+        self.assertEqual([row["name"] for row in json.loads(response.content)["results"]], ["Aspirin", "Paracetamol"])
+
+    async def test_medicine_detail(self):
+        response = await self.async_client.get(reverse("medicines-detail", kwargs={"pk": self.aspirin.id}), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)["name"], "Aspirin")
+
+    async def test_stock_revalidation(self):
+        """ETags issued by the async stock view are honoured on the next poll."""
+        url = reverse("stock-availability")
+        response = await self.async_client.get(url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = await self.async_client.get(url, **self.auth, IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_report_export(self):
+        """Exports run their queries on the pool rather than on the event loop."""
+        # Django 3.2's AsyncClient ignores ``data`` on GET, so the query goes in the path.
+        response = await self.async_client.get(reverse("sales-reports") + "?export=ndjson", **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join([chunk async for chunk in response.pooled_content]).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])["medicine_name"], "Aspirin")
+
+    async def test_export_is_sent_as_it_streams(self):
+        """The ASGI app sends an export chunk by chunk instead of collecting it first."""
+        await sync_to_async(Bill.objects.bulk_create)([
+            Bill(staff=self.admin_user, medicine=self.aspirin, quantity=1, packaging_type="box",
+                 total_price=Decimal("1.00"), created_at=now())
+            for _ in range(2 * EXPORT_CHUNK_ROWS)
+        ])
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": reverse("sales-reports"), "raw_path": reverse("sales-reports").encode(),
+            "query_string": b"export=ndjson", "root_path": "", "server": ("testserver", 80), "client": None,
+            "headers": [(b"authorization", self.auth["AUTHORIZATION"].encode())],
+        }
+        sent, streaming = [], []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message.get("body") and not streaming:
+                # The first chunk goes out while the rest are still being produced.
+                streaming.append(any(thread.name.startswith("async-stream") for thread in threading.enumerate()))
+            sent.append(message)
+
+        await application(scope, receive, send)
+
+        self.assertEqual(sent[0]["status"], status.HTTP_200_OK)
+        self.assertEqual(streaming, [True])
+        bodies = [message.get("body", b"") for message in sent[1:]]
+        self.assertGreater(len([body for body in bodies if body]), 1)
+        self.assertEqual(b"".join(bodies).count(b"\n"), 2 * EXPORT_CHUNK_ROWS + 1)
+
+    async def test_writes_are_not_run_on_the_read_pool(self):
+        """Writes to an async route run on Django's shared sync thread, as under the sync routes."""
+        threads = []
+
+        def record_thread(**kwargs):
+            threads.append(threading.current_thread().name)
+
+        post_save.connect(record_thread, sender=Medicine)
+        self.addCleanup(post_save.disconnect, record_thread, sender=Medicine)
+        response = await self.async_client.patch(
+            reverse("medicines-detail", kwargs={"pk": self.aspirin.id}), {"stock": 45},
+            content_type="application/json", **self.auth
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)["data"]["stock"], 45)
+        self.assertEqual(len(threads), 1)
+        self.assertFalse(threads[0].startswith("async-view"), threads)
+
+    async def test_permissions_still_apply(self):
+        response = await self.async_client.get(reverse("sales-reports"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_queries_on_pool_threads_are_measured(self):
+        """Request metrics include the queries the view ran on a pool thread."""
+        await self.async_client.get(reverse("medicines-create-list"), **self.auth)
+        body = registry.render()
+        self.assertIn('api_request_db_queries_count{route="medicines-create-list"} 1', body)
+        self.assertNotIn('api_request_db_queries_sum{route="medicines-create-list"} 0', body)
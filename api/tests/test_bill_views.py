@@ -1,7 +1,14 @@
-from rest_framework.test import APITestCase
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from django.urls import reverse
-from api.models import Bill
+from api.cache import CATALOG_VERSION_KEY, versions
+from api.models import Bill, CacheVersion, Medicine
 from api.tests.factories import BillFactory, UserFactory, MedicineFactory
 
 
@@ -42,6 +49,114 @@ class TestBillCreateView(APITestCase):
         self.assertEqual(response.data["staff"]["id"], self.staff_user.id)
         self.assertEqual(response.data["medicine_id"], self.medicine.id)
 
+    def test_bill_decrements_stock(self):
+        """Ensure a sale reduces the medicine stock by the quantity sold."""
+        stock = self.medicine.stock
+        payload = {
+            "medicine_id": self.medicine.id,
+            "quantity": 1,
+            "packaging_type": self.medicine.packaging_type,
+        }
+
+        response = self.client.post(
+            self.bill_create_url,
+            payload,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.stock, stock - 1)
+
+    def test_bill_rejected_when_out_of_stock(self):
+        """Ensure a sale larger than the stock fails and leaves stock untouched."""
+        stock = self.medicine.stock
+        payload = {
+            "medicine_id": self.medicine.id,
+            "quantity": stock + 1,
+            "packaging_type": self.medicine.packaging_type,
+        }
+
+        response = self.client.post(
+            self.bill_create_url,
+            payload,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("quantity", response.data)
+        self.assertEqual(Bill.objects.count(), 0)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.stock, stock)
+
+    def test_repeat_sales_read_medicine_from_catalog(self):
+        """Ensure price and packaging are served from the catalog after the first sale."""
+        payload = {
+            "medicine_id": self.medicine.id,
+            "quantity": 1,
+            "packaging_type": self.medicine.packaging_type,
+        }
+        self.client.post(self.bill_create_url, payload, format="json", HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.bill_create_url,
+                payload,
+                format="json",
+                HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        medicine_selects = [
+            query["sql"] for query in queries
+            if query["sql"].startswith("SELECT") and 'FROM "api_medicine"' in query["sql"]
+        ]
+        self.assertEqual(medicine_selects, [])
+
+    def test_catalog_picks_up_price_changes(self):
+        """Ensure a saved price change is used by the next sale."""
+        payload = {
+            "medicine_id": self.medicine.id,
+            "quantity": 2,
+            "packaging_type": self.medicine.packaging_type,
+        }
+        self.client.post(self.bill_create_url, payload, format="json", HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+
+        self.medicine.price = "7.25"
+        self.medicine.save()
+
+        response = self.client.post(
+            self.bill_create_url,
+            payload,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+        self.assertEqual(response.data["total_price"], "14.50")
+
+    def test_catalog_picks_up_price_changes_made_by_another_process(self):
+        """Ensure a price changed by another worker is used once this one re-reads the catalog version."""
+        payload = {
+            "medicine_id": self.medicine.id,
+            "quantity": 2,
+            "packaging_type": self.medicine.packaging_type,
+        }
+        self.client.post(self.bill_create_url, payload, format="json", HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+
+        # The other worker's writes reach this process through the database only.
+        Medicine.objects.filter(pk=self.medicine.pk).update(price="7.25")
+        CacheVersion.objects.filter(name=CATALOG_VERSION_KEY).update(version=uuid4().hex)
+        versions.reset()  # this process's copy of the version has aged out
+
+        response = self.client.post(
+            self.bill_create_url,
+            payload,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+        self.assertEqual(response.data["total_price"], "14.50")
+
     def test_non_staff_cannot_create_bill(self):
         """Ensure non-staff users cannot create a bill."""
         non_staff_user = UserFactory(role="admin")
@@ -81,3 +196,41 @@ class TestBillCreateView(APITestCase):
         response = self.client.post(self.bill_create_url, payload)
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestBillStockConcurrency(TransactionTestCase):
+    """Concurrent sales against one medicine must never oversell it."""
+
+    def setUp(self):
+        self.staff_user = UserFactory(role="staff")
+        self.staff_user.set_password("testpass")
+        self.staff_user.save()
+        self.medicine = MedicineFactory(stock=20)
+
+        response = APIClient().post(
+            reverse("token_obtain_pair"),
+            {"username": self.staff_user.username, "password": "testpass"},
+        )
+        self.staff_token = response.data.get("access")
+
+    def sell_one(self, _):
+        try:
+            response = APIClient().post(
+                reverse("create-bill"),
+                {"medicine_id": self.medicine.id, "quantity": 1, "packaging_type": self.medicine.packaging_type},
+                format="json",
+                HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+            )
+            return response.status_code
+        finally:
+            connection.close()
+
+    def test_concurrent_sales_never_drive_stock_negative(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(self.sell_one, range(40)))
+
+        self.medicine.refresh_from_db()
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 20)
+        self.assertEqual(statuses.count(status.HTTP_400_BAD_REQUEST), 20)
+        self.assertEqual(self.medicine.stock, 0)
+        self.assertEqual(Bill.objects.filter(medicine=self.medicine).count(), 20)
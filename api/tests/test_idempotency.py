@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from api.models import Bill, Medicine
+from api.tests.factories import MedicineFactory, UserFactory
+
+
+class TestIdempotentBilling(APITestCase):
+    """A billing POST repeated with the same Idempotency-Key replays the first response."""
+
+    def setUp(self):
+        caches["idempotency"].clear()
+        self.staff_user = UserFactory(role="staff")
+        self.medicine = MedicineFactory(stock=10)
+        self.client.force_authenticate(user=self.staff_user)
+
+    def sell(self, quantity, key="till-1:0001"):
+        return self.client.post(
+            reverse("create-bill"),
+            {"medicine_id": self.medicine.id, "quantity": quantity, "packaging_type": self.medicine.packaging_type},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_response_without_selling_again(self):
+        first = self.sell(2)
+        with self.assertNumQueries(0):
+            retry = self.sell(2)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Bill.objects.filter(medicine=self.medicine).count(), 1)
+        self.assertEqual(Medicine.objects.get(pk=self.medicine.pk).stock, 8)
+
+    def test_rejected_sale_is_replayed(self):
+        first = self.sell(11)
+        self.medicine.stock = 20
+        self.medicine.save()
+        retry = self.sell(11)
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(retry.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(retry.data, first.data)
+        self.assertFalse(Bill.objects.exists())
+
+    def test_key_reused_for_different_request(self):
+        self.sell(1)
+        response = self.sell(3)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Bill.objects.count(), 1)
+
+    def test_new_key_or_other_user_sells_again(self):
+        self.sell(1)
+        self.sell(1, key="till-1:0002")
+        self.client.force_authenticate(user=UserFactory(role="staff"))
+        self.sell(1)
+        self.assertEqual(Bill.objects.count(), 3)
+
+    def test_cart_retry_is_replayed(self):
+        cart = {"items": [{"medicine_id": self.medicine.id, "quantity": 3,
+                           "packaging_type": self.medicine.packaging_type}]}
+        for _ in range(2):
+            response = self.client.post(reverse("create-invoice"), cart, format="json", HTTP_IDEMPOTENCY_KEY="cart-1")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Medicine.objects.get(pk=self.medicine.pk).stock, 7)
+
+    def test_oversized_key_is_rejected(self):
+        response = self.sell(1, key="k" * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Bill.objects.exists())
+
+
+class TestIdempotentBillingConcurrency(TransactionTestCase):
+    """Concurrent submits of one Idempotency-Key run the sale once."""
+
+    def setUp(self):
+        caches["idempotency"].clear()
+        self.staff_user = UserFactory(role="staff")
+        self.medicine = MedicineFactory(stock=20)
+
+    def submit(self, _):
+        client = APIClient()
+        client.force_authenticate(user=self.staff_user)
+        try:
+            response = client.post(
+                reverse("create-bill"),
+                {"medicine_id": self.medicine.id, "quantity": 1, "packaging_type": self.medicine.packaging_type},
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="till-2:0001",
+            )
+            return response.status_code, response.get("Idempotent-Replayed")
+        finally:
+            connection.close()
+
+    def test_duplicates_collapse_into_one_sale(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(self.submit, range(8)))
+
+        self.assertEqual([code for code, _ in results], [status.HTTP_201_CREATED] * 8)
+        self.assertEqual(sum(replayed == "true" for _, replayed in results), 7)
+        self.assertEqual(Bill.objects.count(), 1)
+        self.assertEqual(Medicine.objects.get(pk=self.medicine.pk).stock, 19)
@@ -0,0 +1,102 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.models import Bill, Invoice
+from api.tests.factories import MedicineFactory, UserFactory
+
+
+class TestInvoiceCreateView(APITestCase):
+    """Test cases for the multi-line cart billing API."""
+
+    def setUp(self):
+        self.staff_user = UserFactory(role="staff")
+        self.staff_user.set_password("testpass")
+        self.staff_user.save()
+
+        self.aspirin = MedicineFactory(name="Aspirin", stock=10, price=2.50)
+        self.paracetamol = MedicineFactory(name="Paracetamol", stock=5, price=4.00)
+        self.invoice_create_url = reverse("create-invoice")
+
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": self.staff_user.username, "password": "testpass"},
+        )
+        self.staff_token = response.data.get("access")
+
+    def cart(self, *lines):
+        return {"items": [
+            {"medicine_id": medicine.id, "quantity": quantity, "packaging_type": medicine.packaging_type}
+            for medicine, quantity in lines
+        ]}
+
+    def test_staff_can_bill_a_cart(self):
+        """Ensure a cart creates one invoice with a bill line per item and decrements stock."""
+        with self.assertNumQueries(12):
+            response = self.client.post(
+                self.invoice_create_url,
+                self.cart((self.aspirin, 2), (self.paracetamol, 3)),
+                format="json",
+                HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["staff"], self.staff_user.id)
+        self.assertEqual(response.data["total_price"], "17.00")
+        self.assertEqual([item["total_price"] for item in response.data["items"]], ["5.00", "12.00"])
+
+        invoice = Invoice.objects.get()
+        self.assertEqual(invoice.lines.count(), 2)
+        self.aspirin.refresh_from_db()
+        self.paracetamol.refresh_from_db()
+        self.assertEqual((self.aspirin.stock, self.paracetamol.stock), (8, 2))
+
+    def test_cart_rejected_when_any_line_is_out_of_stock(self):
+        """Ensure one short line fails the whole cart and no stock is taken."""
+        response = self.client.post(
+            self.invoice_create_url,
+            self.cart((self.aspirin, 2), (self.paracetamol, 6)),
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["items"], [{}, {"quantity": "Insufficient stock."}])
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(Bill.objects.exists())
+        self.aspirin.refresh_from_db()
+        self.assertEqual(self.aspirin.stock, 10)
+
+    def test_cart_rejects_unknown_medicine(self):
+        """Ensure an unknown medicine id is reported against its line."""
+        payload = self.cart((self.aspirin, 1))
+        payload["items"].append({"medicine_id": 999999, "quantity": 1, "packaging_type": "strip"})
+
+        response = self.client.post(
+            self.invoice_create_url,
+            payload,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["items"][1], {"medicine_id": "Medicine not found."})
+
+    def test_cart_rejects_duplicate_medicines(self):
+        """Ensure the same medicine cannot appear on two lines."""
+        response = self.client.post(
+            self.invoice_create_url,
+            self.cart((self.aspirin, 1), (self.aspirin, 2)),
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_staff_cannot_bill_a_cart(self):
+        """Ensure non-staff users cannot create invoices."""
+        admin_user = UserFactory(role="admin")
+        self.client.force_authenticate(user=admin_user)
+
+        response = self.client.post(self.invoice_create_url, self.cart((self.aspirin, 1)), format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
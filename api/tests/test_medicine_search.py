@@ -0,0 +1,129 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.models import Medicine
+from api.tests.factories import UserFactory, MedicineFactory
+
+
+class TestMedicineSearchView(APITestCase):
+    """Test cases for the full-text medicine search endpoint."""
+
+    def setUp(self):
+        self.staff_user = UserFactory(role="staff")
+        self.staff_user.set_password("testpass")
+        self.staff_user.save()
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": self.staff_user.username, "password": "testpass"},
+        )
+        self.staff_token = response.data.get("access")
+        self.search_url = reverse("medicines-search")
+
+        self.paracetamol = MedicineFactory(
+            name="Paracetamol 500mg Tablet", description="Fever and pain relief", category="Analgesic")
+        self.ibuprofen = MedicineFactory(
+            name="Ibuprofen 200mg Tablet", description="Anti-inflammatory, alternative to paracetamol",
+            category="Analgesic")
+        self.amoxicillin = MedicineFactory(
+            name="Amoxicillin 250mg Capsule", description="Broad-spectrum antibiotic", category="Antibiotic")
+
+    def search(self, query, **params):
+        return self.client.get(
+            self.search_url, {"q": query, **params}, HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+    def names(self, response):
+        return [medicine["name"] for medicine in response.data["results"]]
+
+    def test_terms_match_word_prefixes(self):
+        """Each term is a prefix; all terms must match."""
+        response = self.search("amox caps")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(response), ["Amoxicillin 250mg Capsule"])
+        self.assertCountEqual(self.names(self.search("tab")), ["Ibuprofen 200mg Tablet", "Paracetamol 500mg Tablet"])
+
+    def test_name_matches_rank_above_description_matches(self):
+        """A name hit outranks the same word in another medicine's description."""
+        self.assertEqual(self.names(self.search("paracet")), ["Paracetamol 500mg Tablet", "Ibuprofen 200mg Tablet"])
+
+    def test_category_is_searchable(self):
+        self.assertEqual(self.names(self.search("antibio")), ["Amoxicillin 250mg Capsule"])
+
+    def test_index_follows_medicine_writes(self):
+        """Creates, renames, bulk writes and deletes are reflected immediately."""
+        self.amoxicillin.name = "Augmentin 625mg Tablet"
+        self.amoxicillin.save()
+        self.assertEqual(self.names(self.search("amox")), [])
+        self.assertEqual(self.names(self.search("augm")), ["Augmentin 625mg Tablet"])
+
+        Medicine.objects.bulk_create([MedicineFactory.build(name="Cetirizine 10mg Tablet")])
+        self.assertEqual(self.names(self.search("cetiri")), ["Cetirizine 10mg Tablet"])
+
+        self.paracetamol.delete()
+        self.assertEqual(self.names(self.search("paracet")), ["Ibuprofen 200mg Tablet"])
+
+    def test_stock_updates_keep_results(self):
+        Medicine.objects.filter(id=self.paracetamol.id).update(stock=0)
+        self.assertIn("Paracetamol 500mg Tablet", self.names(self.search("paracet")))
+
+    def test_operators_and_punctuation_are_treated_as_text(self):
+        """Input is never parsed as FTS5 query syntax."""
+        for query in ['para"', "para OR ibu", "NEAR(para", "para*", "-para", "para:"]:
+            response = self.search(query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, query)
+        self.assertEqual(self.names(self.search("para OR ibu")), [])
+        self.assertEqual(self.names(self.search("")), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.search("tab", limit=1).data["results"]), 1)
+        self.assertEqual(self.search("tab", limit="x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search("tab", limit=0).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_broad_prefix_ranks_every_match(self):
+        """The best match of a common prefix is found however many weaker matches were inserted before it."""
+        Medicine.objects.bulk_create([
+            Medicine(name=f"Generic {index}", description="Paediatric syrup", category="Syrup",
+                     expiry_date=date(2030, 1, 1), packaging_type="box", price=Decimal("1.00"))
+            for index in range(600)
+        ])
+        paediatric = MedicineFactory(name="Paediatric Drops", description="", category="Drops")
+
+        self.assertEqual(self.names(self.search("paed", limit=1)), [paediatric.name])
+
+    def test_rebuild_command(self):
+        call_command("rebuild_medicine_search", stdout=StringIO())
+        self.assertEqual(self.names(self.search("amox")), ["Amoxicillin 250mg Capsule"])
+
+    def test_unauthenticated_user_cannot_search(self):
+        response = self.client.get(self.search_url, {"q": "para"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestSearchTriggerMigrations(TransactionTestCase):
+    """Migrations that rebuild ``api_medicine`` leave the search index triggers in place, both ways."""
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'api_medicine'")
+            return sorted(name for name, in cursor.fetchall())
+
+    def test_migrating_back_and_forth_keeps_the_triggers(self):
+        expected = ["api_medicine_fts_delete", "api_medicine_fts_insert", "api_medicine_fts_update"]
+        self.assertEqual(self.triggers(), expected)
+        try:
+            call_command("migrate", "api", "0008_medicine_search", verbosity=0)
+            self.assertEqual(self.triggers(), expected)
+        finally:
+            call_command("migrate", "api", verbosity=0)
+        self.assertEqual(self.triggers(), expected)
+
+        medicine = MedicineFactory(name="Cetirizine 10mg Tablet")
+        self.assertEqual(list(Medicine.objects.raw(
+            "SELECT rowid AS id FROM api_medicine_fts WHERE api_medicine_fts MATCH 'cetirizine'")), [medicine])
@@ -1,7 +1,13 @@
+import json
+from base64 import urlsafe_b64encode
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
-from api.models import Medicine
+from api.models import Medicine, StockLot
 from api.tests.factories import MedicineFactory, UserFactory
 
 
@@ -40,7 +46,37 @@ class TestMedicineListCreateView(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_medicine_list_page_size_is_capped(self):
+        """Ensure the page_size query parameter cannot exceed API_MAX_PAGE_SIZE."""
+        MedicineFactory(name="Aspirin")
+        MedicineFactory(name="Ibuprofen")
+        MedicineFactory(name="Paracetamol")
+
+        with self.settings(API_MAX_PAGE_SIZE=2):
+            response = self.client.get(
+                self.medicine_list_url,
+                {"page_size": 50},
+                HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+            )
+            self.assertEqual([row["name"] for row in response.data["results"]], ["Aspirin", "Ibuprofen"])
+
+            response = self.client.get(response.data["next"], HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+            self.assertEqual([row["name"] for row in response.data["results"]], ["Paracetamol"])
+            self.assertIsNone(response.data["next"])
+
+    def test_medicine_list_rejects_tampered_cursor(self):
+        """Ensure cursor values that do not fit the name, id ordering return 404."""
+        MedicineFactory(name="Aspirin")
+        for values in (["Aspirin", "x"], ["Aspirin", None], ["Aspirin", [1]], ["Aspirin", 2 ** 70]):
+            cursor = urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(
+                self.medicine_list_url,
+                {"cursor": cursor},
+                HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
 
     def test_authenticated_user_can_create_medicine(self):
         """Ensure non-inventory managers get 403 Forbidden when adding medicine."""
@@ -183,4 +219,109 @@ class TestMedicineDetailView(APITestCase):
     def test_unauthenticated_user_cannot_access(self):
         """Ensure unauthenticated users get 401 Unauthorized."""
         response = self.client.get(self.medicine_detail_url)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class TestMedicineImportView(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.inventory_manager = UserFactory(role="inventory_manager")
+        self.staff_user = UserFactory(role="staff")
+        self.existing = MedicineFactory(name="Aspirin", stock=5, price=1.00)
+        self.import_url = reverse("medicines-import")
+
+    def row(self, name, **overrides):
+        row = {
+            "name": name,
+            "description": "Imported",
+            "category": "Painkiller",
+            "stock": 40,
+            "expiry_date": "2027-01-31",
+            "packaging_type": "strip",
+            "price": "3.50",
+        }
+        row.update(overrides)
+        return row
+
+    def test_inventory_manager_can_upsert_json_rows(self):
+        """Ensure new names are created, existing names updated and bad rows reported."""
+        self.client.force_authenticate(user=self.inventory_manager)
+        rows = [
+            self.row("Aspirin", price="2.25"),
+            self.row("Ibuprofen"),
+            self.row("Broken", price="not-a-price"),
+            self.row("Ibuprofen", stock=1),
+        ]
+
+        response = self.client.post(self.import_url, rows, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2, 3])
+        self.assertIn("price", response.data["errors"][0]["errors"])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(str(self.existing.price), "2.25")
+        self.assertEqual(Medicine.objects.get(name="Ibuprofen").stock, 40)
+        self.assertFalse(Medicine.objects.filter(name="Broken").exists())
+
+    def test_inventory_manager_can_import_csv(self):
+        """Ensure a CSV upload with a header row is imported."""
+        self.client.force_authenticate(user=self.inventory_manager)
+        header = "name,description,category,stock,expiry_date,packaging_type,price\n"
+        body = header + "".join(
+            f"Medicine {i},Imported,Antibiotic,{i},2027-06-30,box,9.99\n" for i in range(25)
+        )
+        upload = SimpleUploadedFile("prices.csv", body.encode(), content_type="text/csv")
+
+        response = self.client.post(self.import_url, {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 25)
+        self.assertEqual(response.data["errors"], [])
+        self.assertEqual(Medicine.objects.filter(category="Antibiotic").count(), 25)
+
+    def test_import_query_count_does_not_grow_per_row(self):
+        """Ensure rows are written in bulk rather than one query per row."""
+        self.client.force_authenticate(user=self.inventory_manager)
+        rows = [self.row(f"Medicine {i}") for i in range(50)] + [self.row("Aspirin")]
+
+        # Aspirin is restocked, so it gets an adjustment lot and its low-stock alert is cleared in the same pass.
+        with self.assertNumQueries(12):
+            response = self.client.post(self.import_url, rows, format="json")
+
+        self.assertEqual(response.data["created"], 50)
+        self.assertEqual(response.data["updated"], 1)
+
+    def test_name_inserted_by_a_concurrent_import_is_updated(self):
+        """Ensure a name created after the import looked it up is updated rather than failing as a duplicate."""
+        self.client.force_authenticate(user=self.inventory_manager)
+        raced = []
+
+        def concurrent_import(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            # Right after the import has looked up which names exist.
+            if sql.startswith('SELECT "api_medicine"."name" FROM') and not raced:
+                raced.append(sql)
+                MedicineFactory(name="Ibuprofen", stock=5, price="2.00")
+            return result
+
+        with connection.execute_wrapper(concurrent_import):
+            response = self.client.post(self.import_url, [self.row("Ibuprofen")], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(raced), 1)
+        # The other import created the row; this one only updated it.
+        self.assertEqual((response.data["created"], response.data["updated"]), (0, 1))
+        medicine = Medicine.objects.get(name="Ibuprofen")
+        self.assertEqual((medicine.stock, str(medicine.price)), (40, "3.50"))
+        # The other import's lot plus this one's adjustment add up to the imported count.
+        self.assertEqual(StockLot.objects.filter(medicine=medicine).aggregate(total=Sum("quantity"))["total"], 40)
+
+    def test_non_inventory_manager_cannot_import(self):
+        """Ensure other roles get 403 Forbidden."""
+        self.client.force_authenticate(user=self.staff_user)
+
+        response = self.client.post(self.import_url, [self.row("Ibuprofen")], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from api.metrics import registry
+from api.tests.factories import UserFactory, MedicineFactory
+
+class TestRequestMetrics(APITestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.client = APIClient()
+        self.staff_user = UserFactory(role="staff")
+        self.staff_user.set_password("staffpass")
+        self.staff_user.save()
+        response = self.client.post(
+            reverse("token_obtain_pair"), {"username": self.staff_user.username, "password": "staffpass"}
+        )
+        self.token = response.data["access"]
+        MedicineFactory.create_batch(3)
+
+    def get_medicines(self):
+        return self.client.get(reverse("medicines-create-list"), HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def test_metrics_are_recorded_per_route(self):
+        """Each request is counted under its URL name with its query count and response size."""
+        self.get_medicines()  # fills the token version cache
+        registry.clear()
+        medicines = self.get_medicines()
+        self.get_medicines()
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn('api_responses_total{route="medicines-create-list",status="200"} 2', body)
+        self.assertIn('api_request_duration_seconds_count{route="medicines-create-list"} 2', body)
+        self.assertIn('api_request_db_queries_bucket{route="medicines-create-list",le="1"} 2', body)
+        self.assertIn('api_request_db_queries_bucket{route="medicines-create-list",le="0"} 0', body)
+        self.assertIn(f'api_response_size_bytes_sum{{route="medicines-create-list"}} {2 * len(medicines.content)}', body)
+        self.assertIn('api_request_db_queries_sum{route="medicines-create-list"} 2', body)
+
+    def test_unmatched_paths_share_one_series(self):
+        """Unknown URLs do not create a series per path."""
+        self.client.get("/api/does-not-exist/")
+        self.client.get("/api/nor-this/")
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('api_responses_total{route="unmatched",status="404"} 2', body)
+
+    def test_metrics_require_local_client_or_admin(self):
+        """Remote clients need an admin token to read the metrics."""
+        url = reverse("metrics")
+        response = self.client.get(url, REMOTE_ADDR="10.0.0.5", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = UserFactory(role="admin")
+        admin.set_password("adminpass")
+        admin.save()
+        token = self.client.post(
+            reverse("token_obtain_pair"), {"username": admin.username, "password": "adminpass"}
+        ).data["access"]
+        response = self.client.get(url, REMOTE_ADDR="10.0.0.5", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_proxied_requests_are_not_local(self):
+        """Behind a reverse proxy on the same host, clients need an admin token too."""
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="127.0.0.1").status_code, status.HTTP_200_OK)
+        for header in ("HTTP_X_FORWARDED_FOR", "HTTP_X_REAL_IP", "HTTP_FORWARDED"):
+            response = self.client.get(url, REMOTE_ADDR="127.0.0.1", **{header: "203.0.113.7"})
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED, header)
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_are_logged_with_sql(self):
+        """Requests over the threshold are logged with the SQL of their slowest queries."""
+        with self.assertLogs("api.metrics.slow", level="WARNING") as logs:
+            self.get_medicines()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("GET /api/medicines/ (medicines-create-list)", logs.output[0])
+        self.assertIn('FROM "api_medicine"', logs.output[0])
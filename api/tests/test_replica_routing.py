@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.models import Bill, ReplicaHeartbeat
+from api.routers import ReplicaRouter, beat, monitor, read_from, reads_from
+from api.tests.factories import BillFactory, MedicineFactory, UserFactory
+
+
+# The primary stands in for the replica, so routing is observed through
+# ``reads_from`` as each query runs.
+@override_settings(REPLICA_DATABASE="default", REPLICA_LAG_TOLERANCE=30)
+class TestReplicaRouting(APITestCase):
+    """Dashboard and report reads go to a recent enough replica; everything else stays on the primary."""
+
+    def setUp(self):
+        monitor.reset()
+        self.addCleanup(monitor.reset)
+        self.admin = UserFactory(role="admin")
+        self.staff = UserFactory(role="staff")
+        self.medicine = MedicineFactory(stock=50)
+        BillFactory(staff=self.staff, medicine=self.medicine, created_at=now())
+        beat()
+
+    def routes(self, request):
+        """Return the ``reads_from`` value of every query ``request()`` runs."""
+        seen = []
+
+        def record(execute, sql, params, many, context):
+            seen.append(reads_from.get())
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = request()
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response, seen
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Bill))
+        streamed = read_from("replica", (router.db_for_read(Bill) for _ in range(2)))
+        self.assertEqual(list(streamed), ["replica", "replica"])
+        self.assertIsNone(router.db_for_read(Bill))
+        token = reads_from.set("replica")
+        try:
+            self.assertEqual(router.db_for_read(Bill), "replica")
+            self.assertEqual(router.db_for_write(Bill), "default")
+        finally:
+            reads_from.reset(token)
+
+    def test_report_reads_from_replica(self):
+        self.assertEqual(monitor.alias(), "default")
+        self.client.force_authenticate(user=self.admin)
+        for query in ({}, {"period": "day"}, {"export": "csv"}):
+            response, seen = self.routes(lambda: self.client.get(reverse("sales-reports"), query))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(seen)
+            self.assertEqual(set(seen), {"default"}, query)
+
+    def test_stock_reads_from_replica(self):
+        self.assertEqual(monitor.alias(), "default")
+        self.client.force_authenticate(user=self.admin)
+        response, seen = self.routes(lambda: self.client.get(reverse("stock-availability")))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(seen), {"default"})
+
+    def test_billing_stays_on_primary(self):
+        self.client.force_authenticate(user=self.staff)
+        response, seen = self.routes(lambda: self.client.post(reverse("create-bill"), {
+            "medicine_id": self.medicine.id, "quantity": 1, "packaging_type": self.medicine.packaging_type,
+        }, format="json"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(seen), {None})
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        ReplicaHeartbeat.objects.update(beat_at=now() - timedelta(seconds=31))
+        self.assertIsNone(monitor.alias())
+        self.client.force_authenticate(user=self.admin)
+        response, seen = self.routes(lambda: self.client.get(reverse("sales-reports")))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(seen), {None})
+
+    def test_replica_without_heartbeat_is_not_used(self):
+        ReplicaHeartbeat.objects.all().delete()
+        self.assertIsNone(monitor.alias())
+
+    @override_settings(REPLICA_DATABASE="replica")
+    def test_unconfigured_replica_is_not_used(self):
+        self.assertIsNone(monitor.alias())
@@ -0,0 +1,172 @@
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from api.models import ReportJob
+from api.report_jobs import MAX_ATTEMPTS, pool, purge_finished, submit
+from api.tests.factories import BillFactory, MedicineFactory, UserFactory
+
+
+def use_temporary_media(test):
+    media = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media, ignore_errors=True)
+    media_settings = override_settings(MEDIA_ROOT=media)
+    media_settings.enable()
+    test.addCleanup(media_settings.disable)
+
+
+@override_settings(REPORT_JOB_WORKERS=0)
+class TestReportJobs(APITestCase):
+    """Reports queued as jobs are run by the workers and downloaded once done."""
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.admin = UserFactory(role="admin")
+        self.staff = UserFactory(role="staff")
+        medicine = MedicineFactory(stock=100)
+        for quantity in (1, 2, 3):
+            BillFactory(staff=self.staff, medicine=medicine, quantity=quantity,
+                        total_price=Decimal("2.50") * quantity, created_at=now())
+        call_command("rollup_sales", stdout=StringIO())
+        self.client.force_authenticate(user=self.admin)
+
+    def queue(self, **params):
+        return self.client.post(reverse("report-jobs"), params, format="json")
+
+    def download(self, job_id):
+        response = self.client.get(reverse("report-job-result", args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_job_matches_the_direct_export(self):
+        queued = self.queue(staff_id=self.staff.id)
+        self.assertEqual(queued.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(queued.data["status"], ReportJob.PENDING)
+        self.assertEqual(queued["Location"], queued.data["url"])
+        self.assertIsNone(queued.data["result_url"])
+
+        call_command("run_report_workers", "--once", stdout=StringIO())
+        job = self.client.get(queued.data["url"]).data
+        self.assertEqual(job["status"], ReportJob.DONE)
+        self.assertTrue(job["result_url"].endswith(reverse("report-job-result", args=[job["id"]])))
+
+        direct = self.client.get(reverse("sales-reports"), {"staff_id": self.staff.id, "export": "csv"})
+        self.assertEqual(self.download(job["id"]), b"".join(direct.streaming_content))
+
+    def test_period_report_as_ndjson(self):
+        job_id = self.queue(period="day", group_by="staff", export="ndjson").data["id"]
+        pool.drain()
+        self.assertEqual(self.download(job_id).count(b"\n"), 1)
+
+    def test_identical_reports_in_flight_share_a_job(self):
+        first = self.queue(period="month", staff_id=self.staff.id)
+        second = self.queue(staff_id=str(self.staff.id), period="month")
+        other = self.queue(period="month")
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertNotEqual(first.data["id"], other.data["id"])
+
+        pool.drain()
+        # Finished jobs are not shared: the next request sees the sales made since.
+        self.assertNotEqual(self.queue(period="month", staff_id=self.staff.id).data["id"], first.data["id"])
+
+    def test_result_of_unfinished_job_is_conflict(self):
+        job_id = self.queue().data["id"]
+        response = self.client.get(reverse("report-job-result", args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["status"], ReportJob.PENDING)
+
+    def test_invalid_reports_are_not_queued(self):
+        for params in ({"period": "year"}, {"group_by": "staff"}, {"export": "xlsx"}, {"staff_id": "me"},
+                       {"start_date": "2024-13-01", "end_date": "2024-12-31"}):
+            self.assertEqual(self.queue(**params).status_code, status.HTTP_400_BAD_REQUEST, params)
+        for body in ([{"period": "day"}], "day", 1):
+            response = self.client.post(reverse("report-jobs"), body, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_only_admins_queue_and_poll(self):
+        job_id = self.queue().data["id"]
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.queue().status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(reverse("report-job-detail", args=[job_id])).status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+    def test_failed_job_records_its_error(self):
+        job, _ = submit({"period": "year"}, "csv")
+        with self.assertLogs("api.report_jobs", "ERROR"):
+            pool.drain()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.FAILED)
+        self.assertIn("year", job.error)
+
+    def test_abandoned_job_runs_again_until_its_attempts_run_out(self):
+        abandoned = now() - timedelta(hours=2)
+        retried, _ = submit({}, "csv")
+        given_up, _ = submit({"period": "day"}, "csv")
+        ReportJob.objects.filter(pk=retried.pk).update(status=ReportJob.RUNNING, started_at=abandoned, attempts=1)
+        ReportJob.objects.filter(pk=given_up.pk).update(status=ReportJob.RUNNING, started_at=abandoned,
+                                                        attempts=MAX_ATTEMPTS)
+        pool.drain()
+
+        retried.refresh_from_db()
+        given_up.refresh_from_db()
+        self.assertEqual((retried.status, retried.attempts), (ReportJob.DONE, 2))
+        self.assertEqual(given_up.status, ReportJob.FAILED)
+
+    def test_finished_jobs_are_purged_with_their_files(self):
+        old, _ = submit({}, "csv")
+        name = default_storage.save("reports/old.csv", ContentFile(b"id\n"))
+        ReportJob.objects.filter(pk=old.pk).update(status=ReportJob.DONE, result=name,
+                                                   finished_at=now() - timedelta(days=2))
+        pending, _ = submit({"period": "day"}, "csv")
+        purge_finished()
+
+        self.assertEqual(list(ReportJob.objects.values_list("id", flat=True)), [pending.id])
+        self.assertFalse(default_storage.exists(name))
+
+
+@override_settings(REPORT_JOB_WORKERS=2, REPORT_JOB_POLL_SECONDS=0.1)
+class TestReportJobWorkers(TransactionTestCase):
+    """The web process's own workers pick up submitted jobs."""
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.addCleanup(pool.stop)
+        self.admin = UserFactory(role="admin")
+        BillFactory(staff=UserFactory(role="staff"), medicine=MedicineFactory(stock=10), created_at=now())
+
+    def queue(self, _):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        try:
+            return client.post(reverse("report-jobs"), {"export": "ndjson"}, format="json").data["id"]
+        finally:
+            connection.close()
+
+    def test_concurrent_submits_share_one_job_that_the_workers_run(self):
+        with ThreadPoolExecutor(max_workers=4) as submitters:
+            job_ids = set(submitters.map(self.queue, range(4)))
+        self.assertEqual(len(job_ids), 1)
+
+        deadline = time.monotonic() + 10
+        job = ReportJob.objects.get(pk=job_ids.pop())
+        while job.status in ReportJob.IN_FLIGHT and time.monotonic() < deadline:
+            time.sleep(0.05)
+            job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.DONE)
+        self.assertEqual(job.attempts, 1)
+        with job.result.open("rb") as result:
+            self.assertEqual(result.read().count(b"\n"), 1)
@@ -1,3 +1,11 @@
+import csv
+import io
+import json
+from base64 import urlsafe_b64encode
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now, timedelta
 from rest_framework.test import APITestCase, APIClient
@@ -21,6 +29,8 @@ class TestSalesReportsAPI(APITestCase):
         self.bill1 = BillFactory(staff=self.staff_user, medicine=self.medicine, created_at=now() - timedelta(days=5))
         self.bill2 = BillFactory(staff=self.staff_user, medicine=self.medicine, created_at=now() - timedelta(days=2))
         self.bill3 = BillFactory(staff=self.admin_user, medicine=self.medicine, created_at=now())
+        # Factory bills bypass the billing API, so add them to the daily rollup the way bulk loads are.
+        call_command("rollup_sales", stdout=io.StringIO())
 
         self.sales_reports_url = reverse("sales-reports")  # Define this in your URLs
 
@@ -38,7 +48,7 @@ class TestSalesReportsAPI(APITestCase):
             HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
 
     def test_sales_reports_filtered_by_date_range(self):
         """Ensure sales reports can be filtered by date range."""
@@ -51,7 +61,16 @@ class TestSalesReportsAPI(APITestCase):
             HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_sales_reports_reject_invalid_dates(self):
+        """Ensure malformed date filters return 400 instead of failing in the query."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"start_date": "2025-02-30", "end_date": "yesterday"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_sales_reports_filtered_by_staff(self):
         """Ensure sales reports can be filtered by staff ID."""
@@ -61,7 +80,161 @@ class TestSalesReportsAPI(APITestCase):
             HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # Only bill1 and bill2 belong to the staff user
+        self.assertEqual(len(response.data["results"]), 2)  # Only bill1 and bill2 belong to the staff user
+
+    def test_sales_reports_include_staff_and_medicine_names(self):
+        """Ensure report rows carry the joined staff and medicine names."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"staff_id": self.admin_user.id},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = response.data["results"][0]
+        self.assertEqual(row["id"], self.bill3.id)
+        self.assertEqual(row["staff_name"], self.admin_user.username)
+        self.assertEqual(row["medicine_name"], "Paracetamol")
+        self.assertEqual(row["total_price"], f"{self.bill3.total_price:.2f}")
+
+    def test_sales_reports_query_count_is_constant(self):
+        """Ensure the number of queries does not grow with the number of bills."""
+        self.client.get(self.sales_reports_url, HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+        with CaptureQueriesContext(connection) as few_bills:
+            self.client.get(self.sales_reports_url, HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+
+        for i in range(10):
+            medicine = MedicineFactory(name=f"Medicine {i}")
+            BillFactory(staff=self.staff_user, medicine=medicine, created_at=now())
+
+        with CaptureQueriesContext(connection) as many_bills:
+            response = self.client.get(self.sales_reports_url, HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+
+        self.assertEqual(len(response.data["results"]), 13)
+        self.assertEqual(len(many_bills), len(few_bills))
+
+    def test_sales_reports_are_paginated_by_keyset(self):
+        """Ensure report pages follow the created_at, id ordering through the cursor."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"page_size": 2},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first_page = [row["id"] for row in response.data["results"]]
+        self.assertEqual(first_page, [self.bill1.id, self.bill2.id])
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(response.data["next"], HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.bill3.id])
+        self.assertIsNone(response.data["next"])
+
+    def test_sales_reports_reject_invalid_cursor(self):
+        """Ensure a tampered cursor returns 404."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"cursor": "not-a-cursor"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sales_reports_reject_cursor_values_of_the_wrong_type(self):
+        """Ensure a well-formed cursor whose values do not fit created_at, id returns 404."""
+        for values in (["notadate", 1], [1, 1], [now().isoformat(), "x"]):
+            cursor = urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(
+                self.sales_reports_url,
+                {"cursor": cursor},
+                HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+            )
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+    def test_sales_reports_aggregated_by_day(self):
+        """Ensure the report can be rolled up into daily totals."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"period": "day"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        bills = [self.bill1, self.bill2, self.bill3]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["period"], now().date().isoformat())
+        self.assertEqual(response.data[0]["units"], sum(bill.quantity for bill in bills))
+        self.assertEqual(response.data[0]["revenue"], f"{sum(bill.total_price for bill in bills):.2f}")
+
+    def test_sales_reports_aggregated_by_staff(self):
+        """Ensure aggregated totals can be split per staff member."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"period": "month", "group_by": "staff"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        totals = {row["staff_id"]: row["units"] for row in response.data}
+        self.assertEqual(totals, {
+            self.staff_user.id: self.bill1.quantity + self.bill2.quantity,
+            self.admin_user.id: self.bill3.quantity,
+        })
+
+    def test_sales_reports_aggregated_by_category(self):
+        """Ensure aggregated totals can be split per medicine category."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"period": "week", "group_by": "category"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["category"], self.medicine.category)
+
+    def test_sales_reports_reject_unknown_period(self):
+        """Ensure an unsupported aggregation period returns 400."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"period": "hour"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sales_reports_csv_export_is_streamed(self):
+        """Ensure the CSV export streams a header followed by one line per bill."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"export": "csv", "staff_id": self.staff_user.id},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({int(row["id"]) for row in rows}, {self.bill1.id, self.bill2.id})
+        self.assertEqual(rows[0]["medicine_name"], "Paracetamol")
+
+    def test_sales_reports_ndjson_export_is_streamed(self):
+        """Ensure the NDJSON export streams one JSON object per line."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"export": "ndjson", "period": "day"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["period"], now().date().isoformat())
+
+    def test_sales_reports_reject_unknown_export_format(self):
+        """Ensure an unsupported export format returns 400."""
+        response = self.client.get(
+            self.sales_reports_url,
+            {"export": "xlsx"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_non_admin_cannot_view_sales_reports(self):
         """Ensure non-admin users get 403 Forbidden."""
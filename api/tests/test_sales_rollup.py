@@ -0,0 +1,154 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils.timezone import localdate, now
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.models import Bill, DailySales, Invoice, Watermark
+from api.rollup import ROLLUP_WATERMARK, aggregate
+from api.tests.factories import BillFactory, MedicineFactory, UserFactory
+
+
+class TestDailySalesRollup(APITestCase):
+    """The daily sales rollup is maintained by billing and by the catch-up command."""
+
+    def setUp(self):
+        self.staff_user = UserFactory(role="staff")
+        self.staff_user.set_password("testpass")
+        self.staff_user.save()
+        self.aspirin = MedicineFactory(name="Aspirin", stock=100, price=2.50)
+        self.paracetamol = MedicineFactory(name="Paracetamol", stock=100, price=4.00)
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": self.staff_user.username, "password": "testpass"},
+        )
+        self.staff_token = response.data.get("access")
+
+    def sell(self, medicine, quantity):
+        response = self.client.post(
+            reverse("create-bill"),
+            {"medicine_id": medicine.id, "quantity": quantity, "packaging_type": medicine.packaging_type},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def rollup(self, medicine):
+        return DailySales.objects.values_list("units", "revenue").get(
+            date=localdate(), staff=self.staff_user, medicine=medicine)
+
+    def test_billing_updates_rollup_in_the_same_transaction(self):
+        """Each sale adds to its day's row; a later sale of the same medicine updates it in place."""
+        self.sell(self.aspirin, 2)
+        self.sell(self.aspirin, 3)
+        self.assertEqual(self.rollup(self.aspirin), (5, Decimal("12.50")))
+        self.assertFalse(Bill.objects.filter(rolled_up=False).exists())
+
+    def test_cart_updates_rollup(self):
+        """Every cart line lands in the rollup, and leaves it with its invoice."""
+        response = self.client.post(
+            reverse("create-invoice"),
+            {"items": [
+                {"medicine_id": medicine.id, "quantity": quantity, "packaging_type": medicine.packaging_type}
+                for medicine, quantity in ((self.aspirin, 2), (self.paracetamol, 1))
+            ]},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.rollup(self.aspirin), (2, Decimal("5.00")))
+        self.assertEqual(self.rollup(self.paracetamol), (1, Decimal("4.00")))
+
+        Invoice.objects.get().delete()
+        self.assertFalse(DailySales.objects.exists())
+
+    def test_catch_up_only_reads_bills_above_the_watermark(self):
+        """Bills written outside the API are added once; live sales are never counted twice."""
+        BillFactory(staff=self.staff_user, medicine=self.aspirin, quantity=4, total_price=Decimal("10.00"), created_at=now())
+        self.sell(self.aspirin, 1)
+        call_command("rollup_sales", stdout=StringIO())
+        self.assertEqual(self.rollup(self.aspirin), (5, Decimal("12.50")))
+        self.assertEqual(Watermark.objects.get(name=ROLLUP_WATERMARK).position, Bill.objects.latest("id").id)
+
+        with self.assertNumQueries(2):
+            call_command("rollup_sales", stdout=StringIO())
+        self.assertEqual(self.rollup(self.aspirin), (5, Decimal("12.50")))
+
+    def test_catch_up_groups_by_day_in_sql(self):
+        """Bills are grouped by SQLite's own date(), not a Python function called per row."""
+        late = now().replace(hour=23, minute=59)
+        BillFactory(staff=self.staff_user, medicine=self.aspirin, quantity=1, total_price=Decimal("2.50"), created_at=late)
+        self.assertNotIn("django_", str(aggregate(Bill.objects.all()).query))
+        self.assertEqual(list(aggregate(Bill.objects.all())),
+                         [(late.date(), self.staff_user.id, self.aspirin.id, 1, Decimal("2.50"))])
+
+    def test_verify_reports_drift_and_rebuild_repairs_it(self):
+        """The verify command diffs the rollup against the bills."""
+        self.sell(self.aspirin, 2)
+        call_command("verify_sales_rollup", stdout=StringIO())
+
+        BillFactory(staff=self.staff_user, medicine=self.paracetamol, quantity=1, total_price=Decimal("4.00"), created_at=now())
+        DailySales.objects.filter(medicine=self.aspirin).update(units=7)
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "2 rollup rows differ"):
+            call_command("verify_sales_rollup", stdout=out)
+        self.assertIn("bills give 2 units / 5.00, rollup has 7 units / 5.00", out.getvalue())
+        self.assertIn("rollup has nothing", out.getvalue())
+
+        call_command("rollup_sales", "--rebuild", stdout=StringIO())
+        call_command("verify_sales_rollup", stdout=StringIO())
+
+    def test_edited_bills_move_in_the_rollup(self):
+        """Changing a bill's amounts or medicine moves them between rollup rows."""
+        self.sell(self.aspirin, 2)
+        self.sell(self.aspirin, 1)
+        bill = Bill.objects.filter(medicine=self.aspirin).earliest("id")
+        bill.quantity, bill.total_price = 4, Decimal("10.00")
+        bill.save()
+        self.assertEqual(self.rollup(self.aspirin), (5, Decimal("12.50")))
+
+        bill.medicine, bill.total_price = self.paracetamol, Decimal("16.00")
+        bill.save()
+        self.assertEqual(self.rollup(self.aspirin), (1, Decimal("2.50")))
+        self.assertEqual(self.rollup(self.paracetamol), (4, Decimal("16.00")))
+        call_command("verify_sales_rollup", stdout=StringIO())
+
+    def test_deleted_bills_leave_the_rollup(self):
+        """Deleting bills, directly or with their medicine, leaves no trace in the rollup."""
+        self.sell(self.aspirin, 2)
+        self.sell(self.aspirin, 3)
+        self.sell(self.paracetamol, 1)
+        Bill.objects.filter(medicine=self.aspirin).earliest("id").delete()
+        self.assertEqual(self.rollup(self.aspirin), (3, Decimal("7.50")))
+
+        Bill.objects.filter(medicine=self.aspirin).delete()
+        self.assertFalse(DailySales.objects.filter(medicine=self.aspirin).exists())
+        self.paracetamol.delete()
+        self.assertFalse(DailySales.objects.exists())
+        call_command("verify_sales_rollup", stdout=StringIO())
+
+    def test_cascaded_delete_does_not_load_bills(self):
+        """A medicine's bills and rollup rows are deleted in bulk, however many bills it has."""
+        for medicine, bills in ((self.aspirin, 2), (self.paracetamol, 200)):
+            BillFactory.create_batch(bills, staff=self.staff_user, medicine=medicine, created_at=now())
+            call_command("rollup_sales", stdout=StringIO())
+            self.assertTrue(DailySales.objects.filter(medicine=medicine).exists())
+            with self.assertNumQueries(6):
+                medicine.delete()
+        self.assertFalse(Bill.objects.exists())
+
+    def test_bills_not_caught_up_yet_are_left_to_catch_up(self):
+        """A bill written outside the API is rolled up once, with its amounts at catch-up time."""
+        bill = BillFactory(staff=self.staff_user, medicine=self.aspirin, quantity=4,
+                           total_price=Decimal("10.00"), created_at=now())
+        bill.quantity, bill.total_price = 2, Decimal("5.00")
+        bill.save()
+        self.assertFalse(DailySales.objects.exists())
+
+        call_command("rollup_sales", stdout=StringIO())
+        bill.delete()
+        self.assertFalse(DailySales.objects.exists())
+        call_command("verify_sales_rollup", stdout=StringIO())
@@ -0,0 +1,48 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.test import TestCase
+
+from api.models import Bill, Medicine
+
+User = get_user_model()
+
+
+class TestSeedDataCommand(TestCase):
+    options = {"bills": 300, "medicines": 20, "staff": 5, "days": 30, "end_date": date(2025, 3, 31)}
+
+    def seed(self, **options):
+        call_command("seed_data", stdout=StringIO(), **{**self.options, **options})
+        return (
+            list(Medicine.objects.order_by("name").values_list("name", "price")),
+            Bill.objects.aggregate(total=Sum("total_price"))["total"],
+        )
+
+    def test_seed_creates_requested_volumes(self):
+        """Ensure the command creates the requested users, medicines and bills."""
+        self.seed()
+
+        self.assertEqual(User.objects.filter(role="staff").count(), 5)
+        self.assertTrue(User.objects.get(username="admin").check_password("password123"))
+        self.assertEqual(Medicine.objects.count(), 20)
+        self.assertEqual(Bill.objects.count(), 300)
+        first, last = Bill.objects.order_by("created_at").values_list("created_at", flat=True)[::299]
+        self.assertGreaterEqual(first.date().isoformat(), "2025-03-02")
+        self.assertLessEqual(last.date().isoformat(), "2025-03-31")
+
+    def test_seed_is_deterministic(self):
+        """Ensure the same seed reproduces the same dataset."""
+        first = self.seed()
+        second = self.seed(flush=True)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, self.seed(flush=True, seed=1))
+
+    def test_seed_refuses_to_overwrite_data(self):
+        """Ensure existing data is only replaced with --flush."""
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from api.models import Bill, Medicine
+from api.renderers import ORJSONRenderer
+from api.serializers import (
+    MedicineSerializer, SalesReportSerializer, StockAvailabilitySerializer, medicine_rows, sales_report_rows,
+    stock_rows,
+)
+from api.tests.factories import BillFactory, MedicineFactory
+
+
+class TestProjections(APITestCase):
+    """Projections yield exactly what their serializers would for the same rows."""
+
+    def setUp(self):
+        MedicineFactory(name="Aspirin", price=Decimal("12.50"))
+        MedicineFactory(name="Ibuprofen", price=Decimal("7"), description=None)
+        MedicineFactory(name="Paracetamol", price=Decimal("0.10"))
+        for medicine in Medicine.objects.all():
+            BillFactory(medicine=medicine, created_at=datetime(2024, 3, 1, 9, 30, tzinfo=timezone.utc))
+        BillFactory(created_at=datetime(2024, 3, 1, 9, 30, 0, 120, tzinfo=timezone.utc))
+
+    def assertProjects(self, projection, serializer_class, queryset):
+        self.assertEqual(list(projection(queryset)), serializer_class(queryset, many=True).data)
+
+    def test_medicines(self):
+        self.assertProjects(medicine_rows, MedicineSerializer, Medicine.objects.order_by("name"))
+
+    def test_stock(self):
+        self.assertProjects(stock_rows, StockAvailabilitySerializer, Medicine.objects.order_by("id"))
+
+    def test_sales_report(self):
+        self.assertProjects(sales_report_rows, SalesReportSerializer, Bill.objects.order_by("id"))
+
+    def test_empty_queryset(self):
+        self.assertEqual(list(medicine_rows(Medicine.objects.filter(id__in=[]))), [])
+
+
+class TestORJSONRenderer(APITestCase):
+    """ORJSONRenderer writes the same bytes as JSONRenderer."""
+
+    def assertRendersSame(self, data, **kwargs):
+        self.assertEqual(ORJSONRenderer().render(data, **kwargs), JSONRenderer().render(data, **kwargs))
+
+    def test_matches_json_renderer(self):
+        self.assertRendersSame({
+            "name": "Paracétamol 500mg \u2028\u2029 \"quoted\"",
+            "created_at": datetime(2024, 3, 1, 9, 30, 0, 120, tzinfo=timezone.utc),
+            "price": Decimal("12.50"),
+            "big": 2 ** 60,
+            "label": gettext_lazy("Single"),
+            "nested": [None, True, 1.5, {1: "a"}],
+        })
+
+    def test_indented_output_falls_back(self):
+        self.assertRendersSame({"results": [{"id": 1}]}, renderer_context={"indent": 4})
@@ -0,0 +1,26 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from api.sqlite import configure
+
+
+class TestSQLiteTuning(TestCase):
+    """Every new SQLite connection runs SQLITE_PRAGMAS."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_connection_is_tuned(self):
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(self.pragma("cache_size"), -65536)
+
+    @override_settings(SQLITE_PRAGMAS={"cache_size": -1024})
+    def test_pragmas_are_not_counted_as_queries(self):
+        self.addCleanup(connection.connection.execute, "PRAGMA cache_size = -65536")
+        with self.assertNumQueries(0):
+            configure(connection)
+        self.assertEqual(self.pragma("cache_size"), -1024)
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils.timezone import localdate
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.models import Medicine, StockAlert
+from api.tests.factories import MedicineFactory, UserFactory
+
+
+class TestStockAlerts(APITestCase):
+    """Low-stock and near-expiry alerts are kept in step with stock and served to admins."""
+
+    def setUp(self):
+        self.admin_user = UserFactory(role="admin")
+        self.staff_user = UserFactory(role="staff")
+        self.staff_user.set_password("testpass")
+        self.staff_user.save()
+        self.aspirin = MedicineFactory(
+            name="Aspirin", stock=12, reorder_level=10, expiry_date=localdate() + timedelta(days=365))
+        self.paracetamol = MedicineFactory(
+            name="Paracetamol", stock=50, reorder_level=10, expiry_date=localdate() + timedelta(days=365))
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": self.staff_user.username, "password": "testpass"},
+        )
+        self.staff_token = response.data.get("access")
+        self.alerts_url = reverse("stock-alerts")
+
+    def alerts(self):
+        return set(StockAlert.objects.values_list("medicine__name", "kind"))
+
+    def sell(self, medicine, quantity, url="create-bill"):
+        item = {"medicine_id": medicine.id, "quantity": quantity, "packaging_type": medicine.packaging_type}
+        response = self.client.post(
+            reverse(url), {"items": [item]} if url == "create-invoice" else item, format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_sale_below_reorder_level_raises_alert(self):
+        self.sell(self.aspirin, 2)
+        self.assertEqual(self.alerts(), set())
+
+        self.sell(self.aspirin, 1)
+        self.sell(self.aspirin, 1)
+        self.assertEqual(self.alerts(), {("Aspirin", StockAlert.LOW_STOCK)})
+
+    def test_cart_sale_raises_alert(self):
+        self.sell(self.paracetamol, 45, url="create-invoice")
+        self.assertEqual(self.alerts(), {("Paracetamol", StockAlert.LOW_STOCK)})
+
+    def test_restock_clears_alert(self):
+        self.sell(self.aspirin, 5)
+        self.aspirin.refresh_from_db()
+        self.aspirin.stock = 40
+        self.aspirin.save()
+        self.assertEqual(self.alerts(), set())
+
+    def test_near_expiry_medicines_are_alerted(self):
+        MedicineFactory(name="Amoxicillin", stock=50, expiry_date=localdate() + timedelta(days=5))
+        MedicineFactory(name="Expired", stock=50, expiry_date=localdate() - timedelta(days=1))
+        self.assertEqual(self.alerts(), {("Amoxicillin", StockAlert.EXPIRING), ("Expired", StockAlert.EXPIRING)})
+
+    def test_refresh_command_rolls_expiry_window_forward(self):
+        """Medicines entering the window without being written are picked up by the daily refresh."""
+        Medicine.objects.filter(pk=self.paracetamol.pk).update(expiry_date=localdate() + timedelta(days=10), stock=3)
+        StockAlert.objects.create(medicine=self.aspirin, kind=StockAlert.LOW_STOCK)
+        out = StringIO()
+
+        call_command("refresh_stock_alerts", stdout=out)
+
+        self.assertIn("Raised 2 and cleared 1 alerts", out.getvalue())
+        self.assertEqual(self.alerts(), {("Paracetamol", StockAlert.LOW_STOCK), ("Paracetamol", StockAlert.EXPIRING)})
+
+    def test_admin_can_list_alerts(self):
+        self.sell(self.aspirin, 7)
+        MedicineFactory(name="Amoxicillin", stock=80, expiry_date=localdate() + timedelta(days=20))
+        MedicineFactory(name="Cetirizine", stock=80, expiry_date=localdate() + timedelta(days=3))
+        self.client.force_authenticate(user=self.admin_user)
+
+        response = self.client.get(self.alerts_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["name"] for row in response.data["low_stock"]], ["Aspirin"])
+        self.assertEqual(response.data["low_stock"][0]["stock"], 5)
+        self.assertEqual([row["name"] for row in response.data["expiring"]], ["Cetirizine", "Amoxicillin"])
+
+        response = self.client.get(self.alerts_url, {"days": 7})
+        self.assertEqual([row["name"] for row in response.data["expiring"]], ["Cetirizine"])
+
+    def test_wider_window_reads_expiry_dates(self):
+        """A window beyond EXPIRY_ALERT_DAYS also lists medicines with no alert yet."""
+        MedicineFactory(name="Amoxicillin", expiry_date=localdate() + timedelta(days=20))
+        Medicine.objects.filter(pk=self.paracetamol.pk).update(expiry_date=localdate() + timedelta(days=60))
+        self.client.force_authenticate(user=self.admin_user)
+
+        response = self.client.get(self.alerts_url, {"days": 90})
+
+        self.assertEqual([row["name"] for row in response.data["expiring"]], ["Amoxicillin", "Paracetamol"])
+
+    def test_invalid_days(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.assertEqual(self.client.get(self.alerts_url, {"days": "soon"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.alerts_url, {"days": -1}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_admin_cannot_list_alerts(self):
+        self.client.force_authenticate(user=self.staff_user)
+        response = self.client.get(self.alerts_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils.timezone import localdate
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.lots import receive
+from api.models import Medicine, StockLot
+from api.tests.factories import MedicineFactory, UserFactory
+
+
+class TestStockLots(APITestCase):
+    """Stock is held in lots, sold first-expiry-first-out, with Medicine.stock kept as their sum."""
+
+    def setUp(self):
+        self.staff_user = UserFactory(role="staff")
+        self.staff_user.set_password("testpass")
+        self.staff_user.save()
+        self.inventory_manager = UserFactory(role="inventory_manager")
+        self.today = localdate()
+        self.aspirin = MedicineFactory(name="Aspirin", stock=0, expiry_date=self.today + timedelta(days=400))
+        self.paracetamol = MedicineFactory(name="Paracetamol", stock=0, expiry_date=self.today + timedelta(days=400))
+        receive([
+            (self.aspirin.id, "A-LATE", self.today + timedelta(days=300), 20),
+            (self.aspirin.id, "A-EARLY", self.today + timedelta(days=100), 5),
+            (self.aspirin.id, "A-MID", self.today + timedelta(days=200), 10),
+            (self.paracetamol.id, "P-1", self.today + timedelta(days=150), 8),
+        ])
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": self.staff_user.username, "password": "testpass"},
+        )
+        self.staff_token = response.data.get("access")
+        self.lots_url = reverse("medicines-lots", kwargs={"pk": self.aspirin.id})
+
+    def lots(self, medicine):
+        return dict(StockLot.objects.filter(medicine=medicine).values_list("batch_number", "quantity"))
+
+    def medicine(self, medicine):
+        return Medicine.objects.values("stock", "expiry_date").get(pk=medicine.pk)
+
+    def sell(self, medicine, quantity):
+        return self.client.post(
+            reverse("create-bill"),
+            {"medicine_id": medicine.id, "quantity": quantity, "packaging_type": medicine.packaging_type},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+    def test_received_lots_set_stock_and_expiry(self):
+        self.assertEqual(self.medicine(self.aspirin), {"stock": 35, "expiry_date": self.today + timedelta(days=100)})
+
+    def test_sale_takes_from_earliest_expiring_lot(self):
+        response = self.sell(self.aspirin, 3)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.lots(self.aspirin), {"A-EARLY": 2, "A-MID": 10, "A-LATE": 20})
+        self.assertEqual(self.medicine(self.aspirin)["stock"], 32)
+
+    def test_sale_spanning_lots_moves_expiry_forward(self):
+        response = self.sell(self.aspirin, 12)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.lots(self.aspirin), {"A-EARLY": 0, "A-MID": 3, "A-LATE": 20})
+        self.assertEqual(self.medicine(self.aspirin), {"stock": 23, "expiry_date": self.today + timedelta(days=200)})
+
+    def test_cart_takes_from_lots_of_every_line(self):
+        response = self.client.post(
+            reverse("create-invoice"),
+            {"items": [
+                {"medicine_id": medicine.id, "quantity": quantity, "packaging_type": medicine.packaging_type}
+                for medicine, quantity in [(self.aspirin, 5), (self.paracetamol, 2)]
+            ]},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.staff_token}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.lots(self.aspirin), {"A-EARLY": 0, "A-MID": 10, "A-LATE": 20})
+        self.assertEqual(self.lots(self.paracetamol), {"P-1": 6})
+
+    def test_oversold_sale_leaves_lots_untouched(self):
+        response = self.sell(self.aspirin, 36)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.lots(self.aspirin), {"A-EARLY": 5, "A-MID": 10, "A-LATE": 20})
+
+    def test_lots_are_listed_in_sale_order(self):
+        self.sell(self.aspirin, 5)
+
+        response = self.client.get(self.lots_url, HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([lot["batch_number"] for lot in response.data], ["A-MID", "A-LATE"])
+
+    def test_inventory_manager_can_receive_lot(self):
+        self.client.force_authenticate(user=self.inventory_manager)
+        lot = {"batch_number": "A-NEW", "expiry_date": str(self.today + timedelta(days=50)), "quantity": 40}
+
+        response = self.client.post(self.lots_url, lot, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.lots_url, lot, format="json")
+        self.assertEqual(response.data["quantity"], 80)
+
+        self.assertEqual(self.medicine(self.aspirin), {"stock": 115, "expiry_date": self.today + timedelta(days=50)})
+
+    def test_non_inventory_manager_cannot_receive_lot(self):
+        lot = {"batch_number": "A-NEW", "expiry_date": str(self.today + timedelta(days=50)), "quantity": 40}
+        response = self.client.post(self.lots_url, lot, format="json", HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stock_count_adjusts_lots(self):
+        """Writing stock directly writes the difference off first-expiry-first, or receives it as a lot."""
+        self.aspirin.refresh_from_db()
+        self.aspirin.stock = 28
+        self.aspirin.save()
+        self.assertEqual(self.lots(self.aspirin), {"A-EARLY": 0, "A-MID": 8, "A-LATE": 20})
+        self.assertEqual(self.aspirin.expiry_date, self.today + timedelta(days=200))
+
+        self.aspirin.stock = 30
+        self.aspirin.save()
+        self.assertEqual(self.lots(self.aspirin)[f"ADJ-{self.aspirin.expiry_date.isoformat()}"], 2)
+
+    def test_new_medicine_stock_becomes_a_lot(self):
+        medicine = MedicineFactory(stock=12)
+        self.assertEqual(list(medicine.lots.values_list("expiry_date", "quantity")), [(medicine.expiry_date, 12)])
@@ -1,10 +1,19 @@
+import json
+from base64 import urlsafe_b64encode
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import F
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from api.cache import STOCK_VERSION_KEY, versions
+from api.models import CacheVersion, Medicine
 from api.tests.factories import UserFactory, MedicineFactory
 
 class TestStockAvailabilityAPI(APITestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.admin_user = UserFactory(role="admin")
         self.admin_user.set_password("adminpass")
@@ -35,10 +44,79 @@ class TestStockAvailabilityAPI(APITestCase):
             HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # Two medicines should be returned
+        self.assertEqual(len(response.data["results"]), 2)  # Two medicines should be returned
+
+        self.assertEqual(response.data["results"][0]["name"], "Aspirin")
+        self.assertEqual(response.data["results"][1]["name"], "Paracetamol")
+
+    def test_conditional_get_returns_304_without_queries(self):
+        """Ensure a matching If-None-Match is answered from the cache alone."""
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(self.stock_availability_url)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.stock_availability_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.stock_availability_url)
+        self.assertEqual(response.data["results"][0]["stock"], 50)
+
+    def test_stock_cache_invalidated_when_medicine_changes(self):
+        """Ensure saving a medicine changes the ETag and refreshes the payload."""
+        self.client.force_authenticate(user=self.admin_user)
+        etag = self.client.get(self.stock_availability_url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medicine1.stock = 7
+            self.medicine1.save()
+
+        response = self.client.get(self.stock_availability_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["results"][0]["stock"], 7)
+
+    def test_stock_cache_invalidated_by_sale(self):
+        """Ensure a bill that decrements stock is reflected in the next poll."""
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.get(self.stock_availability_url)
+
+        self.client.force_authenticate(user=self.non_admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("create-bill"),
+                {"medicine_id": self.medicine1.id, "quantity": 5, "packaging_type": self.medicine1.packaging_type},
+                format="json"
+            )
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(self.stock_availability_url)
+        self.assertEqual(response.data["results"][0]["stock"], 45)
+
+    def test_stock_cache_invalidated_by_another_process(self):
+        """Ensure a sale made by another worker is reflected once this one re-reads the stock version."""
+        self.client.force_authenticate(user=self.admin_user)
+        etag = self.client.get(self.stock_availability_url)["ETag"]
+
+        # The other worker's writes reach this process through the database only.
+        Medicine.objects.filter(pk=self.medicine1.pk).update(stock=F("stock") - 5)
+        CacheVersion.objects.filter(name=STOCK_VERSION_KEY).update(version=uuid4().hex)
+        versions.reset()  # this process's copy of the version has aged out
+
+        response = self.client.get(self.stock_availability_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["stock"], 45)
 
-        self.assertEqual(response.data[0]["name"], "Aspirin")
-        self.assertEqual(response.data[1]["name"], "Paracetamol")
+    def test_tampered_cursor_returns_404(self):
+        """Ensure a cursor whose id is not an integer returns 404."""
+        cursor = urlsafe_b64encode(json.dumps(["a", "x"]).encode()).decode()
+        response = self.client.get(
+            self.stock_availability_url,
+            {"cursor": cursor},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_non_admin_cannot_view_stock(self):
         """ Ensure non-admin users get 403 Forbidden."""
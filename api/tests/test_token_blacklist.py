@@ -0,0 +1,155 @@
+from datetime import timedelta
+from io import StringIO
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from api.authentication import CachedBlacklistRefreshToken
+from api.blacklist import BloomFilter, blacklist
+from api.tests.factories import UserFactory
+
+
+class TestTokenBlacklist(APITestCase):
+    """Refresh tokens are checked against the in-memory blacklist."""
+
+    def setUp(self):
+        blacklist.clear()
+        self.addCleanup(blacklist.clear)
+        self.user = UserFactory(username="pharmacist", role="staff")
+
+    def login(self):
+        response = self.client.post(reverse("token_obtain_pair"), {"username": "pharmacist", "password": "password123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def refresh(self, refresh_token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("token_refresh"), {"refresh": refresh_token})
+
+    def test_logged_out_token_cannot_refresh(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("logout"), {"refresh": tokens["refresh"]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials()
+
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotation_blacklists_the_old_token(self):
+        tokens = self.login()
+        rotated = self.refresh(tokens["refresh"])
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+        blacklist.forget_sync()
+
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(rotated.data["refresh"]).status_code, status.HTTP_200_OK)
+
+    def test_login_writes_no_outstanding_token(self):
+        self.login()
+        self.assertFalse(OutstandingToken.objects.exists())
+
+    def test_check_probes_the_newest_row_only(self):
+        token = CachedBlacklistRefreshToken(self.login()["refresh"])
+        token.check_blacklist()
+        with self.assertNumQueries(0):
+            token.check_blacklist()
+        blacklist.forget_sync()  # SYNC_SECONDS have passed
+        with self.assertNumQueries(1) as queries:
+            token.check_blacklist()
+        self.assertNotIn("JOIN", queries.captured_queries[0]["sql"])
+
+    def test_rows_blacklisted_elsewhere_are_loaded(self):
+        token = CachedBlacklistRefreshToken(self.login()["refresh"])
+        token.check_blacklist()
+        # Another process blacklists the token; nothing reaches this process but the row.
+        RefreshToken(str(token)).blacklist()
+        blacklist.forget_sync()
+
+        self.assertIn(token["jti"], blacklist)
+
+    def test_rows_of_expired_tokens_are_not_loaded(self):
+        expired = OutstandingToken.objects.create(user=self.user, jti="expired", token="t",
+                                                  expires_at=now() - timedelta(seconds=1))
+        BlacklistedToken.objects.create(token=expired)
+        with self.assertNumQueries(2):
+            self.assertNotIn("expired", blacklist)
+        blacklist.forget_sync()
+        with self.assertNumQueries(1):
+            self.assertNotIn("expired", blacklist)
+
+    def test_token_logged_out_on_another_worker_cannot_refresh(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("logout"), {"refresh": tokens["refresh"]})
+        self.client.credentials()
+        # A second worker process: none of the first one's state, the same database.
+        blacklist.clear()
+
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_rotated_on_another_worker_cannot_refresh(self):
+        tokens = self.login()
+        CachedBlacklistRefreshToken(tokens["refresh"]).check_blacklist()
+        # Rotated by another worker: its in-memory insert never runs here, only its row is written.
+        with self.captureOnCommitCallbacks(execute=False):
+            rotated = self.client.post(reverse("token_refresh"), {"refresh": tokens["refresh"]})
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+        blacklist.forget_sync()
+
+        self.assertEqual(self.refresh(tokens["refresh"]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_entries_lapse(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            blacklist.add("lapsed", (now() - timedelta(seconds=1)).timestamp())
+            blacklist.add("live", (now() + timedelta(days=1)).timestamp())
+        self.assertNotIn("lapsed", blacklist)
+        self.assertIn("live", blacklist)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        members = [str(uuid4()) for _ in range(1000)]
+        for member in members:
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum(str(uuid4()) in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_filter_grows_past_its_capacity(self):
+        expires_at = (now() + timedelta(days=1)).timestamp()
+        jtis = [str(uuid4()) for _ in range(3000)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for jti in jtis:
+                blacklist.add(jti, expires_at)
+        self.assertTrue(all(jti in blacklist for jti in jtis))
+
+
+class TestPurgeExpiredTokens(APITestCase):
+    """``purge_expired_tokens`` deletes expired tokens and their blacklist rows only."""
+
+    def setUp(self):
+        self.user = UserFactory(role="staff")
+
+    def outstanding(self, expires_at, blacklisted=False):
+        token = OutstandingToken.objects.create(user=self.user, jti=uuid4().hex, token="t",
+                                                created_at=now(), expires_at=expires_at)
+        if blacklisted:
+            BlacklistedToken.objects.create(token=token)
+        return token
+
+    def test_purge_in_batches(self):
+        expired = [self.outstanding(now() - timedelta(days=1), blacklisted=index % 2) for index in range(5)]
+        live = [self.outstanding(now() + timedelta(days=1), blacklisted=index % 2) for index in range(3)]
+        out = StringIO()
+        call_command("purge_expired_tokens", "--batch-size", "2", stdout=out)
+
+        self.assertIn("Purged 5 expired tokens", out.getvalue())
+        self.assertFalse(OutstandingToken.objects.filter(id__in=[token.id for token in expired]).exists())
+        self.assertEqual(OutstandingToken.objects.count(), len(live))
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
@@ -1,9 +1,11 @@
+from django.core.cache import cache
 from django.test import TestCase
 from rest_framework.test import APIClient
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from api.tests.factories import UserFactory
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 
 User = get_user_model()
 
@@ -303,4 +305,74 @@ class TestUserDeleteView(TestCase):
         response = self.client.delete(self.user_delete_url)
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
-        self.assertTrue(User.objects.filter(id=self.target_user.id).exists())
\ No newline at end of file
+        self.assertTrue(User.objects.filter(id=self.target_user.id).exists())
+class TestStatelessAuthentication(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = UserFactory(username="adminuser", password="adminpass", role="admin")
+        self.staff_user = UserFactory(username="staffuser", password="staffpass", role="staff")
+        self.admin_token = self.get_token("adminuser", "adminpass")
+        self.staff_token = self.get_token("staffuser", "staffpass")
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_token(self, username, password):
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": username, "password": password},
+        )
+        return response.data.get("access")
+
+    def test_token_carries_role_claim(self):
+        """Ensure issued access tokens embed the user's role and token version."""
+        token = AccessToken(self.staff_token)
+        self.assertEqual(token["role"], "staff")
+        self.staff_user.refresh_from_db()
+        self.assertEqual(token["ver"], self.staff_user.token_version)
+
+    def test_permission_checks_do_not_query_users(self):
+        """Ensure role permissions are decided from the token once the version is cached."""
+        self.client.get(reverse("user-list"), HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("user-list"), HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_role_change_revokes_tokens(self):
+        """Ensure a token stops working as soon as the user's role changes."""
+        self.client.get(reverse("user-list"), HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+
+        self.client.patch(
+            reverse("user-update", kwargs={"pk": self.staff_user.id}),
+            {"role": "admin"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+
+        response = self.client.get(reverse("user-list"), HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        new_token = self.get_token("staffuser", "staffpass")
+        response = self.client.get(reverse("user-list"), HTTP_AUTHORIZATION=f"Bearer {new_token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_profile_change_keeps_tokens(self):
+        """Ensure edits that do not affect access leave tokens valid."""
+        self.client.patch(
+            reverse("user-update", kwargs={"pk": self.staff_user.id}),
+            {"full_name": "Renamed"},
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+
+        response = self.client.get(reverse("user-list"), HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deleted_user_token_is_rejected(self):
+        """Ensure tokens of a deleted user are rejected."""
+        self.client.delete(
+            reverse("user-delete", kwargs={"pk": self.staff_user.id}),
+            HTTP_AUTHORIZATION=f"Bearer {self.admin_token}"
+        )
+
+        response = self.client.get(reverse("user-list"), HTTP_AUTHORIZATION=f"Bearer {self.staff_token}")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -8,16 +8,26 @@ from .views import (
     UserDeleteView,
     MedicineListCreateView,
     MedicineDetailView,
+    MedicineImportView,
+    MedicineLotsView,
+    MedicineSearchView,
     StockAvailabilityAPI,
+    StockAlertsAPI,
     BillCreateView,
-    SalesReportsAPI
+    InvoiceCreateView,
+    SalesReportsAPI,
+    ReportJobCreateView,
+    ReportJobDetailView,
+    ReportJobResultView,
+    MetricsView
 )
 
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
     path('auth/register/', RegisterUserView.as_view(), name='register'),
     path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
 
     # User Management
@@ -30,14 +40,25 @@ urlpatterns = [
     # medicines
     path('medicines/', MedicineListCreateView.as_view(), name='medicines-create-list'),
     path('medicines/<int:pk>/', MedicineDetailView.as_view(), name='medicines-detail'),
+    path('medicines/<int:pk>/lots/', MedicineLotsView.as_view(), name='medicines-lots'),
+    path('medicines/import/', MedicineImportView.as_view(), name='medicines-import'),
+    path('medicines/search/', MedicineSearchView.as_view(), name='medicines-search'),
 
     # Billing
     path('billing/', BillCreateView.as_view(), name='create-bill'),
+    path('billing/cart/', InvoiceCreateView.as_view(), name='create-invoice'),
 
     # stock
     path("dashboard/stock/", StockAvailabilityAPI.as_view(), name="stock-availability"),
+    path("dashboard/alerts/", StockAlertsAPI.as_view(), name="stock-alerts"),
 
     # report
     path("dashboard/reports/", SalesReportsAPI.as_view(), name="sales-reports"),
+    path("dashboard/reports/jobs/", ReportJobCreateView.as_view(), name="report-jobs"),
+    path("dashboard/reports/jobs/<int:pk>/", ReportJobDetailView.as_view(), name="report-job-detail"),
+    path("dashboard/reports/jobs/<int:pk>/result/", ReportJobResultView.as_view(), name="report-job-result"),
+
+    # metrics
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 
 ]
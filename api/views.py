@@ -2,25 +2,37 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from .models import Medicine, Bill
-from .serializers import UserSerializer, MedicineSerializer, BillSerializer, StockAvailabilitySerializer, \
-    SalesReportSerializer
-from .permissions import IsAdminUser, IsInventoryManager, IsStaff
+from .authentication import CachedBlacklistRefreshToken, StatelessJWTAuthentication
+from .models import Medicine, Bill, Invoice, ReportJob, StockAlert
+from .serializers import UserSerializer, MedicineSerializer, BillSerializer, InvoiceSerializer, StockLotSerializer, \
+    ReportJobSerializer, medicine_rows, stock_rows, sales_report_rows, import_medicines
+from .alerts import alert_rows
+from .lots import in_stock
+from .cache import get_stock_page, set_stock_page, stock_page_key, stock_version
+from .idempotency import idempotent
+from .pagination import KeysetPagination
+from .report_jobs import submit as submit_report_job
+from .reports import EXPORT_FORMATS, REPORT_ORDERING, report_bills, report_parameters, report_rows, report_totals
+from .routers import reads_from, replica_reads
+from .search import search_medicines
+from .metrics import registry
+from .permissions import IsAdminUser, IsInventoryManager, IsMetricsScraper, IsStaff
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
+import csv
+import io
 import logging
+from collections.abc import Mapping
 from rest_framework.exceptions import ValidationError
-from django.utils.dateparse import parse_date
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
-
 class RegisterUserView(generics.CreateAPIView):
     """
     API for Admins to register new users (Staff or Inventory Manager).
@@ -43,7 +55,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data.get("refresh")
-            token = RefreshToken(refresh_token)
+            token = CachedBlacklistRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Successfully logged out"}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -54,6 +66,7 @@ class UserListView(generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    ordering = ("id",)
 
 class UserDetailView(generics.RetrieveAPIView):
     queryset = User.objects.all()
@@ -79,18 +92,24 @@ class UserDeleteView(generics.DestroyAPIView):
 class MedicineListCreateView(generics.ListCreateAPIView):
     queryset = Medicine.objects.all()
     serializer_class = MedicineSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    ordering = ("name", "id")
 
     def get_permissions(self):
         if self.request.method == 'POST':
             return [IsInventoryManager()]
         return super().get_permissions()
 
+    def list(self, request, *args, **kwargs):
+        """Build the page from ``values_list()`` rows instead of ``Medicine`` instances."""
+        page = self.paginator.paginate_queryset(self.get_queryset(), request, self, rows=medicine_rows)
+        return self.get_paginated_response(page)
+
 class MedicineDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Medicine.objects.all()
     serializer_class = MedicineSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_permissions(self):
@@ -123,40 +142,243 @@ class MedicineDetailView(generics.RetrieveUpdateDestroyAPIView):
         )
 
 
+class MedicineLotsView(generics.ListCreateAPIView):
+    """
+    Lots of a medicine still in stock, in the first-expiry-first-out order
+    sales take them. Inventory Managers POST deliveries here; the medicine's
+    stock and expiry date follow.
+    """
+    serializer_class = StockLotSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [IsInventoryManager()]
+        return super().get_permissions()
+
+    def get_medicine(self):
+        return generics.get_object_or_404(Medicine.objects.only('id'), pk=self.kwargs['pk'])
+
+    def get_queryset(self):
+        return in_stock().filter(medicine=self.get_medicine())
+
+    def perform_create(self, serializer):
+        serializer.save(medicine=self.get_medicine())
+
+
+class MedicineSearchView(APIView):
+    """
+    Typeahead search over medicine name, description and category. Every term
+    in ``q`` is matched as a word prefix; results are ranked by relevance.
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        query = request.GET.get("q", "")
+        try:
+            limit = min(int(request.GET.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        if limit < 1:
+            raise ValidationError({"limit": "Must be at least 1."})
+        medicines = search_medicines(query, limit)
+        return Response({"results": MedicineSerializer(medicines, many=True).data})
+
+
+class MedicineImportView(APIView):
+    """
+    Bulk upsert of medicines by name for Inventory Managers.
+
+    Accepts a JSON array of medicine objects, or a CSV upload in the ``file``
+    form field with a header row using the same field names. Invalid rows are
+    reported individually; the remaining rows are still imported.
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsInventoryManager]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is not None:
+            rows = list(csv.DictReader(io.TextIOWrapper(upload, encoding="utf-8-sig")))
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            raise ValidationError({"detail": "Send a JSON array of medicines or a CSV file in 'file'."})
+
+        created, updated, errors = import_medicines(rows)
+        return Response(
+            {"created": created, "updated": updated, "errors": errors},
+            status=status.HTTP_200_OK
+        )
+
+
 class BillCreateView(generics.CreateAPIView):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, IsStaff]
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        """Attach the logged-in Staff user before saving"""
+        serializer.save(staff_id=self.request.user.id)
+
+
+class InvoiceCreateView(generics.CreateAPIView):
+    """Sell a whole cart in one request."""
+    queryset = Invoice.objects.all()
+    serializer_class = InvoiceSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsStaff]
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Attach the logged-in Staff user before saving"""
-        serializer.save(staff=self.request.user)
+        serializer.save(staff_id=self.request.user.id)
 
 
 class StockAvailabilityAPI(APIView):
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    ordering = ("name", "id")
+
+    @replica_reads
+    def get(self, request):
+        """
+        Serve the page from the stock cache. The ETag is the page's cache key, so
+        a matching ``If-None-Match`` is answered with 304 before any query runs.
+        A page read from the replica is cached no longer than its lag tolerance,
+        as it may predate the stock version it is cached under.
+        """
+        paginator = self.pagination_class()
+        cursor = request.query_params.get(paginator.cursor_query_param)
+        key = stock_page_key(stock_version(), cursor, paginator.get_page_size(request))
+        etag = f'"{key}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        payload = get_stock_page(key)
+        if payload is None:
+            results = paginator.paginate_queryset(Medicine.objects.all(), request, self, rows=stock_rows)
+            payload = {"next_cursor": paginator.next_cursor, "results": results}
+            set_stock_page(key, payload, settings.REPLICA_LAG_TOLERANCE if reads_from.get() else None)
+        else:
+            paginator.request, paginator.next_cursor = request, payload["next_cursor"]
+
+        response = paginator.get_paginated_response(payload["results"])
+        response["ETag"] = etag
+        return response
+
+class StockAlertsAPI(APIView):
+    """
+    Medicines below their reorder level and medicines expiring within
+    ``days`` (default ``EXPIRY_ALERT_DAYS``), read from the maintained alert
+    set rather than by scanning the catalog.
+    """
+    permission_classes = [IsAdminUser]
 
     def get(self, request):
-        medicines = Medicine.objects.all().order_by("name")
-        serializer = StockAvailabilitySerializer(medicines, many=True)
-        return Response(serializer.data)
+        days = request.GET.get("days")
+        if days is not None:
+            try:
+                days = int(days)
+            except ValueError:
+                raise ValidationError({"days": "Must be an integer."})
+            if days < 0:
+                raise ValidationError({"days": "Must not be negative."})
+        return Response({
+            "low_stock": list(alert_rows(StockAlert.LOW_STOCK)),
+            "expiring": list(alert_rows(StockAlert.EXPIRING, days)),
+        })
+
 
 class SalesReportsAPI(APIView):
+    """
+    Sales report for admins. Returns one row per bill, or per period when
+    ``period`` (day, week or month) is given, optionally crossed with
+    ``group_by`` (staff, medicine or category). ``export`` (csv or ndjson)
+    streams the same rows instead of building the whole list in memory.
+    """
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    ordering = REPORT_ORDERING
 
+    @replica_reads
     def get(self, request):
-        start_date = request.GET.get("start_date")
-        end_date = request.GET.get("end_date")
-        staff_id = request.GET.get("staff_id")
+        params = report_parameters(request.GET)
+        export = request.GET.get("export")
+        if export and export not in EXPORT_FORMATS:
+            raise ValidationError({"export": f"Must be one of: {', '.join(EXPORT_FORMATS)}."})
+
+        if not export:
+            if params.get("period"):
+                return Response(list(report_totals(params)))
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(report_bills(params), request, self, rows=sales_report_rows)
+            return paginator.get_paginated_response(page)
+
+        stream, content_type = EXPORT_FORMATS[export]
+        response = StreamingHttpResponse(stream(report_rows(params)), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="sales_report.{export}"'
+        return response
+
+
+class ReportJobCreateView(APIView):
+    """
+    Queue a sales report for admins as a background job, with the
+    ``SalesReportsAPI`` parameters and ``export`` (csv, the default, or
+    ndjson). Returns the job to poll, which is the job already in flight when
+    the same report has been requested and is not done yet.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        if not isinstance(request.data, Mapping):
+            raise ValidationError({"detail": "Send a JSON object of report parameters."})
+        params = report_parameters(request.data)
+        export = request.data.get("export") or "csv"
+        if export not in EXPORT_FORMATS:
+            raise ValidationError({"export": f"Must be one of: {', '.join(EXPORT_FORMATS)}."})
+        job, _ = submit_report_job(params, export, request.user.id)
+        data = ReportJobSerializer(job, context={"request": request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Location": data["url"]})
+
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    """Status of a report job, for admins to poll."""
+    permission_classes = [IsAdminUser]
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
 
-        bills = Bill.objects.all()
 
-        if start_date and end_date:
-            bills = bills.filter(created_at__date__range=[start_date, end_date])
+class ReportJobResultView(APIView):
+    """Download the report file of a finished job."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        job = generics.get_object_or_404(ReportJob, pk=pk)
+        if job.status != ReportJob.DONE:
+            return Response({"detail": f"Report job is {job.status}.", "status": job.status},
+                            status=status.HTTP_409_CONFLICT)
+        _, content_type = EXPORT_FORMATS[job.export]
+        return FileResponse(job.result.open("rb"), as_attachment=True, filename=f"sales_report.{job.export}",
+                            content_type=content_type)
 
-        if staff_id:
-            bills = bills.filter(staff_id=staff_id)
 
-        serializer = SalesReportSerializer(bills, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+class MetricsView(APIView):
+    """Request metrics recorded by ``RequestMetricsMiddleware``, in the Prometheus text format."""
+    permission_classes = [IsMetricsScraper]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,34 @@
+"""Shared setup for the benchmark scripts: a scratch SQLite database seeded by ``seed_data``."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "medical_billing.settings")
+
+
+def add_database_arguments(parser):
+    parser.add_argument("--db", help="reuse this database file instead of a fresh temporary one")
+
+
+def setup_database(db_path, name, **seed_options):
+    """
+    Point Django at ``db_path`` (or a new temporary file), migrate it and seed
+    it with ``seed_options`` unless it already holds bills. Returns the path.
+    """
+    import django
+    from django.conf import settings
+
+    db_path = db_path or os.path.join(tempfile.mkdtemp(), f"{name}.sqlite3")
+    settings.DATABASES["default"]["NAME"] = db_path
+    django.setup()
+
+    from django.core.management import call_command
+    from api.models import Bill
+
+    call_command("migrate", verbosity=0)
+    if not Bill.objects.exists():
+        call_command("seed_data", **seed_options)
+    print(f"database: {db_path}")
+    return db_path
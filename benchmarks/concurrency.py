@@ -0,0 +1,185 @@
+"""
+Concurrency benchmark: WSGI vs. ASGI for the dashboard read endpoints.
+
+Many clients poll stock and medicines while a few run a slow sales report,
+for ``--duration`` seconds against each deployment, all in-process:
+
+* ``wsgi``       - ``medical_billing.wsgi`` behind ``--workers`` server threads,
+                   one request per thread, like a threaded WSGI server;
+* ``asgi-sync``  - Django's stock ASGI handler with the synchronous views,
+                   which Django runs one at a time on a single shared thread;
+* ``asgi``       - ``medical_billing.asgi``, whose async read views run on
+                   ``ASYNC_VIEW_THREADS`` pool threads.
+
+Reported per deployment: requests per second and p50/p95 latency for the
+polls and the reports.
+
+Usage:
+    python benchmarks/concurrency.py --pollers 32 --reporters 4 --duration 10
+"""
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from itertools import cycle
+
+from common import add_database_arguments, setup_database
+
+DATASET = {"bills": 100000, "medicines": 5000, "staff": 50, "seed": 0}
+REPORT_DAYS = 90
+
+
+def build_requests():
+    """Return ``(poll_requests, report_request)`` as ``(path, query_string)`` pairs, and the auth header."""
+    from django.contrib.auth import get_user_model
+    from api.authentication import RoleTokenObtainPairSerializer
+    from api.models import Medicine
+
+    admin = get_user_model().objects.get(username="admin")
+    token = str(RoleTokenObtainPairSerializer.get_token(admin).access_token)
+    medicine_id = Medicine.objects.values_list("id", flat=True).first()
+    polls = [
+        ("/api/dashboard/stock/", ""),
+        ("/api/medicines/", ""),
+        (f"/api/medicines/{medicine_id}/", ""),
+    ]
+    start = date.today() - timedelta(days=REPORT_DAYS - 1)
+    report_query = f"period=week&group_by=staff&start_date={start}&end_date={date.today()}"
+    return polls, ("/api/dashboard/reports/", report_query), f"Bearer {token}"
+
+
+def call_wsgi(application, path, query, authorization, method="GET", body=b""):
+    environ = {
+        "REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query, "SCRIPT_NAME": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "localhost", "HTTP_AUTHORIZATION": authorization, "REMOTE_ADDR": "127.0.0.1",
+        "CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body), "wsgi.errors": io.StringIO(), "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0), "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+    }
+    status = []
+    response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return int(status[0].split()[0])
+
+
+async def call_asgi(application, path, query, authorization):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"authorization", authorization.encode())],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def run_wsgi(args, polls, report, authorization):
+    from medical_billing.wsgi import application
+
+    server = ThreadPoolExecutor(max_workers=args.workers)
+    deadline = time.perf_counter() + args.duration
+    samples = {"poll": [], "report": []}
+
+    def client(kind, requests):
+        for path, query in requests:
+            if time.perf_counter() >= deadline:
+                return
+            started = time.perf_counter()
+            status = server.submit(call_wsgi, application, path, query, authorization).result()
+            assert status == 200, (path, status)
+            samples[kind].append(time.perf_counter() - started)
+
+    clients = [threading.Thread(target=client, args=("poll", cycle(polls))) for _ in range(args.pollers)]
+    clients += [threading.Thread(target=client, args=("report", cycle([report]))) for _ in range(args.reporters)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    server.shutdown()
+    return samples
+
+
+def run_asgi(application, args, polls, report, authorization):
+    samples = {"poll": [], "report": []}
+
+    async def client(kind, requests, deadline):
+        for path, query in requests:
+            if time.perf_counter() >= deadline:
+                return
+            started = time.perf_counter()
+            status = await call_asgi(application, path, query, authorization)
+            assert status == 200, (path, status)
+            samples[kind].append(time.perf_counter() - started)
+
+    async def main():
+        deadline = time.perf_counter() + args.duration
+        clients = [client("poll", cycle(polls), deadline) for _ in range(args.pollers)]
+        clients += [client("report", cycle([report]), deadline) for _ in range(args.reporters)]
+        await asyncio.gather(*clients)
+
+    asyncio.run(main())
+    return samples
+
+
+def summary(samples, duration):
+    def latency(values):
+        if not values:
+            return "       -        -"
+        ordered = sorted(values)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return f"{statistics.median(ordered) * 1000:8.1f} {p95 * 1000:8.1f}"
+
+    total = len(samples["poll"]) + len(samples["report"])
+    return f"{total / duration:9.1f} {latency(samples['poll'])} {latency(samples['report'])}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pollers", type=int, default=32, help="concurrent clients polling stock and medicines")
+    parser.add_argument("--reporters", type=int, default=4, help="concurrent clients running the slow report")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per deployment")
+    parser.add_argument("--workers", type=int, default=8, help="WSGI server threads")
+    parser.add_argument("--modes", default="wsgi,asgi-sync,asgi")
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    setup_database(args.db, "concurrency", **DATASET)
+    logging.getLogger("api.metrics.slow").setLevel(logging.ERROR)
+
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIHandler
+    import medical_billing.asgi
+
+    polls, report, authorization = build_requests()
+    runners = {
+        "wsgi": lambda: run_wsgi(args, polls, report, authorization),
+        "asgi-sync": lambda: run_asgi(ASGIHandler(), args, polls, report, authorization),
+        "asgi": lambda: run_asgi(medical_billing.asgi.application, args, polls, report, authorization),
+    }
+    print(f"{args.pollers} pollers, {args.reporters} reporters, {args.duration:g}s each; "
+          f"{args.workers} WSGI threads, ASYNC_VIEW_THREADS={settings.ASYNC_VIEW_THREADS}")
+    print(f"{'deployment':<12}{'req/s':>9} {'poll p50':>8} {'poll p95':>8} {'rep p50':>8} {'rep p95':>8}  (ms)")
+    for mode in args.modes.split(","):
+        print(f"{mode:<12}{summary(runners[mode](), args.duration)}")
+
+
+if __name__ == "__main__":
+    main()
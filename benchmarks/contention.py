@@ -0,0 +1,165 @@
+"""
+Contention benchmark: SQLite as Django ships it vs. the tuned connections.
+
+``--writers`` processes each send ``--rate`` sales a second (or as many as
+they can, with ``--rate 0``) to the billing endpoint while ``--readers``
+processes alternate between the sales report and stock availability as fast
+as they can, all against one database file through ``medical_billing.wsgi``,
+for ``--duration`` seconds per configuration:
+
+* ``default`` - rollback journal, no pragmas and a new connection per
+                request (``CONN_MAX_AGE = 0``);
+* ``tuned``   - ``SQLITE_PRAGMAS`` (WAL, busy timeout, ...) and the
+                persistent connections of ``CONN_MAX_AGE`` from the settings.
+
+Reported per configuration and endpoint: successful requests per second,
+p50/p95 latency and failed requests, which are "database is locked" errors.
+A fixed sale rate keeps the write load the same across configurations, so
+read throughput is compared on equal terms even on a single core; sales the
+default configuration cannot keep up with show as a lower billing rate.
+
+Usage:
+    python benchmarks/contention.py --writers 4 --rate 1 --readers 4 --duration 10
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import sqlite3
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import cycle
+
+from common import add_database_arguments, setup_database
+
+DATASET = {"bills": 100000, "medicines": 5000, "staff": 50, "seed": 0}
+# Medicines the writers sell, topped up with a lot big enough for any run.
+SOLD_MEDICINES = 50
+BENCH_BATCH = "BENCH"
+
+
+def prepare(writers):
+    """Top up the sold medicines once and return ``(writer_requests, reader_requests)`` with their auth headers."""
+    from django.contrib.auth import get_user_model
+    from django.utils.timezone import localdate
+    from api.authentication import RoleTokenObtainPairSerializer
+    from api.lots import receive
+    from api.models import Medicine, StockLot
+    from concurrency import build_requests
+
+    medicines = list(Medicine.objects.order_by("id").values_list("id", "packaging_type")[:SOLD_MEDICINES])
+    if not StockLot.objects.filter(batch_number=BENCH_BATCH).exists():
+        receive([(medicine_id, BENCH_BATCH, localdate() + timedelta(days=365), 10 ** 6)
+                 for medicine_id, _ in medicines])
+    sales = [
+        ("billing", "POST", "/api/billing/", "",
+         json.dumps({"medicine_id": medicine_id, "quantity": 1, "packaging_type": packaging_type}).encode())
+        for medicine_id, packaging_type in medicines
+    ]
+    staff = get_user_model().objects.filter(role="staff").order_by("id")[:writers]
+    writer_requests = [
+        (sales[index:] + sales[:index], f"Bearer {RoleTokenObtainPairSerializer.get_token(user).access_token}")
+        for index, user in enumerate(staff)
+    ]
+    polls, (report_path, report_query), authorization = build_requests()
+    stock_path, stock_query = polls[0]
+    reads = [("report", "GET", report_path, report_query, b""), ("stock", "GET", stock_path, stock_query, b"")]
+    return writer_requests, (reads, authorization)
+
+
+def set_journal_mode(db_path, mode):
+    database = sqlite3.connect(db_path)
+    try:
+        database.execute(f"PRAGMA journal_mode = {mode}").fetchone()
+    finally:
+        database.close()
+
+
+def client(db_path, config, requests, authorization, interval, start_at, duration):
+    """
+    Run in its own process: cycle through ``requests`` from ``start_at`` for
+    ``duration`` seconds, starting one every ``interval`` seconds at most.
+    """
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    if config == "default":
+        settings.DATABASES["default"]["CONN_MAX_AGE"] = 0
+        settings.SQLITE_PRAGMAS = {}
+    django.setup()
+    logging.getLogger("django").setLevel(logging.CRITICAL)
+    logging.getLogger("api.metrics.slow").setLevel(logging.CRITICAL)
+    from medical_billing.wsgi import application
+    from concurrency import call_wsgi
+
+    samples = []
+    next_at = start_at
+    for kind, method, path, query, body in cycle(requests):
+        time.sleep(max(0.0, next_at - time.time()))
+        if time.time() >= start_at + duration:
+            break
+        next_at = max(next_at + interval, time.time())
+        started = time.perf_counter()
+        status = call_wsgi(application, path, query, authorization, method, body)
+        samples.append((kind, status < 400, time.perf_counter() - started))
+    return samples
+
+
+def run(args, config, writer_requests, reader_requests):
+    set_journal_mode(args.db, "wal" if config == "tuned" else "delete")
+    reads, reader_authorization = reader_requests
+    interval = 1 / args.rate if args.rate else 0
+    clients = [(requests, authorization, interval) for requests, authorization in writer_requests]
+    clients += [(reads[index % len(reads):] + reads[:index % len(reads)], reader_authorization, 0)
+                for index in range(args.readers)]
+    # Every process sets Django up before the common start.
+    start_at = time.time() + 3 + 0.2 * len(clients)
+    with multiprocessing.get_context("spawn").Pool(len(clients)) as pool:
+        results = pool.starmap(client, [
+            (args.db, config, requests, authorization, interval, start_at, args.duration)
+            for requests, authorization, interval in clients
+        ])
+    samples = defaultdict(list)
+    for kind, ok, elapsed in (sample for result in results for sample in result):
+        samples[kind].append((ok, elapsed))
+    return samples
+
+
+def summary(samples, duration):
+    succeeded = sorted(elapsed for ok, elapsed in samples if ok)
+    if not succeeded:
+        return f"{0:9.1f} {'-':>8} {'-':>8} {len(samples):8d}"
+    p95 = succeeded[min(len(succeeded) - 1, int(0.95 * len(succeeded)))]
+    return (f"{len(succeeded) / duration:9.1f} {statistics.median(succeeded) * 1000:8.1f} {p95 * 1000:8.1f} "
+            f"{len(samples) - len(succeeded):8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4, help="processes selling through the billing endpoint")
+    parser.add_argument("--rate", type=float, default=1, help="sales per second per writer; 0 for no limit")
+    parser.add_argument("--readers", type=int, default=4, help="processes reading reports and stock")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per configuration")
+    parser.add_argument("--configs", default="default,tuned")
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    args.db = setup_database(args.db, "contention", **DATASET)
+
+    from django.db import connections
+
+    writer_requests, reader_requests = prepare(args.writers)
+    connections.close_all()
+    rate = f"{args.rate:g} sales/s each" if args.rate else "unlimited"
+    print(f"{args.writers} writer ({rate}) and {args.readers} reader processes, {args.duration:g}s each")
+    print(f"{'config':<9}{'endpoint':<9}{'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'failed':>8}")
+    for config in args.configs.split(","):
+        samples = run(args, config, writer_requests, reader_requests)
+        for kind in ("billing", "report", "stock"):
+            print(f"{config:<9}{kind:<9}{summary(samples[kind], args.duration)}")
+
+
+if __name__ == "__main__":
+    main()
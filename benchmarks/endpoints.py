@@ -0,0 +1,158 @@
+"""
+Endpoint benchmark suite.
+
+Drives the real routes in ``api/urls.py`` in-process through the Django test
+client against a seeded database, and records per route:
+
+* p50 / p95 latency over ``--iterations`` requests (after a warm-up),
+* database queries per request,
+* peak Python memory allocated while serving one request.
+
+Results are compared with ``benchmarks/baseline.json``. The run exits non-zero
+when a route issues more queries than its baseline, or when its p95 latency or
+peak memory grows by more than ``--tolerance`` (and by more than a small
+absolute slack, so sub-millisecond noise does not fail the run).
+
+Usage:
+    python benchmarks/endpoints.py                    # compare with the baseline
+    python benchmarks/endpoints.py --update-baseline  # record a new baseline
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+from common import add_database_arguments, setup_database
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DATASET = {"bills": 100000, "medicines": 5000, "staff": 50, "seed": 0}
+PASSWORD = "password123"
+LATENCY_SLACK_MS = 2.0
+MEMORY_SLACK_KIB = 64
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def build_routes():
+    """Return ``[(name, iterations_scale, request_callable)]`` for every benchmarked route."""
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from api.models import Medicine
+
+    def login(username):
+        response = APIClient().post(reverse("token_obtain_pair"), {"username": username, "password": PASSWORD})
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    admin, staff = login("admin"), login("staff0001")
+    anonymous = APIClient()
+    medicine = Medicine.objects.order_by("-stock").first()
+    report_end = date.today()
+    report_start = report_end - timedelta(days=30)
+
+    return [
+        ("login", 0.2, lambda: anonymous.post(
+            reverse("token_obtain_pair"), {"username": "staff0002", "password": PASSWORD})),
+        ("medicine-list", 1, lambda: staff.get(reverse("medicines-create-list"))),
+        ("medicine-detail", 1, lambda: staff.get(reverse("medicines-detail", kwargs={"pk": medicine.id}))),
+        ("medicine-search", 1, lambda: staff.get(reverse("medicines-search"), {"q": "para tab"})),
+        ("billing", 1, lambda: staff.post(
+            reverse("create-bill"),
+            {"medicine_id": medicine.id, "quantity": 1, "packaging_type": medicine.packaging_type},
+            format="json")),
+        ("stock", 1, lambda: admin.get(reverse("stock-availability"))),
+        ("reports", 1, lambda: admin.get(
+            reverse("sales-reports"), {"start_date": report_start, "end_date": report_end})),
+        ("reports-aggregated", 1, lambda: admin.get(
+            reverse("sales-reports"),
+            {"start_date": report_start, "end_date": report_end, "period": "day", "group_by": "staff"})),
+    ]
+
+
+def measure(request, iterations, warmup):
+    from django.db import connection
+
+    for _ in range(warmup):
+        response = request()
+        assert response.status_code < 400, (response.status_code, getattr(response, "data", None))
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    # Counted with a wrapper: the request_started signal clears connection.queries mid-request.
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *rest: queries.append(sql) or execute(sql, *rest)):
+        request()
+
+    tracemalloc.start()
+    request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(percentile(samples, 0.95), 2),
+        "queries": len(queries),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def regressions(name, result, baseline, tolerance):
+    if baseline is None:
+        return []
+    found = []
+    if result["queries"] > baseline["queries"]:
+        found.append(f"{name}: {result['queries']} queries, baseline {baseline['queries']}")
+    for key, slack in (("p95_ms", LATENCY_SLACK_MS), ("peak_kib", MEMORY_SLACK_KIB)):
+        limit = baseline[key] * (1 + tolerance) + slack
+        if result[key] > limit:
+            found.append(f"{name}: {key} {result[key]} exceeds {limit:.1f} (baseline {baseline[key]})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative growth, default 0.25")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    add_database_arguments(parser)
+    args = parser.parse_args()
+
+    setup_database(args.db, "endpoints", password=PASSWORD, **DATASET)
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    baseline = json.loads(args.baseline.read_text())["routes"] if args.baseline.exists() else {}
+    results, failures = {}, []
+    print(f"{'route':<20}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>11}")
+    for name, scale, request in build_routes():
+        result = measure(request, max(1, int(args.iterations * scale)), args.warmup)
+        results[name] = result
+        failures += regressions(name, result, baseline.get(name), args.tolerance)
+        print(f"{name:<20}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['queries']:>9}{result['peak_kib']:>11}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({"dataset": DATASET, "routes": results}, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
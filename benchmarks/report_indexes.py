@@ -0,0 +1,68 @@
+"""
+Scan vs. seek benchmark for the sales report date filter.
+
+Seeds a scratch SQLite database with ``manage.py seed_data``, then times the
+report query with the old ``created_at__date__range`` filter (which wraps the
+column in a function and forces a full scan) against the half-open
+``created_at`` range now used by ``SalesReportsAPI`` (which seeks on the
+``bill_created_idx`` / ``bill_staff_created_idx`` indexes).
+
+Usage:
+    python benchmarks/report_indexes.py --bills 1000000
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from common import add_database_arguments, setup_database
+
+
+def explain(queryset):
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return "; ".join(row[-1] for row in cursor.fetchall())
+
+
+def timed(queryset, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(list(queryset.values_list("id", "quantity", "total_price")))
+        samples.append((time.perf_counter() - started) * 1000)
+    return rows, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bills", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=7, help="width of the report window")
+    parser.add_argument("--repeat", type=int, default=5)
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    setup_database(args.db, "report_indexes", bills=args.bills)
+
+    from api.models import Bill
+    from api.reports import created_at_range
+
+    end = date.today() - timedelta(days=30)
+    start = end - timedelta(days=args.days - 1)
+    staff_id = Bill.objects.values_list("staff_id", flat=True).first()
+    cases = [
+        ("date range", Bill.objects.filter(created_at__date__range=[start, end]),
+         Bill.objects.filter(**created_at_range(str(start), str(end)))),
+        ("date range + staff", Bill.objects.filter(created_at__date__range=[start, end], staff_id=staff_id),
+         Bill.objects.filter(staff_id=staff_id, **created_at_range(str(start), str(end)))),
+    ]
+    for label, scan, seek in cases:
+        print(f"\n{label} ({args.days} days)")
+        for name, queryset in (("created_at__date", scan), ("created_at range", seek)):
+            rows, median_ms = timed(queryset, args.repeat)
+            print(f"  {name:<18} {median_ms:9.1f} ms  {rows:>7} rows  plan: {explain(queryset)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Serialization benchmark: CPU per row of large list responses.
+
+For medicines and sales report rows, compares the ModelSerializer path with
+``JSONRenderer`` against the ``values_list()`` projections with
+``ORJSONRenderer``, checks that both produce the same bytes, and prints CPU
+time per row for building the rows, rendering them and both together. The
+``fetch`` line is running the query and fetching its rows alone, which both
+paths pay (on SQLite it includes parsing date and datetime text), so the
+speedup cannot exceed serializer / fetch.
+
+Usage:
+    python benchmarks/serialization.py --rows 1000 --repeat 20
+"""
+import argparse
+import time
+
+from common import add_database_arguments, setup_database
+
+DATASET = {"bills": 100000, "medicines": 5000, "staff": 50, "seed": 0}
+
+
+def cpu_per_row(function, rows, repeat):
+    """Best-of-``repeat`` process CPU time of ``function()``, in microseconds per row."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        function()
+        best = min(best, time.process_time() - started)
+    return best / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="rows per response, the largest page size")
+    parser.add_argument("--repeat", type=int, default=20)
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    setup_database(args.db, "serialization", **DATASET)
+
+    from django.db import connection
+    from rest_framework.renderers import JSONRenderer
+    from api.models import Bill, Medicine
+    from api.projections import select
+    from api.renderers import ORJSONRenderer
+    from api.serializers import MedicineSerializer, SalesReportSerializer, medicine_rows, sales_report_rows
+
+    def fetch_rows(sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            cursor.fetchall()
+
+    cases = [
+        ("medicines", Medicine.objects.order_by("name", "id"), MedicineSerializer, medicine_rows),
+        ("bills", Bill.objects.order_by("created_at", "id"), SalesReportSerializer, sales_report_rows),
+    ]
+    print(f"{args.rows} rows per response, best of {args.repeat}; CPU us/row")
+    print(f"{'rows':<10}{'path':<12}{'build':>8}{'render':>8}{'total':>8}")
+    for name, queryset, serializer_class, projection in cases:
+        page = queryset[:args.rows]
+        paths = {
+            "serializer": (lambda: serializer_class(page, many=True).data, JSONRenderer()),
+            "projection": (lambda: list(projection(page)), ORJSONRenderer()),
+        }
+        output, totals = {}, {}
+        for path, (build, renderer) in paths.items():
+            data = {"next": None, "results": build()}
+            output[path] = renderer.render(data)
+            build_cpu = cpu_per_row(build, args.rows, args.repeat)
+            render_cpu = cpu_per_row(lambda: renderer.render(data), args.rows, args.repeat)
+            totals[path] = cpu_per_row(lambda: renderer.render({"next": None, "results": build()}), args.rows,
+                                       args.repeat)
+            print(f"{name:<10}{path:<12}{build_cpu:8.1f}{render_cpu:8.1f}{totals[path]:8.1f}")
+        assert output["serializer"] == output["projection"], f"{name}: output differs"
+        sql, params, _ = select(page, [lookup for _, lookup, _ in projection.fields], connection)
+        fetch = cpu_per_row(lambda: fetch_rows(sql, params), args.rows, args.repeat)
+        print(f"{name:<10}{'fetch':<12}{fetch:8.1f}{'':>8}{fetch:8.1f}")
+        print(f"{name:<10}{'speedup':<12}{'':>16}{totals['serializer'] / totals['projection']:7.1f}x  (identical bytes,"
+              f" at most {totals['serializer'] / fetch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Token refresh benchmark: refresh throughput as the token tables grow.
+
+For each of ``--sizes``, fills ``OutstandingToken`` and ``BlacklistedToken``
+with that many live, blacklisted tokens, then rotates one refresh token
+``--refreshes`` times through the real ``token_refresh`` route in-process.
+The in-memory blacklist is cleared before each size, as in a freshly started
+process, so the first refresh loads it; it is reported on its own. The
+steady-state refreshes per second and p50 / p95 latency should stay flat as
+the tables grow.
+
+Usage:
+    python benchmarks/token_refresh.py --sizes 10000 200000 --refreshes 500
+"""
+import argparse
+import statistics
+import time
+from datetime import timedelta
+
+from common import add_database_arguments, setup_database
+
+DATASET = {"bills": 1000, "medicines": 100, "staff": 10, "seed": 0}
+FILLER_PREFIX = "bench-"
+FILLER_BATCH = 5000
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def filler_tables():
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+    return OutstandingToken._meta.db_table, BlacklistedToken._meta.db_table
+
+
+def reset_tables():
+    """Delete the filler tokens of earlier runs, so that each size is reached from empty."""
+    from django.db import connection, transaction
+
+    outstanding, blacklisted = filler_tables()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {blacklisted} WHERE token_id IN "
+                       f"(SELECT id FROM {outstanding} WHERE jti LIKE %s)", [f"{FILLER_PREFIX}%"])
+        cursor.execute(f"DELETE FROM {outstanding} WHERE jti LIKE %s", [f"{FILLER_PREFIX}%"])
+
+
+def grow_tables(user, size):
+    """Add live, blacklisted filler tokens until there are ``size`` of them."""
+    from django.db import connection, transaction
+    from django.utils.timezone import now
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+    existing = OutstandingToken.objects.filter(jti__startswith=FILLER_PREFIX).count()
+    issued_at = now()
+    expires_at = issued_at + timedelta(days=3650)
+    with transaction.atomic():
+        for start in range(existing, size, FILLER_BATCH):
+            OutstandingToken.objects.bulk_create([
+                OutstandingToken(user=user, jti=f"{FILLER_PREFIX}{index}", token="filler",
+                                 created_at=issued_at, expires_at=expires_at)
+                for index in range(start, min(start + FILLER_BATCH, size))
+            ])
+        # SQLite's bulk_create returns no ids, so the blacklist rows are inserted from the outstanding ones.
+        outstanding, blacklisted = filler_tables()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {blacklisted} (token_id, blacklisted_at) "
+                f"SELECT id, %s FROM {outstanding} WHERE jti LIKE %s "
+                f"AND id NOT IN (SELECT token_id FROM {blacklisted})",
+                [issued_at, f"{FILLER_PREFIX}%"],
+            )
+
+
+def refresh_run(user, refreshes):
+    """Return the first refresh's latency and the following ones', in milliseconds."""
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from api.authentication import RoleTokenObtainPairSerializer
+    from api.blacklist import blacklist
+
+    client, url = APIClient(), reverse("token_refresh")
+    refresh = str(RoleTokenObtainPairSerializer.get_token(user))
+    blacklist.clear()
+    samples = []
+    for _ in range(refreshes + 1):
+        started = time.perf_counter()
+        response = client.post(url, {"refresh": refresh})
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.content
+        refresh = response.data["refresh"]
+    return samples[0], samples[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 200000],
+                        help="blacklisted tokens in the tables, in increasing order")
+    parser.add_argument("--refreshes", type=int, default=500)
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    setup_database(args.db, "token_refresh", **DATASET)
+
+    from django.contrib.auth import get_user_model
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    user = get_user_model().objects.get(username="staff0001")
+    reset_tables()
+    print(f"{'blacklisted':>12}{'first ms':>10}{'per sec':>10}{'p50 ms':>8}{'p95 ms':>8}")
+    for size in sorted(args.sizes):
+        grow_tables(user, size)
+        first, samples = refresh_run(user, args.refreshes)
+        rate = len(samples) / (sum(samples) / 1000)
+        print(f"{size:>12}{first:10.1f}{rate:10.0f}{statistics.median(samples):8.2f}{percentile(samples, 0.95):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 ASGI config for medical_billing project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests served here resolve against ``asgi_urls``, which swaps in the async
+read endpoints from ``api.async_views``. Their streamed exports are sent chunk
+by chunk from ``pooled_content`` as they are produced.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +12,46 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medical_billing.settings')
 
-application = get_asgi_application()
+
+class AsyncRoutesRequest(ASGIRequest):
+    urlconf = 'medical_billing.asgi_urls'
+
+
+class AsyncRoutesHandler(ASGIHandler):
+    request_class = AsyncRoutesRequest
+
+    async def send_response(self, response, send):
+        """
+        Send responses as Django does, except that a body streamed from the
+        view pool is sent one chunk at a time as the pool produces it. Django
+        3.2 would iterate it here on the event loop, where the ORM may not run.
+        """
+        content = getattr(response, 'pooled_content', None)
+        if content is None:
+            return await super().send_response(response, send)
+        headers = [
+            (header.encode('ascii') if isinstance(header, str) else header,
+             value.encode('latin1') if isinstance(value, str) else value)
+            for header, value in response.items()
+        ]
+        for cookie in response.cookies.values():
+            headers.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        try:
+            async for part in content:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            await content.aclose()
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+django.setup(set_prefix=False)
+application = AsyncRoutesHandler()
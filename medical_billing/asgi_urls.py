@@ -0,0 +1,13 @@
+"""
+URL configuration used by the ASGI app (see asgi.py).
+
+The async read endpoints in api/async_urls.py take precedence; every other
+route falls through to the synchronous views in urls.py.
+"""
+from django.urls import path, include
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include('api.async_urls')),
+] + sync_urlpatterns
@@ -38,10 +38,12 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework_simplejwt.token_blacklist',
     'api',
 ]
 
 MIDDLEWARE = [
+    'api.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,13 +56,22 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # ✅ Use JWT authentication
+        'api.authentication.StatelessJWTAuthentication',  # ✅ Use JWT authentication
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
+# Upper bound for the ``page_size`` query parameter on paginated endpoints.
+API_MAX_PAGE_SIZE = 1000
+
 ROOT_URLCONF = 'medical_billing.urls'
 
 TEMPLATES = [
@@ -89,9 +100,101 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds a connection is kept for the thread's next request instead of
+        # being reopened, along with its pragmas and page cache.
+        'CONN_MAX_AGE': 600,
+        'TEST': {
+            # A file rather than shared-cache memory, so concurrent test writers wait
+            # on SQLite's busy timeout instead of failing with "table is locked".
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Dashboard and report reads go to REPLICA_DATABASE while it is no more than
+# REPLICA_LAG_TOLERANCE seconds behind the primary (api.routers). Configure it
+# by adding that alias to DATABASES, for instance a read-only SQLite copy of
+# the primary kept current by `manage.py sync_replica --interval 5`:
+#     'replica': {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': f'file:{BASE_DIR / "db.replica.sqlite3"}?mode=ro',
+#         'OPTIONS': {'uri': True},
+#     },
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+REPLICA_LAG_TOLERANCE = 30
+
+
+# Run on every new SQLite connection (api.sqlite), busy_timeout first so the
+# switch to WAL waits out other connections too.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,  # milliseconds a writer waits for the lock
+    'journal_mode': 'wal',  # persistent: readers and the writer stop blocking each other
+    'synchronous': 'normal',  # no fsync per commit; durable across crashes in WAL mode
+    'cache_size': -65536,  # page cache per connection, in KiB when negative
+    'mmap_size': 268435456,  # bytes of the file read through a memory map
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Stock and catalog invalidations reach every worker through the database
+# (api.cache) whatever the backend; pointing this at a shared backend (Redis,
+# Memcached) lets several worker processes share the cached pages themselves.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Billing responses by Idempotency-Key (api.idempotency): at most
+    # MAX_ENTRIES keys, each replayed for TIMEOUT seconds.
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'idempotency',
+        'TIMEOUT': 86400,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Seconds a duplicate of an in-progress billing request waits for its response.
+IDEMPOTENCY_WAIT_SECONDS = 10
+
+# Seconds a pre-serialized stock availability page is kept.
+STOCK_CACHE_TIMEOUT = 300
+
+# Maximum number of medicines held in each process's billing catalog cache.
+MEDICINE_CATALOG_SIZE = 10000
+
+
+# Medicines expiring within this many days raise an alert (api.alerts).
+EXPIRY_ALERT_DAYS = 30
+
+
+# Threads the async read endpoints (api.async_views) run their views on under ASGI.
+ASYNC_VIEW_THREADS = 8
+
+
+# Background report jobs (api.report_jobs)
+# Worker threads each web process starts on its first report job. Set to 0 when
+# the jobs run in separate processes (manage.py run_report_workers) instead.
+REPORT_JOB_WORKERS = 2
+# Seconds an idle worker waits before looking for jobs queued by other processes.
+REPORT_JOB_POLL_SECONDS = 5
+# Seconds after which a running job is taken to be abandoned and run again.
+REPORT_JOB_TIMEOUT = 3600
+# Seconds finished jobs and their result files are kept.
+REPORT_JOB_RETENTION = 86400
+
+
+# Request metrics (api.metrics)
+# Requests at least this slow are logged to "api.metrics.slow" with their slowest queries.
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_QUERY_LIMIT = 5
+# Clients allowed to read /api/metrics/ without an admin token, when they connect
+# directly: requests carrying a proxy header (X-Forwarded-For, X-Real-IP,
+# Forwarded) always need one, since behind a proxy every client looks local.
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -131,6 +234,9 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Uploaded and generated files; report job results are written under reports/.
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -147,4 +253,14 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': 'django-insecure-4ih)dewccg-d+^xo2wpmar&x7pvs%d3qz7h&ju+s71fa9=%o8',
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.CachedBlacklistTokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'api.authentication.ClaimsUser',
 }
+
+# Seconds a user's token version is cached before it is re-read from the database.
+# revoke_tokens only clears the version from the cache of the process it runs
+# in, and the default cache is per process, so this is how long other workers
+# keep accepting a revoked token. With a shared cache backend the revocation
+# reaches every worker at once, and this can be raised to cut database reads.
+TOKEN_VERSION_CACHE_TIMEOUT = 5